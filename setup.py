@@ -12,6 +12,9 @@ setup(name='pykeepassxc',
       install_requires=[
           'pexpect',
       ],
+      extras_require={
+          'native': ['pycryptodome', 'argon2-cffi'],
+      },
       tests_require=[
           'parameterized',
       ],
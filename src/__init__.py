@@ -1,2 +1,49 @@
-from .keepassxc import *
-from .entity import *
+import importlib
+
+# the public names and the modules defining them, a module is imported when one of its names is first accessed
+# (PEP 562), so `import pykeepassxc` itself costs next to nothing
+_EXPORTS = {
+    'get_version': 'keepassxc',
+    'generate_password': 'keepassxc',
+    'generate_passwords': 'keepassxc',
+    'generate_diceware': 'keepassxc',
+    'generate_dicewares': 'keepassxc',
+    'estimate_password': 'keepassxc',
+    'estimate_passwords': 'keepassxc',
+    'open_database': 'keepassxc',
+    'create_database': 'keepassxc',
+    'Database': 'entity',
+    'NativeDatabase': 'native',
+    'IDatabase': 'interface',
+    'DatabaseSession': 'session',
+    'DatabaseSet': 'fleet',
+    'run_many': 'fleet',
+    'ResultCache': 'cache',
+    'LRUCache': 'cache',
+    'DerivedKeyCache': 'cache',
+    'EntryRecord': 'export',
+    'GroupRecord': 'export',
+    'DatabaseSnapshot': 'diff',
+    'DatabaseDiff': 'diff',
+    'Finding': 'parsers',
+    'HibpFile': 'hibp',
+    'CopyResult': 'fileops',
+    'SnapshotStore': 'backup',
+    'FileWatcher': 'watch',
+    'AgentDatabase': 'agent',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    value = getattr(importlib.import_module('.' + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
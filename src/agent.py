@@ -0,0 +1,419 @@
+"""
+A local daemon that keeps databases unlocked and answers requests over a Unix domain socket,
+so short-lived processes pay a socket round trip instead of a process spawn and a KDF unlock.
+
+    cd src && python -m agent --socket /run/user/1000/pykeepassxc/agent.sock
+
+Clients use :py:class:`AgentDatabase` like a :py:class:`~entity.Database`. Only processes of the same user
+can connect: the socket is created in a private directory and the user of every peer is checked.
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import stat
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set
+import command
+from cache import ResultCache
+from entity import Database
+from fileops import CopyResult, copy_file
+from interface import IDatabase
+from parsers import DatabaseInfo
+from pool import SessionPool
+
+# a frame is the length of its payload (4 bytes, big-endian) and the payload, a JSON object in UTF-8
+FRAME_HEADER = struct.Struct('>I')
+MAX_REQUEST_SIZE = 1024 * 1024
+MAX_RESPONSE_SIZE = 1024 * 1024 * 1024
+# struct ucred of SO_PEERCRED
+PEER_CREDENTIALS = struct.Struct('iII')
+
+# the commands served by the agent, called with a database and the arguments of the request
+COMMANDS = {
+    'get_info': lambda database, args: command.DatabaseInfoCommand(database),
+    'export': lambda database, args: command.ExportDatabaseCommand(database, args.get('format')),
+    'list_entries': lambda database, args: command.ListDatabaseCommand(database, args.get('group'),
+                                                                       args.get('recursive', False)),
+    'search': lambda database, args: command.SearchDatabaseCommand(database, args['term']),
+    'show_entry': lambda database, args: command.ShowEntryCommand(database, args['entry']),
+}  # type: Dict[str, Callable[[IDatabase, dict], command.DatabaseCommand]]
+# the exceptions raised again by the client, others are raised as RuntimeError
+ERRORS = {error.__name__: error for error in (ValueError, KeyError, TimeoutError, FileNotFoundError,
+                                              FileExistsError, PermissionError, OSError)}
+
+
+def get_socket_path() -> str:
+    """
+    :return: `KEEPASSXC_AGENT_SOCKET` or `agent.sock` in a private directory below `XDG_RUNTIME_DIR`
+        (or the temporary directory)
+    """
+    path = os.getenv('KEEPASSXC_AGENT_SOCKET')
+    if path:
+        return path
+    runtime_dir = os.getenv('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'pykeepassxc', 'agent.sock')
+    return os.path.join(tempfile.gettempdir(), 'pykeepassxc-{}'.format(os.getuid()), 'agent.sock')
+
+
+def send_frame(sock: socket.socket, message: dict):
+    payload = json.dumps(message, separators=(',', ':')).encode('utf-8')
+    sock.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+
+
+def receive_frame(sock: socket.socket, max_size: int) -> Optional[dict]:
+    """
+    :return: The message, `None` if the connection has been closed before a frame started.
+    :raise IOError: If the frame is incomplete or too large.
+    """
+    header = _receive(sock, FRAME_HEADER.size, allow_eof=True)
+    if header is None:
+        return None
+    size, = FRAME_HEADER.unpack(header)
+    if size > max_size:
+        raise IOError('Frame of {} bytes exceeds the limit of {} bytes.'.format(size, max_size))
+    return json.loads(_receive(sock, size).decode('utf-8'))
+
+
+def _receive(sock: socket.socket, size: int, allow_eof: bool = False) -> Optional[bytes]:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            if allow_eof and received == 0:
+                return None
+            raise IOError('Connection closed within a frame.')
+        received += count
+    return bytes(buffer)
+
+
+class AgentServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str = None, pool: SessionPool = None, cache: ResultCache = None):
+        """
+        Serves requests for unlocked databases, each connection in its own thread.
+        Read-only results are cached until the database file changes, see :py:class:`~cache.ResultCache`.
+
+        :param socket_path: [optional] Path of the socket, see :py:func:`get_socket_path`
+        :param pool: [optional] The unlocked sessions, by default one session per database
+            that is closed after 15 minutes without requests
+        :param cache: [optional] The cache of results
+        :raise IOError: If another agent is listening on the socket.
+        :raise PermissionError: If the directory of the socket is not private to the user.
+        """
+        self.socket_path = os.path.abspath(socket_path or get_socket_path())
+        self.pool = pool if pool is not None else SessionPool(max_size=1, idle_timeout=900.0)
+        self.cache = cache if cache is not None else ResultCache()
+        self._connections = set()  # type: Set[socket.socket]
+        self._lock = threading.Lock()
+        self._prepare_socket()
+        # the socket is created with permissions 0600, there is no moment another user could connect
+        umask = os.umask(0o177)
+        try:
+            super().__init__(self.socket_path, _AgentHandler)
+        finally:
+            os.umask(umask)
+
+    def verify_request(self, request: socket.socket, client_address) -> bool:
+        if not hasattr(socket, 'SO_PEERCRED'):
+            # the permissions of the directory and the socket protect it
+            return True
+        credentials = request.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, PEER_CREDENTIALS.size)
+        pid, uid, _ = PEER_CREDENTIALS.unpack(credentials)
+        if uid == os.getuid():
+            return True
+        logging.warning('Refused connection of process {} of user {}.'.format(pid, uid))
+        return False
+
+    def handle_request_message(self, message: dict) -> dict:
+        """
+        :param message: `method`, the `database` (`path`, `password`, `key_file`) and the `args` of the method
+        :return: The response, `result` or the `error` (`type` and `message`)
+        """
+        try:
+            if not isinstance(message, dict):
+                raise ValueError('Invalid request.')
+            return {'result': self._call(message.get('method'), message.get('database'), message.get('args') or {})}
+        except subprocess.CalledProcessError as e:
+            return {'error': {'type': 'CalledProcessError', 'message': str(e), 'returncode': e.returncode,
+                              'stderr': e.stderr}}
+        except Exception as e:
+            if not isinstance(e, tuple(ERRORS.values())):
+                logging.exception('Request {} failed.'.format(message.get('method')))
+            return {'error': {'type': type(e).__name__, 'message': str(e)}}
+
+    def server_close(self):
+        super().server_close()
+        # connection threads would otherwise serve requests until their clients disconnect
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.pool.close()
+        try:
+            os.remove(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+    def _call(self, method: str, database: Optional[dict], args: dict) -> Any:
+        if method == 'ping':
+            return 'pong'
+        if method == 'get_metrics':
+            return dict(self.pool.get_metrics(), **self.cache.get_metrics())
+        create_command = COMMANDS.get(method)
+        if create_command is None:
+            raise ValueError('Unknown method {}.'.format(method))
+        if not isinstance(database, dict) or 'path' not in database:
+            raise ValueError('Missing database.')
+        if not os.path.exists(database['path']):
+            raise FileNotFoundError('Database at {} does not exist.'.format(database['path']))
+        database_command = create_command(
+            Database(database['path'], database.get('password'), database.get('key_file')), args)
+
+        if not database_command.cacheable:
+            return self.pool.execute(database_command)
+        key = database_command.get_cache_key()
+        found, result = self.cache.get(key)
+        if not found:
+            result = self.pool.execute(database_command)
+            self.cache.set(key, result)
+        return result
+
+    def _prepare_socket(self):
+        directory = os.path.dirname(self.socket_path)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        # an existing directory keeps its permissions and owner, a socket in it is only private if it is
+        status = os.lstat(directory)
+        if not stat.S_ISDIR(status.st_mode) or not status.st_uid == os.getuid() or status.st_mode & 0o077:
+            raise PermissionError('Directory {} of the socket must be owned by the user and have permissions '
+                                  '0700.'.format(directory))
+        if not os.path.exists(self.socket_path):
+            return
+        # a socket left behind by an agent that has not been shut down
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            try:
+                sock.connect(self.socket_path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.remove(self.socket_path)
+                return
+        raise IOError('An agent is listening on {} already.'.format(self.socket_path))
+
+
+class _AgentHandler(socketserver.BaseRequestHandler):
+    def setup(self):
+        with self.server._lock:
+            self.server._connections.add(self.request)
+
+    def finish(self):
+        with self.server._lock:
+            self.server._connections.discard(self.request)
+
+    def handle(self):
+        # a connection is kept open for any number of requests, answered in order
+        while True:
+            try:
+                message = receive_frame(self.request, MAX_REQUEST_SIZE)
+            except (IOError, ValueError) as e:
+                logging.warning('Invalid request: {}'.format(e))
+                return
+            if message is None:
+                return
+            send_frame(self.request, self.server.handle_request_message(message))
+
+
+class AgentClient:
+    def __init__(self, socket_path: str = None, timeout: float = None):
+        """
+        A connection to an :py:class:`AgentServer`, opened on the first request and reused by later ones.
+        Thread-safe, requests of several threads are sent one after the other.
+
+        :param socket_path: [optional] Path of the socket, see :py:func:`get_socket_path`
+        :param timeout: [optional] Seconds to wait for a response
+        """
+        self._socket_path = socket_path or get_socket_path()
+        self._timeout = timeout
+        self._socket = None  # type: Optional[socket.socket]
+        self._lock = threading.Lock()
+
+    def get_socket_path(self) -> str:
+        return self._socket_path
+
+    def call(self, method: str, database: IDatabase = None, **args) -> Any:
+        """
+        :raise CalledProcessError: If keepassxc-cli failed in the agent.
+        :raise IOError: If the agent cannot be reached.
+        """
+        message = {'method': method, 'args': args}
+        if database is not None:
+            message['database'] = {'path': database.get_path(), 'password': database.get_password(),
+                                   'key_file': database.get_key_file()}
+        with self._lock:
+            reused = self._socket is not None
+            try:
+                response = self._send(message)
+            except (BrokenPipeError, ConnectionResetError):
+                if not reused:
+                    raise
+                # the agent has been restarted since the last request, every method can safely be sent again
+                response = self._send(message)
+        if 'error' in response:
+            raise _to_exception(response['error'])
+        return response['result']
+
+    def ping(self) -> bool:
+        try:
+            return self.call('ping') == 'pong'
+        except IOError:
+            return False
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return self.call('get_metrics')
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+    def __enter__(self) -> 'AgentClient':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _send(self, message: dict) -> dict:
+        if self._socket is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self._timeout)
+            try:
+                sock.connect(self._socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._socket = sock
+        try:
+            send_frame(self._socket, message)
+            response = receive_frame(self._socket, MAX_RESPONSE_SIZE)
+        except BaseException:
+            self._disconnect()
+            raise
+        if response is None:
+            self._disconnect()
+            raise ConnectionResetError('Agent closed the connection.')
+        return response
+
+    def _disconnect(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+class AgentDatabase(IDatabase):
+    def __init__(self, path: str, password: str = None, key_file: str = None, client: AgentClient = None):
+        """
+        A database unlocked by an agent, see :py:class:`AgentServer`. The credentials are sent with every
+        request and checked against the session of the agent.
+
+        :param path: Path to the database file
+        :param password: [optional] Password to open the database
+        :param key_file: [optional] Path to the key-file to open the database
+        :param client: [optional] The connection to the agent, by default one to the socket of
+            :py:func:`get_socket_path`
+        """
+        self._path = os.path.abspath(path)
+        self._password = password
+        self._key_file = os.path.abspath(key_file) if key_file is not None else None
+        self._client = client if client is not None else AgentClient()
+
+    def get_path(self) -> str:
+        return self._path
+
+    def has_password(self) -> bool:
+        return self._password is not None
+
+    def get_password(self) -> Optional[str]:
+        return self._password
+
+    def has_key_file(self) -> bool:
+        return self._key_file is not None
+
+    def get_key_file(self) -> Optional[str]:
+        return self._key_file
+
+    def get_client(self) -> AgentClient:
+        return self._client
+
+    def get_info(self) -> DatabaseInfo:
+        return DatabaseInfo.from_dict(self._client.call('get_info', self))
+
+    def export(self, format: str = None) -> str:
+        return self._client.call('export', self, format=format)
+
+    def export_to(self, target_path: str, format: str = None):
+        if os.path.exists(target_path):
+            raise IOError('File at {} already exists.'.format(target_path))
+        Database._write_to(target_path, [self.export(format)])
+
+    def copy_to(self, target_path: str, overwrite: bool = False) -> CopyResult:
+        return copy_file(self._path, target_path, overwrite=overwrite)
+
+    def list_entries(self, group: str = None, recursive: bool = False) -> List[str]:
+        return self._client.call('list_entries', self, group=group, recursive=recursive)
+
+    def search(self, term: str) -> List[str]:
+        return self._client.call('search', self, term=term)
+
+    def show_entry(self, entry: str) -> dict:
+        return self._client.call('show_entry', self, entry=entry)
+
+
+def _to_exception(error: dict) -> Exception:
+    if error.get('type') == 'CalledProcessError':
+        return subprocess.CalledProcessError(error.get('returncode', 1), 'keepassxc-cli', stderr=error.get('stderr'))
+    return ERRORS.get(error.get('type'), RuntimeError)(error.get('message'))
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m agent', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--socket', help='path of the socket (default: {})'.format(get_socket_path()))
+    parser.add_argument('--max-sessions', type=int, default=1, help='unlocked sessions per database')
+    parser.add_argument('--idle-timeout', type=float, default=900.0,
+                        help='seconds after which an unused session is locked')
+    parser.add_argument('--timeout', type=int, default=30, help='seconds to wait for keepassxc-cli to answer')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    pool = SessionPool(max_size=args.max_sessions, idle_timeout=args.idle_timeout, timeout=args.timeout)
+    try:
+        server = AgentServer(args.socket, pool)
+    except IOError as e:
+        pool.close()
+        print(e, file=sys.stderr)
+        return 1
+    # shutdown() waits for serve_forever() to return, so it cannot be called from the thread of the signal handler
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    logging.info('Listening on {}'.format(server.socket_path))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import subprocess
+import time
+from typing import Any, List, Optional, Set, Tuple
+import command
+from fileops import CopyResult
+from interface import IDatabase
+from parsers import DatabaseInfo, PasswordEstimate
+
+
+async def execute(cmd: command.Command, check: bool = True, timeout: float = 30) -> Any:
+    """
+    Executes a command in a subprocess managed by the event loop, so no thread is blocked while it runs.
+    Populates `stdout`, `stderr` and `return_code` of the command just like :py:meth:`~command.Command.execute`.
+    keepassxc-cli builds that read passwords from a terminal only are run in a pseudo terminal in a thread of the
+    default executor instead, as is the first probe of the executable's capabilities (see :py:mod:`capabilities`).
+
+    :param cmd: The command to execute
+    :param check: Check the return code of the subprocess.
+    :param timeout: Seconds to wait for each password prompt of the subprocess
+    :raise CalledProcessError: If the return code is checked and is non-zero.
+    :raise TimeoutExpired: If the subprocess did not prompt for a password in time, it is killed.
+    :return: The parsed output of the command.
+    """
+    loop = asyncio.get_running_loop()
+    if cmd._resolved or len(cmd.aliases) == 0:
+        parts = cmd._build_command()
+    else:
+        parts = await loop.run_in_executor(None, cmd._build_command)
+    logging.debug('Executing command `{}`'.format(' '.join(cmd.quote(part) for part in parts)))
+
+    database_command = isinstance(cmd, command.DatabaseCommand)
+    prompts = cmd._get_unlock_prompts() if database_command else []
+    cmd._start_metrics()
+    try:
+        if database_command and cmd._use_tty(parts[0]):
+            result = await loop.run_in_executor(None, cmd._run_tty, parts)
+        else:
+            result = await _run_subprocess(cmd, parts, prompts, timeout)
+            if database_command and not result[0] == 0 and cmd._requires_tty(parts[0], result[2]):
+                result = await loop.run_in_executor(None, cmd._run_tty, parts)
+        cmd.return_code, cmd.stdout, cmd.stderr = result
+        return cmd._handle_result(parts, check)
+    finally:
+        cmd._finish_metrics()
+
+
+async def _run_subprocess(cmd: command.Command, parts: List[str], prompts: List[Tuple[str, str]],
+                          timeout: float) -> Tuple[int, str, str]:
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        *parts,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env=cmd._env
+    )
+    spawned = time.perf_counter()
+    cmd.metrics.spawn += spawned - started
+
+    # keepassxc-cli reads passwords from STDIN and writes its prompts to STDERR
+    stderr_head = b''
+    for prompt, password in prompts:
+        marker = prompt.encode(cmd._encoding)
+        waiting = time.perf_counter()
+        try:
+            stderr_head += (await asyncio.wait_for(process.stderr.readuntil(marker), timeout))[:-len(marker)]
+        except asyncio.IncompleteReadError as e:
+            stderr_head += e.partial
+            break
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise subprocess.TimeoutExpired(parts, timeout)
+        finally:
+            cmd.metrics.add_prompt_wait(time.perf_counter() - waiting)
+        process.stdin.write((password + '\n').encode(cmd._encoding))
+        await process.stdin.drain()
+
+    stdout, stderr = await process.communicate()
+    cmd.metrics.run += time.perf_counter() - spawned
+    return process.returncode, stdout.decode(cmd._encoding), (stderr_head + stderr).decode(cmd._encoding).strip()
+
+
+async def get_version() -> str:
+    """
+    Shows the KeePassXC version.
+    :return: The version string.
+    """
+    return await execute(command.Command(options=['--version']))
+
+
+async def generate_password(config: command.GeneratePasswordConfig = None) -> str:
+    """
+    Generate a new random password.
+    :param config: Password generation options
+    :return:
+    """
+    return await execute(command.GeneratePasswordCommand(config))
+
+
+async def generate_diceware(words: int = None) -> str:
+    """
+    Generate a new random diceware passphrase.
+    :param words: Word count
+    :return:
+    """
+    return await execute(command.GenerateDicewareCommand(words))
+
+
+async def estimate_password(password: str) -> PasswordEstimate:
+    """
+    Estimate the strength of a password.
+    :param password: The password to estimate
+    :return:
+    """
+    return await execute(command.EstimatePasswordCommand(password))
+
+
+class AsyncDatabase:
+    def __init__(self, database: IDatabase):
+        """
+        Asynchronous access to a database.
+
+        :param database: The database to operate on
+        """
+        self._database = database
+
+    def get_database(self) -> IDatabase:
+        return self._database
+
+    def get_path(self) -> str:
+        return self._database.get_path()
+
+    def has_password(self) -> bool:
+        return self._database.has_password()
+
+    def get_password(self) -> Optional[str]:
+        return self._database.get_password()
+
+    def has_key_file(self) -> bool:
+        return self._database.has_key_file()
+
+    def get_key_file(self) -> Optional[str]:
+        return self._database.get_key_file()
+
+    async def get_info(self) -> DatabaseInfo:
+        return await execute(command.DatabaseInfoCommand(self._database))
+
+    async def compare(self, database_from: IDatabase) -> Set[str]:
+        return await execute(command.CompareDatabaseCommand(self._database, database_from))
+
+    async def export(self, format: str = None) -> str:
+        return await execute(command.ExportDatabaseCommand(self._database, format))
+
+    async def export_to(self, target_path: str, format: str = None):
+        # streamed to the file by a thread, so the export is never held in memory as a whole
+        return await asyncio.get_running_loop().run_in_executor(None, self._database.export_to, target_path, format)
+
+    async def copy_to(self, target_path: str, overwrite: bool = False) -> CopyResult:
+        return await asyncio.get_running_loop().run_in_executor(None, self._database.copy_to, target_path,
+                                                                 overwrite)
+
+    async def list_entries(self, group: str = None, recursive: bool = False) -> List[str]:
+        return await execute(command.ListDatabaseCommand(self._database, group, recursive))
+
+    async def search(self, term: str) -> List[str]:
+        return await execute(command.SearchDatabaseCommand(self._database, term))
+
+    async def show_entry(self, entry: str) -> dict:
+        return await execute(command.ShowEntryCommand(self._database, entry))
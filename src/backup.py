@@ -0,0 +1,238 @@
+import binascii
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import parallel
+from cache import fingerprint
+from fileops import CopyResult, copy_file, hash_path, write_file
+from interface import IDatabase
+
+# the status of a file in a snapshot
+COPIED = 'copied'
+DEDUPLICATED = 'deduplicated'
+UNCHANGED = 'unchanged'
+
+
+class SnapshotFile:
+    __slots__ = ('source', 'digest', 'size', 'fingerprint', 'status')
+
+    def __init__(self, source: str, digest: str, size: int, fingerprint: Tuple[int, int, int], status: str):
+        """
+        A database file in a :py:class:`Snapshot`, its content is stored once per digest.
+
+        :param source: Absolute path of the database file
+        :param digest: BLAKE2b hash of the content, see :py:func:`fileops.hash_file`
+        :param size: Bytes
+        :param fingerprint: Fingerprint of the file when the snapshot was taken, see :py:func:`cache.fingerprint`
+        :param status: 'copied' if the content was new, 'deduplicated' if it was stored already
+            or 'unchanged' if the file has not changed since the previous snapshot
+        """
+        self.source = source
+        self.digest = digest
+        self.size = size
+        self.fingerprint = fingerprint
+        self.status = status
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'SnapshotFile':
+        return cls(data['source'], data['digest'], data['size'], tuple(data['fingerprint']), data['status'])
+
+    def to_dict(self) -> dict:
+        return {'source': self.source, 'digest': self.digest, 'size': self.size,
+                'fingerprint': list(self.fingerprint), 'status': self.status}
+
+    def __repr__(self) -> str:
+        return 'SnapshotFile({!r}, {!r})'.format(self.source, self.status)
+
+
+class Snapshot:
+    __slots__ = ('id', 'created', 'files', 'errors', 'duration')
+
+    def __init__(self, id: str, created: float, files: Iterable[SnapshotFile] = (), errors: Dict[str, str] = None,
+                 duration: float = 0.0):
+        """
+        The database files of a :py:class:`SnapshotStore` at one point in time.
+
+        :param id: Unique and sortable by time, e.g. '20240101T031500.123456Z-1a2b'
+        :param created: Seconds since the epoch
+        :param files: The files, see :py:meth:`get_file`
+        :param errors: Messages of the files that could not be stored, by path
+        :param duration: Seconds it took to take the snapshot
+        """
+        self.id = id
+        self.created = created
+        self.files = {file.source: file for file in files}  # type: Dict[str, SnapshotFile]
+        self.errors = errors if errors is not None else {}
+        self.duration = duration
+
+    @property
+    def ok(self) -> bool:
+        return len(self.errors) == 0
+
+    def get_file(self, source: Union[str, IDatabase]) -> SnapshotFile:
+        """
+        :raise KeyError: If the file is not part of the snapshot.
+        """
+        return self.files[_get_source(source)]
+
+    def get_copied_bytes(self) -> int:
+        """
+        :return: Bytes written to the store for this snapshot
+        """
+        return sum(file.size for file in self.files.values() if file.status == COPIED)
+
+    def get_deduplicated_bytes(self) -> int:
+        """
+        :return: Bytes of the snapshot that were stored already and have not been copied
+        """
+        return sum(file.size for file in self.files.values() if not file.status == COPIED)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Snapshot':
+        return cls(data['id'], data['created'], map(SnapshotFile.from_dict, data['files']), data.get('errors'),
+                   data.get('duration', 0.0))
+
+    def to_dict(self) -> dict:
+        return {'id': self.id, 'created': self.created, 'duration': self.duration,
+                'files': [file.to_dict() for file in self.files.values()], 'errors': self.errors}
+
+    def __repr__(self) -> str:
+        return 'Snapshot({!r}, files={}, copied={}, deduplicated={})'.format(
+            self.id, len(self.files), self.get_copied_bytes(), self.get_deduplicated_bytes())
+
+
+class SnapshotStore:
+    def __init__(self, directory: str, max_workers: int = 4):
+        """
+        Point-in-time snapshots of database files in a content-addressed directory. The content of a file
+        is stored once under its hash, no matter how many snapshots or databases share it. A file whose
+        fingerprint has not changed since the latest snapshot is neither read nor copied again.
+
+        >>> store = SnapshotStore('/var/backups/keepass')
+        >>> snapshot = store.snapshot(['/home/nepoh/secret.kdbx', '/home/nepoh/work.kdbx'])
+        >>> store.restore(snapshot, '/home/nepoh/secret.kdbx', '/tmp/secret.kdbx')
+
+        :param directory: The store, created with permissions 0700 if it does not exist
+        :param max_workers: Maximum number of files read or copied at the same time
+        """
+        self._directory = os.path.abspath(directory)
+        self._max_workers = max_workers
+        for name in ('objects', 'snapshots'):
+            os.makedirs(os.path.join(self._directory, name), mode=0o700, exist_ok=True)
+
+    def get_directory(self) -> str:
+        return self._directory
+
+    def snapshot(self, sources: Iterable[Union[str, IDatabase]]) -> Snapshot:
+        """
+        Takes a snapshot of database files in parallel. A file that cannot be read is reported
+        in :py:attr:`Snapshot.errors` and does not stop the others.
+
+        :param sources: Paths of the files or databases
+        """
+        started = time.time()
+        sources = list(dict.fromkeys(_get_source(source) for source in sources))
+        latest = self.get_latest()
+        previous = latest.files if latest is not None else {}
+
+        def store(source: str) -> Tuple[str, Union[SnapshotFile, Exception]]:
+            try:
+                return source, self._store(source, previous.get(source))
+            except OSError as e:
+                return source, e
+
+        files, errors = [], {}
+        for source, file in parallel.imap(store, sources, workers=self._max_workers):
+            if isinstance(file, SnapshotFile):
+                files.append(file)
+            else:
+                errors[source] = str(file)
+
+        snapshot = Snapshot(_create_id(started), started, files, errors, time.time() - started)
+        write_file(self._get_manifest_path(snapshot.id), json.dumps(snapshot.to_dict(), indent=2).encode('utf-8'))
+        return snapshot
+
+    def list_snapshots(self) -> List[Snapshot]:
+        """
+        :return: The snapshots, the oldest first
+        """
+        return [self.get_snapshot(snapshot_id) for snapshot_id in self._list_ids()]
+
+    def get_snapshot(self, snapshot_id: str) -> Snapshot:
+        """
+        :raise KeyError: If there is no such snapshot.
+        """
+        try:
+            with open(self._get_manifest_path(snapshot_id), 'rb') as f:
+                return Snapshot.from_dict(json.loads(f.read().decode('utf-8')))
+        except FileNotFoundError:
+            raise KeyError(snapshot_id)
+
+    def get_latest(self) -> Optional[Snapshot]:
+        ids = self._list_ids()
+        return self.get_snapshot(ids[-1]) if len(ids) > 0 else None
+
+    def restore(self, snapshot: Union[str, Snapshot], source: Union[str, IDatabase], target_path: str = None,
+                overwrite: bool = False) -> CopyResult:
+        """
+        Restores a database file of a snapshot, see :py:func:`fileops.copy_file`.
+
+        :param snapshot: The snapshot or its ID
+        :param source: Path of the file or the database when the snapshot was taken
+        :param target_path: [optional] Where to restore the file, defaults to its original path
+        :param overwrite: Replace an existing file at the target
+        :raise KeyError: If the snapshot or the file in it does not exist.
+        :raise IOError: If the stored content is corrupted.
+        """
+        if isinstance(snapshot, str):
+            snapshot = self.get_snapshot(snapshot)
+        file = snapshot.get_file(source)
+        # checked before the copy is renamed, a corrupted object never replaces the target
+        return copy_file(self.get_object_path(file.digest), target_path or file.source, overwrite=overwrite,
+                         digest=file.digest)
+
+    def get_object_path(self, digest: str) -> str:
+        return os.path.join(self._directory, 'objects', digest[:2], digest[2:])
+
+    def _store(self, source: str, previous: Optional[SnapshotFile]) -> SnapshotFile:
+        # taken before the file is read, a file changed meanwhile is read again by the next snapshot
+        current = fingerprint(source)
+        if previous is not None and tuple(previous.fingerprint) == current and \
+                os.path.exists(self.get_object_path(previous.digest)):
+            return SnapshotFile(source, previous.digest, previous.size, current, UNCHANGED)
+
+        digest = hash_path(source)
+        if os.path.exists(self.get_object_path(digest)):
+            return SnapshotFile(source, digest, current[1], current, DEDUPLICATED)
+
+        object_path = self.get_object_path(digest)
+        os.makedirs(os.path.dirname(object_path), mode=0o700, exist_ok=True)
+        try:
+            result = copy_file(source, object_path)
+        except FileExistsError:
+            # copied by another worker meanwhile
+            return SnapshotFile(source, digest, current[1], current, DEDUPLICATED)
+        if not result.digest == digest:
+            # the file has been replaced after it was hashed
+            object_path = self.get_object_path(result.digest)
+            os.makedirs(os.path.dirname(object_path), mode=0o700, exist_ok=True)
+            os.replace(result.path, object_path)
+        return SnapshotFile(source, result.digest, result.size, current, COPIED)
+
+    def _list_ids(self) -> List[str]:
+        names = os.listdir(os.path.join(self._directory, 'snapshots'))
+        return sorted(name[:-len('.json')] for name in names if name.endswith('.json'))
+
+    def _get_manifest_path(self, snapshot_id: str) -> str:
+        return os.path.join(self._directory, 'snapshots', snapshot_id + '.json')
+
+
+def _create_id(created: float) -> str:
+    # sorted by time, the random suffix tells apart snapshots taken at once by several processes
+    return '{}.{:06d}Z-{}'.format(time.strftime('%Y%m%dT%H%M%S', time.gmtime(created)), int(created % 1 * 1000000),
+                                  binascii.hexlify(os.urandom(2)).decode('ascii'))
+
+
+def _get_source(source: Union[str, IDatabase]) -> str:
+    return os.path.abspath(source if isinstance(source, str) else source.get_path())
@@ -0,0 +1,224 @@
+"""
+Measures the latency and throughput of the wrapper's operations.
+
+    cd src && python -m bench --fake --entries 10,1000 --kdf-ms 0,100 --output results.json
+    cd src && python -m bench --database secret.kdbx --password 1234 --baseline results.json
+
+With `--fake` the operations run against the stub in `benchmarks/`, which answers instantly (or after the given
+KDF delay), so the results show the cost of the wrapper and of spawning a process rather than of KeePassXC.
+Without it, the `keepassxc-cli` of `KEEPASSXC_CLI_EXE` runs against the given database.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import command
+import keepassxc
+from entity import Database
+
+FAKE_CLI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks',
+                        'fake-keepassxc-cli')
+BENCHMARKS = ('spawn', 'get_version', 'generate_password', 'estimate_password', 'get_info', 'export_xml',
+              'export_csv', 'compare')
+
+
+def percentile(samples: List[float], p: float) -> float:
+    """
+    Linearly interpolated percentile.
+
+    >>> percentile([1.0, 2.0, 3.0, 4.0], 50)
+    2.5
+    """
+    if len(samples) == 0:
+        raise ValueError('No samples.')
+    ordered = sorted(samples)
+    rank = (len(ordered) - 1) * p / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """
+    :param samples: Durations in seconds
+    :return: Latency percentiles in milliseconds and sequential operations per second.
+    """
+    return {
+        'iterations': len(samples),
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+        'mean_ms': sum(samples) / len(samples) * 1000,
+        'ops_per_sec': len(samples) / sum(samples) if sum(samples) > 0 else float('inf'),
+    }
+
+
+def measure(function: Callable[[], object], iterations: int, warmup: int = 1) -> List[float]:
+    """
+    :return: The duration of each call in seconds, after some calls to warm up caches.
+    """
+    for _ in range(warmup):
+        function()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def get_benchmarks(database: Optional[Database], database_from: Optional[Database]) \
+        -> Iterator[Tuple[str, Callable[[], object]]]:
+    passwords = ('password{}'.format(i) for i in itertools.count())
+    executable = command.Command()._build_command()[0]
+
+    yield 'spawn', lambda: subprocess.run([executable, '--version'], stdout=subprocess.DEVNULL, check=True)
+    # keepassxc.get_version() answers from the probed capabilities, this runs the command it falls back to
+    yield 'get_version', lambda: command.Command(options=['--version']).execute()
+    yield 'generate_password', keepassxc.generate_password
+    # a new password every time, so a cache in front of the estimation would not be measured
+    yield 'estimate_password', lambda: keepassxc.estimate_password(next(passwords))
+    if database is not None:
+        yield 'get_info', database.get_info
+        yield 'export_xml', lambda: database.export(format='xml')
+        yield 'export_csv', lambda: database.export(format='csv')
+        yield 'compare', lambda: database.compare(database_from if database_from is not None else database)
+
+
+def run(scenario: dict, database: Optional[Database], database_from: Optional[Database], iterations: int,
+        warmup: int, only: List[str] = None) -> Iterator[dict]:
+    for name, function in get_benchmarks(database, database_from):
+        if only is not None and name not in only:
+            continue
+        result = {'name': name, 'scenario': scenario}
+        result.update(summarize(measure(function, iterations, warmup)))
+        yield result
+
+
+def run_fake(entries: List[int], kdf_ms: List[int], iterations: int, warmup: int, only: List[str] = None,
+             cli: str = FAKE_CLI) -> Iterator[dict]:
+    """
+    Runs the benchmarks against the stub for every combination of database size and KDF delay.
+    keepassxc-cli only gets `LC_ALL` from the environment, so each combination gets its own wrapper script.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for name in ('bench.kdbx', 'bench_from.kdbx'):
+            paths.append(os.path.join(directory, name))
+            open(paths[-1], 'wb').close()
+
+        previous = os.environ.get('KEEPASSXC_CLI_EXE')
+        try:
+            for n, kdf in itertools.product(entries, kdf_ms):
+                os.environ['KEEPASSXC_CLI_EXE'] = _write_wrapper(directory, cli, {
+                    'FAKE_KEEPASSXC_ENTRIES': str(n), 'FAKE_KEEPASSXC_KDF_MS': str(kdf)})
+                yield from run({'cli': 'fake', 'entries': n, 'kdf_ms': kdf},
+                               Database(paths[0], password='bench'), Database(paths[1], password='bench'),
+                               iterations, warmup, only)
+        finally:
+            if previous is None:
+                os.environ.pop('KEEPASSXC_CLI_EXE', None)
+            else:
+                os.environ['KEEPASSXC_CLI_EXE'] = previous
+
+
+def _write_wrapper(directory: str, cli: str, env: Dict[str, str]) -> str:
+    path = os.path.join(directory, 'keepassxc-cli-{}'.format('-'.join(env.values())))
+    with open(path, 'w') as f:
+        f.write('#!/bin/sh\n')
+        f.write(''.join('{}={} '.format(k, command.Command.quote(v)) for k, v in env.items()))
+        f.write('exec {} {} "$@"\n'.format(command.Command.quote(sys.executable), command.Command.quote(cli)))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    return path
+
+
+def get_metadata(fake: bool = False) -> dict:
+    version = None
+    if not fake:
+        try:
+            version = keepassxc.get_version()
+        except (OSError, subprocess.CalledProcessError):
+            pass
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'keepassxc_cli': FAKE_CLI if fake else os.getenv('KEEPASSXC_CLI_EXE', 'keepassxc-cli'),
+        'keepassxc_version': version,
+    }
+
+
+def compare_results(baseline: dict, current: dict) -> Iterator[str]:
+    """
+    :return: One line per benchmark found in both runs with the change of its median latency.
+    """
+    def key(result: dict) -> str:
+        return json.dumps([result['name'], result['scenario']], sort_keys=True)
+
+    previous = {key(result): result for result in baseline['results']}
+    for result in current['results']:
+        before = previous.get(key(result))
+        if before is None:
+            continue
+        change = (result['p50_ms'] / before['p50_ms'] - 1) * 100 if before['p50_ms'] > 0 else 0.0
+        yield '{:<18} {:<40} {:9.2f} ms -> {:9.2f} ms  {:+7.1f}%'.format(
+            result['name'], json.dumps(result['scenario'], sort_keys=True), before['p50_ms'], result['p50_ms'], change)
+
+
+def _parse_list(string: str) -> List[int]:
+    return [int(s) for s in string.split(',') if len(s) > 0]
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m bench', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--fake', action='store_true', help='run against the keepassxc-cli stub')
+    parser.add_argument('--entries', type=_parse_list, default=[10, 1000], help='database sizes of the stub')
+    parser.add_argument('--kdf-ms', type=_parse_list, default=[0], help='KDF delays of the stub in milliseconds')
+    parser.add_argument('--database', help='database for the database benchmarks (without --fake)')
+    parser.add_argument('--password', help='password of the database')
+    parser.add_argument('--key-file', help='key-file of the database')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--only', type=lambda s: s.split(','), help='comma separated benchmarks: ' + ','.join(BENCHMARKS))
+    parser.add_argument('--output', help='write the results as JSON to this file instead of STDOUT')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare the median latencies with')
+    args = parser.parse_args(argv)
+
+    if args.iterations < 1:
+        parser.error('--iterations must be positive')
+
+    if args.fake:
+        results = list(run_fake(args.entries, args.kdf_ms, args.iterations, args.warmup, args.only))
+    else:
+        database = None
+        if args.database is not None:
+            database = Database(args.database, password=args.password, key_file=args.key_file)
+        results = list(run({'cli': 'keepassxc-cli', 'database': args.database}, database, None,
+                           args.iterations, args.warmup, args.only))
+
+    report = {'meta': get_metadata(args.fake), 'results': results}
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for line in compare_results(baseline, report):
+            sys.stderr.write(line + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
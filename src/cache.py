@@ -0,0 +1,385 @@
+import ctypes
+import hashlib
+import hmac
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+from interface import ICache
+from libc import get_libc
+
+_MISSING = object()
+
+
+def fingerprint(path: str) -> Tuple[int, int, int]:
+    """
+    :return: Modification time (ns), size and inode of a file. Any of them changes when KeePassXC rewrites it.
+    """
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class LRUCache(ICache):
+    def __init__(self, maxsize: int = 1024, ttl: float = None):
+        """
+        A thread-safe cache that evicts the least recently used item once it is full.
+
+        :param maxsize: Maximum number of cached items
+        :param ttl: [optional] Seconds after which an item expires
+        """
+        if maxsize < 1:
+            raise ValueError('Invalid cache size.')
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._items:
+                return default
+            expires, value = self._items[key]
+            if expires is not None and expires < time.monotonic():
+                del self._items[key]
+                return default
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._items[key] = (None if self._ttl is None else time.monotonic() + self._ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self._maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class DiskCache(ICache):
+    def __init__(self, directory: str, ttl: float = None, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024,
+                 secret_path: str = None):
+        """
+        A cache that stores items as files in a private directory, so they survive the process.
+        Every file is signed with a secret and is ignored if it has been tampered with. Whenever an item is set,
+        expired items are removed and the oldest ones beyond `max_entries` or `max_bytes`.
+        WARNING: Cached exports contain passwords in plaintext! The secret only protects the files from being
+        forged, anyone who can read the directory can read the items.
+
+        :param directory: The cache directory, created with permissions 0700 if it does not exist
+        :param ttl: [optional] Seconds after which an item expires
+        :param max_entries: Maximum number of items kept
+        :param max_bytes: Maximum size of all items, larger items are not stored at all
+        :param secret_path: [optional] The file of the secret, created with permissions 0600 if it does not exist.
+            Defaults to `secret` in the directory. Kept elsewhere, e.g. in a directory only the owner can write to,
+            items cannot be forged by someone who can write to the cache directory but cannot read the secret.
+        """
+        if max_entries < 1 or max_bytes < 1:
+            raise ValueError('Invalid cache size.')
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        self._directory = directory
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._secret_path = secret_path if secret_path is not None else os.path.join(directory, 'secret')
+        self._secret = self._load_secret()
+
+    def get_secret(self) -> bytes:
+        return self._secret
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        path = self._get_path(key)
+        try:
+            if self._ttl is not None and os.path.getmtime(path) + self._ttl < time.time():
+                os.remove(path)
+                return default
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return default
+        signature, payload = data[:32], data[32:]
+        if not hmac.compare_digest(signature, hmac.new(self._secret, payload, hashlib.sha256).digest()):
+            return default
+        return pickle.loads(payload)
+
+    def set(self, key: Hashable, value: Any):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        path = self._get_path(key)
+        if 32 + len(payload) > self._max_bytes:
+            # an older value of the key must not outlive the new one
+            self._remove(path)
+            return
+        self._write(path, hmac.new(self._secret, payload, hashlib.sha256).digest() + payload)
+        self.prune(keep=path)
+
+    def clear(self):
+        for name in os.listdir(self._directory):
+            if name.endswith('.cache'):
+                os.remove(os.path.join(self._directory, name))
+
+    def prune(self, keep: str = None):
+        """
+        Removes expired items and the oldest items beyond `max_entries` or `max_bytes`.
+
+        :param keep: [optional] The path of an item that is never removed, e.g. the one just written
+        """
+        now = time.time()
+        items = []
+        with os.scandir(self._directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.cache'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # removed by another process meanwhile
+                    continue
+                if self._ttl is not None and stat.st_mtime + self._ttl < now and not entry.path == keep:
+                    self._remove(entry.path)
+                else:
+                    items.append((entry.path == keep, stat.st_mtime, stat.st_size, entry.path))
+
+        # the oldest first, the kept item last
+        items.sort()
+        count, size = len(items), sum(item[2] for item in items)
+        for kept, _, item_size, path in items:
+            if kept or (count <= self._max_entries and size <= self._max_bytes):
+                break
+            self._remove(path)
+            count -= 1
+            size -= item_size
+
+    def _get_path(self, key: Hashable) -> str:
+        name = hmac.new(self._secret, repr(key).encode('utf-8'), hashlib.sha256).hexdigest()
+        return os.path.join(self._directory, name + '.cache')
+
+    def _load_secret(self) -> bytes:
+        try:
+            with open(self._secret_path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            secret = os.urandom(32)
+            self._write(self._secret_path, secret)
+            return secret
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _write(path: str, data: bytes):
+        # written to a temporary file and renamed, so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+
+class ResultCache:
+    def __init__(self, backend: ICache = None, secret: bytes = None):
+        """
+        Caches the results of read-only database commands, see :py:attr:`~command.DatabaseCommand.cacheable`.
+        Results are keyed on the command, the fingerprints of the database files and the credentials,
+        so they are invalidated as soon as a database file is rewritten. Keys are hashed with a secret,
+        the credentials are never stored.
+
+        :param backend: [optional] The storage, defaults to an in-process :py:class:`LRUCache`
+        :param secret: [optional] The key for hashing, defaults to the secret of a :py:class:`DiskCache` backend
+            or a random one
+        """
+        self._backend = backend if backend is not None else LRUCache(maxsize=128, ttl=300)
+        if secret is None:
+            secret = self._backend.get_secret() if isinstance(self._backend, DiskCache) else os.urandom(32)
+        self._secret = secret
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: tuple) -> Tuple[bool, Any]:
+        """
+        :return: Whether the key has been found and the cached result.
+        """
+        value = self._backend.get(self._hash(key), _MISSING)
+        with self._lock:
+            if value is _MISSING:
+                self._misses += 1
+                return False, None
+            self._hits += 1
+            return True, value
+
+    def set(self, key: tuple, value: Any):
+        self._backend.set(self._hash(key), value)
+
+    def clear(self):
+        self._backend.clear()
+
+    def get_metrics(self) -> Dict[str, int]:
+        with self._lock:
+            return {'hits': self._hits, 'misses': self._misses}
+
+    def _hash(self, key: tuple) -> str:
+        return hmac.new(self._secret, repr(key).encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def credentials_key(password: Optional[str], key_file: Optional[str]) -> tuple:
+    """
+    :return: The part of a cache key identifying the credentials of a database, including the key-file's content.
+    """
+    return password, key_file, None if key_file is None else fingerprint(key_file)
+
+
+def _load_libc() -> Optional[ctypes.CDLL]:
+    libc = get_libc('mlock', 'munlock')
+    if libc is not None:
+        for function in (libc.mlock, libc.munlock):
+            function.argtypes = (ctypes.c_void_p, ctypes.c_size_t)
+            function.restype = ctypes.c_int
+    return libc
+
+
+_libc = _MISSING
+
+
+def _get_libc() -> Optional[ctypes.CDLL]:
+    global _libc
+    if _libc is _MISSING:
+        _libc = _load_libc()
+    return _libc
+
+
+class _LockedBuffer:
+    __slots__ = ('_buffer', 'locked')
+
+    def __init__(self, data: bytes):
+        """
+        A copy of the data in memory that is locked into RAM, so it is never written to swap,
+        and that is overwritten with zeros by :py:meth:`wipe`.
+        """
+        self._buffer = ctypes.create_string_buffer(len(data))
+        libc = _get_libc()
+        self.locked = libc is not None and libc.mlock(ctypes.addressof(self._buffer), len(data)) == 0
+        ctypes.memmove(self._buffer, data, len(data))
+
+    def get(self) -> bytes:
+        return self._buffer.raw
+
+    def wipe(self):
+        ctypes.memset(self._buffer, 0, len(self._buffer))
+        if self.locked:
+            _get_libc().munlock(ctypes.addressof(self._buffer), len(self._buffer))
+            self.locked = False
+
+
+def _wipe_all(items: OrderedDict):
+    for _, buffer in items.values():
+        buffer.wipe()
+    items.clear()
+
+
+class DerivedKeyCache:
+    def __init__(self, ttl: float = 300, maxsize: int = 16, require_lock: bool = False):
+        """
+        Keeps keys derived by the KDF of a database, so opening the same database again skips the derivation.
+        A key is only found for the same credentials and the same KDF parameters including the salt,
+        so it is not used anymore once the KDF seed of the file changes.
+        The keys are held in memory locked into RAM and are overwritten with zeros when they expire,
+        are evicted, the cache is cleared or garbage collected. Keys returned by :py:meth:`get` are copies
+        that Python cannot wipe.
+
+        :param ttl: Seconds after which a key expires
+        :param maxsize: Maximum number of keys
+        :param require_lock: Raise an OSError instead of storing a key in memory that could not be locked
+        """
+        if maxsize < 1:
+            raise ValueError('Invalid cache size.')
+        self._ttl = ttl
+        self._maxsize = maxsize
+        self._require_lock = require_lock
+        self._secret = os.urandom(32)
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        weakref.finalize(self, _wipe_all, self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, kdf_key: tuple, composite_key: bytes) -> Optional[bytes]:
+        """
+        :param kdf_key: The KDF and its parameters, see :py:meth:`~kdbx.KdbxHeader.get_kdf_key`
+        :param composite_key: The credentials, see :py:func:`~kdbx.get_composite_key`
+        :return: The derived key or `None` if it is not cached or has expired.
+        """
+        key = self._hash(kdf_key, composite_key)
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] < time.monotonic():
+                del self._items[key]
+                item[1].wipe()
+                item = None
+            if item is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._items.move_to_end(key)
+            return item[1].get()
+
+    def set(self, kdf_key: tuple, composite_key: bytes, derived_key: bytes):
+        """
+        :raise OSError: If the memory could not be locked and `require_lock` is set.
+        """
+        buffer = _LockedBuffer(derived_key)
+        if not buffer.locked:
+            if self._require_lock:
+                buffer.wipe()
+                raise OSError('Failed to lock memory of the derived key.')
+            logging.debug('Derived key is cached in memory that is not locked')
+
+        key = self._hash(kdf_key, composite_key)
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous is not None:
+                previous[1].wipe()
+            self._items[key] = (time.monotonic() + self._ttl, buffer)
+            while len(self._items) > self._maxsize:
+                self._items.popitem(last=False)[1][1].wipe()
+
+    def prune(self):
+        """
+        Wipes all expired keys.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for key in [key for key, (expires, _) in self._items.items() if expires < now]:
+                self._items.pop(key)[1].wipe()
+
+    def clear(self):
+        """
+        Wipes all keys.
+        """
+        with self._lock:
+            _wipe_all(self._items)
+
+    def get_metrics(self) -> Dict[str, int]:
+        with self._lock:
+            return {'hits': self._hits, 'misses': self._misses, 'size': len(self._items)}
+
+    def _hash(self, kdf_key: tuple, composite_key: bytes) -> bytes:
+        return hmac.new(self._secret, repr(kdf_key).encode('utf-8') + composite_key, hashlib.sha256).digest()
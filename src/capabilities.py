@@ -0,0 +1,214 @@
+import logging
+import os
+import re
+import shutil
+import subprocess
+import threading
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+from cache import DiskCache, LRUCache, fingerprint
+from interface import ICache
+
+VERSION_PATTERN = re.compile(r'([0-9]+)\.([0-9]+)(?:\.([0-9]+))?')
+# `  -f, --format <xml|csv>  Format to use when exporting.`
+OPTION_PATTERN = re.compile(r'(?:^|[\s,])(--?[A-Za-z][A-Za-z0-9-]*)')
+COMMAND_PATTERN = re.compile(r'^[a-z][a-z0-9-]*$')
+
+
+class Capabilities:
+    __slots__ = ('executable', 'version', 'commands', 'options')
+
+    def __init__(self, executable: str, version: Optional[str], commands: Iterable[str],
+                 options: Dict[str, FrozenSet[str]] = None):
+        """
+        What an installed keepassxc-cli supports, see :py:class:`CapabilityRegistry`.
+        Anything that could not be probed is assumed to be supported, so keepassxc-cli reports the error itself.
+
+        :param executable: Path of the executable
+        :param version: The output of `keepassxc-cli --version`, `None` if unknown
+        :param commands: The subcommands listed by `keepassxc-cli --help`, empty if unknown
+        :param options: The options of each subcommand probed so far
+        """
+        self.executable = executable
+        self.version = version
+        self.commands = frozenset(commands)
+        self.options = dict(options) if options is not None else {}  # type: Dict[str, FrozenSet[str]]
+
+    def get_version_info(self) -> Optional[Tuple[int, int, int]]:
+        """
+        :return: Major, minor and patch version, e.g. (2, 5, 4)
+        """
+        match = None if self.version is None else VERSION_PATTERN.search(self.version)
+        if match is None:
+            return None
+        return int(match.group(1)), int(match.group(2)), int(match.group(3) or 0)
+
+    def supports(self, command: str, option: str = None) -> bool:
+        """
+        :param command: A subcommand, e.g. 'export'
+        :param option: [optional] An option of the subcommand, e.g. '--format'. Options are only known
+            once they have been probed with :py:meth:`CapabilityRegistry.probe_options`.
+        """
+        if len(self.commands) > 0 and command not in self.commands:
+            return False
+        if option is None:
+            return True
+        options = self.options.get(command)
+        return options is None or len(options) == 0 or option in options
+
+    def select(self, *commands: str) -> str:
+        """
+        :return: The first of several names of a subcommand that is supported, e.g. 'export' or 'extract'.
+        """
+        for command in commands:
+            if self.supports(command):
+                return command
+        return commands[0]
+
+    def __repr__(self) -> str:
+        return 'Capabilities({!r}, {!r})'.format(self.executable, self.version)
+
+
+class CapabilityRegistry:
+    def __init__(self, cache: ICache = None):
+        """
+        Probes each keepassxc-cli executable once for its version, subcommands and options.
+        The results are kept per resolved path and file fingerprint, so an upgraded executable is probed again.
+
+        :param cache: [optional] Where to keep the results across processes, e.g. a :py:class:`~cache.DiskCache`.
+            Results are always kept in memory as well.
+        """
+        self._cache = cache
+        self._memory = LRUCache(maxsize=64)
+        self._lock = threading.Lock()
+
+    def get(self, executable: str = None) -> Capabilities:
+        """
+        :param executable: [optional] Name or path of the executable, defaults to `KEEPASSXC_CLI_EXE`
+        :return: The capabilities, unknown if the executable cannot be found.
+        """
+        if executable is None:
+            executable = os.getenv('KEEPASSXC_CLI_EXE', 'keepassxc-cli')
+        path = shutil.which(executable)
+        if path is None:
+            return Capabilities(executable, None, ())
+        path = os.path.realpath(path)
+        key = ('capabilities', path, fingerprint(path))
+
+        capabilities = self._memory.get(key)
+        if capabilities is None:
+            with self._lock:
+                capabilities = self._memory.get(key)
+                if capabilities is None and self._cache is not None:
+                    capabilities = self._cache.get(key)
+                if capabilities is None:
+                    capabilities = self.probe(path)
+                    self._set(key, capabilities)
+                else:
+                    self._memory.set(key, capabilities)
+        return capabilities
+
+    def probe_options(self, command: str, executable: str = None) -> FrozenSet[str]:
+        """
+        Probes the options of a subcommand with `keepassxc-cli <command> --help`, unless they are known.
+
+        :return: The options, empty if they could not be probed.
+        """
+        capabilities = self.get(executable)
+        options = capabilities.options.get(command)
+        if options is not None or capabilities.version is None:
+            return options if options is not None else frozenset()
+
+        output = _run([capabilities.executable, command, '--help'])
+        options = frozenset(_parse_options(output)) if output is not None else frozenset()
+        with self._lock:
+            capabilities.options[command] = options
+            self._set(('capabilities', capabilities.executable, fingerprint(capabilities.executable)), capabilities)
+        return options
+
+    def clear(self):
+        self._memory.clear()
+        if self._cache is not None:
+            self._cache.clear()
+
+    @staticmethod
+    def probe(path: str) -> Capabilities:
+        version = _run([path, '--version'])
+        output = _run([path, '--help'])
+        version = version.strip() if version is not None else None
+        return Capabilities(path, version or None, _parse_commands(output) if output is not None else ())
+
+    def _set(self, key: tuple, capabilities: Capabilities):
+        self._memory.set(key, capabilities)
+        if self._cache is not None:
+            try:
+                self._cache.set(key, capabilities)
+            except OSError as e:
+                logging.warning('Cannot cache the capabilities of {}: {}'.format(capabilities.executable, e))
+
+
+def _run(command: list) -> Optional[str]:
+    # like Command, with the locale that keeps the output in English
+    try:
+        process = subprocess.run(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                 env={'LC_ALL': 'en_US.UTF-8'}, universal_newlines=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logging.warning('Cannot probe `{}`: {}'.format(' '.join(command), e))
+        return None
+    return process.stdout if process.returncode == 0 else None
+
+
+def _get_section(output: str, title: str) -> Iterable[str]:
+    lines = iter(output.splitlines())
+    for line in lines:
+        if line.strip() == title:
+            break
+    for line in lines:
+        if len(line.strip()) == 0:
+            break
+        yield line
+
+
+def _parse_commands(output: str) -> Iterable[str]:
+    """
+    Parses the list of `keepassxc-cli --help`, one subcommand and its description per line.
+    """
+    commands = []
+    for line in _get_section(output, 'Available commands:'):
+        names = re.split(r'\s{2,}', line.strip())[0]
+        commands += [name.strip() for name in names.split(',') if COMMAND_PATTERN.match(name.strip())]
+    return commands
+
+
+def _parse_options(output: str) -> Iterable[str]:
+    options = []
+    for line in _get_section(output, 'Options:'):
+        options += OPTION_PATTERN.findall(re.split(r'\s{2,}', line.strip())[0])
+    return options
+
+
+_registry = None  # type: Optional[CapabilityRegistry]
+
+
+def get_registry() -> CapabilityRegistry:
+    """
+    :return: The registry used by all commands. It caches on disk in `KEEPASSXC_CLI_CACHE`, by default
+        `~/.cache/pykeepassxc/capabilities`, or only in memory if `KEEPASSXC_CLI_CACHE` is set to an empty string.
+    """
+    global _registry
+    if _registry is None:
+        directory = os.getenv('KEEPASSXC_CLI_CACHE')
+        if directory is None:
+            directory = os.path.join(os.getenv('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'pykeepassxc',
+                                     'capabilities')
+        cache = None
+        if len(directory) > 0:
+            try:
+                cache = DiskCache(directory)
+            except OSError as e:
+                logging.warning('Cannot cache the capabilities of keepassxc-cli in {}: {}'.format(directory, e))
+        _registry = CapabilityRegistry(cache)
+    return _registry
+
+
+def get_capabilities(executable: str = None) -> Capabilities:
+    return get_registry().get(executable)
@@ -0,0 +1,111 @@
+from typing import List, Tuple, Union
+import command
+from interface import IDatabase
+
+
+class AddEntry:
+    __slots__ = ('path', 'username', 'url', 'password', 'notes')
+
+    def __init__(self, path: str, username: str = None, url: str = None, password: str = None, notes: str = None):
+        """
+        Adds an entry, see :py:meth:`~entity.Database.apply`.
+
+        :param path: Path of the new entry, e.g. 'websites/Wikipedia'
+        """
+        self.path = path
+        self.username = username
+        self.url = url
+        self.password = password
+        self.notes = notes
+
+    def get_command(self, database: IDatabase) -> command.DatabaseCommand:
+        return command.AddEntryCommand(database, self.path, self.username, self.url, self.password, self.notes)
+
+    def __repr__(self) -> str:
+        return 'AddEntry({!r})'.format(self.path)
+
+
+class EditEntry:
+    __slots__ = ('path', 'title', 'username', 'url', 'password', 'notes')
+
+    def __init__(self, path: str, title: str = None, username: str = None, url: str = None, password: str = None,
+                 notes: str = None):
+        """
+        Changes the given fields of an entry, see :py:meth:`~entity.Database.apply`.
+
+        :param path: Path of the entry
+        :param title: [optional] New title of the entry
+        """
+        self.path = path
+        self.title = title
+        self.username = username
+        self.url = url
+        self.password = password
+        self.notes = notes
+
+    def get_command(self, database: IDatabase) -> command.DatabaseCommand:
+        return command.EditEntryCommand(database, self.path, self.title, self.username, self.url, self.password,
+                                        self.notes)
+
+    def __repr__(self) -> str:
+        return 'EditEntry({!r})'.format(self.path)
+
+
+class RemoveEntry:
+    __slots__ = ('path',)
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def get_command(self, database: IDatabase) -> command.DatabaseCommand:
+        return command.RemoveEntryCommand(database, self.path)
+
+    def __repr__(self) -> str:
+        return 'RemoveEntry({!r})'.format(self.path)
+
+
+class AddGroup:
+    __slots__ = ('path',)
+
+    def __init__(self, path: str):
+        """
+        :param path: Path of the new group, its parent has to exist or be added before
+        """
+        self.path = path
+
+    def get_command(self, database: IDatabase) -> command.DatabaseCommand:
+        return command.AddGroupCommand(database, self.path)
+
+    def __repr__(self) -> str:
+        return 'AddGroup({!r})'.format(self.path)
+
+
+Change = Union[AddEntry, EditEntry, RemoveEntry, AddGroup]
+
+
+class BatchResult:
+    __slots__ = ('applied', 'errors', 'duration')
+
+    def __init__(self):
+        """
+        The outcome of a batch of changes, see :py:meth:`~entity.Database.apply`.
+        `applied` counts the changes written, `errors` holds each failed change with its exception
+        and `duration` is the time of the whole batch in seconds, including unlocking the database.
+        """
+        self.applied = 0
+        self.errors = []  # type: List[Tuple[Change, Exception]]
+        self.duration = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return len(self.errors) == 0
+
+    def get_rate(self) -> float:
+        """
+        :return: Changes written per second.
+        """
+        return self.applied / self.duration if self.duration > 0 else 0.0
+
+    def __repr__(self) -> str:
+        return 'BatchResult(applied={}, errors={}, duration={:.3f}, rate={:.1f}/s)'.format(
+            self.applied, len(self.errors), self.duration, self.get_rate())
@@ -1,11 +1,23 @@
+import codecs
 import logging
 import os
+import queue
 import re
 import shlex
 import subprocess
-from typing import List, Tuple, Optional, Set
-import pexpect
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Tuple, Optional, Set, Union, TYPE_CHECKING
+from instrument import CommandMetrics
 from interface import ICommand, IDatabase
+import parsers
+
+if TYPE_CHECKING:
+    # pexpect takes longer to import than everything else, it is imported when a pseudo terminal is needed
+    import pexpect
+
+# Errors of keepassxc-cli builds that read passwords from the terminal only
+TTY_REQUIRED_PATTERN = re.compile('not a tty|inappropriate ioctl|failed to read password', re.IGNORECASE)
 
 
 class GeneratePasswordConfig:
@@ -64,6 +76,11 @@ class GeneratePasswordConfig:
 
 
 class Command(ICommand):
+    # instances of ICommandObserver notified about every executed command, e.g. instrument.HistogramObserver
+    observers = []
+    # names of the subcommand in earlier versions of keepassxc-cli, see _resolve()
+    aliases = ()
+
     def __init__(self, command: str = None, options: List[str] = None, args: List[str] = None):
         self._command = command
         self._options = options if options is not None else []
@@ -73,32 +90,155 @@ class Command(ICommand):
         self.stdout = None
         self.stderr = None
         self.return_code = None
+        self.metrics = CommandMetrics(self.get_name())
+        self._started = None
+        self._resolved = False
+
+    def get_name(self) -> str:
+        if self._command is not None:
+            return self._command
+        return self._options[0] if len(self._options) > 0 else ''
 
     def execute(self, check: bool = True) -> str:
         """
         Executes the command and returns content of STDOUT if the command's return code is zero.
-        Populates `self.stdout`, `self.stderr` and `self.return_code`.
+        Populates `self.stdout`, `self.stderr`, `self.return_code` and `self.metrics`.
 
         :param check: Check the return code of the subprocess.
         :raise CalledProcessError: If the return code is checked and is non-zero.
         :return: Content of STDOUT (without leading/trailing line breaks) or empty string on non-zero return code.
         """
         command = self._build_command()
-        logging.debug('Executing command `{}`'.format(' '.join(command)))
+        logging.debug('Executing command `{}`'.format(' '.join(self.quote(part) for part in command)))
 
-        self.return_code, self.stdout, self.stderr = self._run_subprocess(command)
+        self._start_metrics()
+        try:
+            self.return_code, self.stdout, self.stderr = self._run_subprocess(command)
+            return self._handle_result(command, check)
+        finally:
+            self._finish_metrics()
+
+    def stream(self, chunk_size: int = 65536, check: bool = True) -> Iterator[str]:
+        """
+        Executes the command and yields the content of STDOUT in chunks while the subprocess is running,
+        so the output is never held in memory as a whole.
+        Populates `self.stderr` and `self.return_code` once the output is exhausted, `self.stdout` remains empty.
 
+        :param chunk_size: Maximum number of characters per chunk
+        :param check: Check the return code of the subprocess.
+        :raise CalledProcessError: If the return code is checked and is non-zero.
+        """
+        command = self._build_command()
+        logging.debug('Streaming command `{}`'.format(' '.join(self.quote(part) for part in command)))
+
+        self._start_metrics()
+        try:
+            started = time.perf_counter()
+            process = subprocess.Popen(
+                command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                encoding=self._encoding,
+                env=self._env
+            )
+            spawned = time.perf_counter()
+            self.metrics.spawn += spawned - started
+            count_bytes = len(self.observers) > 0
+
+            # STDERR is drained concurrently, so the subprocess never blocks on a full pipe
+            stderr = []
+            reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+            reader.start()
+            try:
+                try:
+                    input = self._get_input()
+                    if input is not None:
+                        process.stdin.write(input)
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+                while True:
+                    chunk = process.stdout.read(chunk_size)
+                    if len(chunk) == 0:
+                        break
+                    if count_bytes:
+                        self.metrics.output_bytes += len(chunk.encode(self._encoding))
+                    yield chunk
+                process.wait()
+            finally:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+                reader.join()
+                process.stdout.close()
+                process.stderr.close()
+                self.metrics.run += time.perf_counter() - spawned
+                self.return_code = process.returncode
+
+            self.stdout = ''
+            self.stderr = self._clean_stderr(''.join(stderr))
+            self._check_result(command, check)
+        finally:
+            self._finish_metrics()
+
+    def _start_metrics(self, session: bool = False):
+        self.metrics = CommandMetrics(self.get_name(), session)
+        self._started = time.perf_counter()
+        for observer in self.observers:
+            try:
+                observer.on_start(self)
+            except Exception:
+                logging.exception('Observer {!r} failed'.format(observer))
+
+    def _finish_metrics(self):
+        self.metrics.total = time.perf_counter() - self._started
+        self.metrics.return_code = self.return_code
+        if len(self.observers) == 0:
+            return
+        if self.stdout:
+            self.metrics.output_bytes += len(self.stdout.encode(self._encoding))
+        for observer in self.observers:
+            try:
+                observer.on_finish(self, self.metrics)
+            except Exception:
+                logging.exception('Observer {!r} failed'.format(observer))
+
+    def _handle_result(self, command: List[str], check: bool) -> Any:
+        if self._check_result(command, check):
+            started = time.perf_counter()
+            result = self._parse_output(self.stdout.strip("\r\n"))
+            self.metrics.parse += time.perf_counter() - started
+            return result
+
+    def _check_result(self, command: List[str], check: bool) -> bool:
         if len(self.stderr) > 0:
             logging.error(self.stderr)
 
         if self.return_code == 0:
-            return self.stdout.strip("\r\n")
+            return True
         else:
             logging.error('KeepPssXC returned non-zero exit status {}'.format(self.return_code))
             if check:
                 raise subprocess.CalledProcessError(self.return_code, command, self.stdout, self.stderr)
+            return False
+
+    def _parse_output(self, output: str) -> Any:
+        return output
+
+    def _resolve(self):
+        """
+        Adapts the command line to the installed keepassxc-cli before it is built for the first time, so the
+        executable is only probed (see :py:mod:`capabilities`) by commands that are executed and have `aliases`.
+        """
+        if len(self.aliases) > 0:
+            from capabilities import get_capabilities
+            self._command = get_capabilities().select(self._command, *self.aliases)
 
     def _build_command(self) -> List[str]:
+        if not self._resolved:
+            self._resolve()
+            self._resolved = True
         executable = os.getenv('KEEPASSXC_CLI_EXE', 'keepassxc-cli')
         parts = [executable]
 
@@ -111,9 +251,10 @@ class Command(ICommand):
             parts.append('--')
             parts += self._args
 
-        return [self.quote(part) for part in parts]
+        return parts
 
-    def _run_subprocess(self, command: List[str]) -> Tuple[int, str, str]:
+    def _run_subprocess(self, command: List[str], input: str = None) -> Tuple[int, str, str]:
+        started = time.perf_counter()
         process = subprocess.Popen(
             command,
             stdin=subprocess.PIPE,
@@ -122,9 +263,21 @@ class Command(ICommand):
             encoding=self._encoding,
             env=self._env
         )
-        stdout, stderr = process.communicate()
+        spawned = time.perf_counter()
+        stdout, stderr = process.communicate(input)
+        self.metrics.spawn += spawned - started
+        self.metrics.run += time.perf_counter() - spawned
         return process.returncode, stdout, stderr
 
+    def _get_input(self) -> Optional[str]:
+        """
+        :return: Content written to STDIN of the subprocess.
+        """
+        return None
+
+    def _clean_stderr(self, stderr: str) -> str:
+        return stderr
+
     @staticmethod
     def quote(string: str) -> str:
         return shlex.quote(string)
@@ -149,28 +302,23 @@ class GenerateDicewareCommand(Command):
 
 
 class EstimatePasswordCommand(Command):
+    PATTERN = parsers.ESTIMATE_PATTERN
+
     def __init__(self, password: str):
         super().__init__('estimate', args=[password])
 
-    def execute(self, check: bool = True) -> dict:
-        output = super().execute(check)
-        line = output.splitlines()[0]
-        pattern = re.compile('^(Length [0-9]+)\\s+(Entropy [0-9.]+)\\s+(Log10 [0-9.]+)$')
-        match = re.match(pattern, line)
-        if match is None:
-            raise Exception('{} does not match {}'.format(line, pattern))
-        else:
-            return {k.lower(): self.convert(v) for (k, v) in [group.split(' ') for group in match.groups()]}
-
-    @staticmethod
-    def convert(string):
-        try:
-            return int(string)
-        except ValueError:
-            return float(string)
+    def _parse_output(self, output: str) -> parsers.PasswordEstimate:
+        return parsers.parse_password_estimate(output)
 
 
 class DatabaseCommand(Command):
+    # None: pass passwords through a pipe and fall back to a pseudo terminal if keepassxc-cli requires one,
+    # True/False: always/never use a pseudo terminal
+    tty = None
+    _tty_executables = set()
+    # read-only commands whose results only depend on the database files and credentials
+    cacheable = False
+
     def __init__(self, database: IDatabase, command: str, options: List[str] = None, args: List[str] = None, pre_args: List[str] = None):
         self._database = database
 
@@ -178,6 +326,11 @@ class DatabaseCommand(Command):
         if pre_args is not None:
             full_args += pre_args
 
+        # the interactive shell of `keepassxc-cli open` operates on the unlocked database,
+        # so commands sent into it have neither the database path nor its credentials
+        self._interactive_options = list(options) if options is not None else []
+        self._interactive_args = full_args + (args if args is not None else [])
+
         full_args.append(self._database.get_path())
 
         if args is not None:
@@ -195,13 +348,128 @@ class DatabaseCommand(Command):
 
         super().__init__(command, options, full_args)
 
-    def _run_subprocess(self, command: List[str]) -> Tuple[int, str, str]:
+    def get_database(self) -> IDatabase:
+        return self._database
+
+    def get_cache_key(self) -> tuple:
+        """
+        :return: A key that changes whenever the command's result may change, i.e. the command line,
+            the fingerprint of the database file (see :py:func:`~cache.fingerprint`) and the credentials.
+        """
+        # only commands that are cached need the cache module
+        from cache import credentials_key, fingerprint
+        return (self._command, tuple(self._interactive_options), tuple(self._interactive_args),
+                self._database.get_path(), fingerprint(self._database.get_path()),
+                credentials_key(self._database.get_password(), self._database.get_key_file()))
+
+    def execute_in(self, session, check: bool = True):
+        """
+        Executes the command inside the interactive shell of an unlocked :py:class:`~session.DatabaseSession`
+        instead of spawning a new process. Populates `self.stdout`, `self.stderr` and `self.return_code`.
+
+        :param session: The open session of the command's database
+        :param check: Check the return code of the command.
+        :raise CalledProcessError: If the return code is checked and is non-zero.
+        :return: See :py:meth:`execute`.
+        """
+        command = self._build_interactive_command()
+        logging.debug('Executing command `{}` in session'.format(' '.join(self.quote_interactive(part) for part in command)))
+
+        self._start_metrics(session=True)
+        try:
+            started = time.perf_counter()
+            self.return_code, self.stdout, self.stderr = session.run(command, self._get_prompts())
+            self.metrics.run += time.perf_counter() - started
+            return self._handle_result(command, check)
+        finally:
+            self._finish_metrics()
+
+    def _build_interactive_command(self) -> List[str]:
+        if not self._resolved:
+            self._resolve()
+            self._resolved = True
+        parts = [self._command] + self._interactive_options
+        if len(self._interactive_args) > 0:
+            parts.append('--')
+            parts += self._interactive_args
+        return parts
 
-        child = pexpect.spawn(' '.join(command), env=self._env, encoding=self._encoding)
-        child.delaybeforesend = 0.05  # use 50 ms delay between expect and send
+    def _get_prompts(self) -> List[Tuple[str, str]]:
+        """
+        :return: Pairs of prompt and password the command asks for after the database itself has been unlocked.
+        """
+        return []
+
+    def _run_subprocess(self, command: List[str], input: str = None) -> Tuple[int, str, str]:
+        if self._use_tty(command[0]):
+            return self._run_tty(command)
+
+        return_code, stdout, stderr = super()._run_subprocess(command, self._get_input())
+        stderr = self._clean_stderr(stderr)
+
+        if not return_code == 0 and self._requires_tty(command[0], stderr):
+            return self._run_tty(command)
+
+        return return_code, stdout, stderr
+
+    def stream(self, chunk_size: int = 65536, check: bool = True) -> Iterator[str]:
+        if not self._use_tty(self._build_command()[0]):
+            try:
+                yield from super().stream(chunk_size, check)
+                return
+            except subprocess.CalledProcessError as e:
+                # keepassxc-cli writes no output when it fails to read the password
+                if not self._requires_tty(e.cmd[0], e.stderr):
+                    raise
+
+        # a pseudo terminal is read through pexpect, which buffers the output anyway
+        self.execute(check)
+        if self.stdout:
+            yield self.stdout.strip('\r\n')
+
+    def _get_input(self) -> Optional[str]:
+        return ''.join(password + '\n' for _, password in self._get_unlock_prompts())
+
+    def _clean_stderr(self, stderr: str) -> str:
+        # keepassxc-cli writes its password prompts to STDERR
+        for prompt, _ in self._get_unlock_prompts():
+            stderr = stderr.replace(prompt, '', 1)
+        return stderr.strip()
+
+    def _requires_tty(self, executable: str, stderr: str) -> bool:
+        if self.tty is not None or not TTY_REQUIRED_PATTERN.search(stderr):
+            return False
+        logging.debug('{} cannot read passwords from a pipe, falling back to a pseudo terminal'.format(executable))
+        DatabaseCommand._tty_executables.add(executable)
+        return True
+
+    def _use_tty(self, executable: str) -> bool:
+        """
+        Passwords are written to STDIN of the subprocess through a pipe, unless `KEEPASSXC_CLI_TTY=1` is set,
+        `tty` is set or the executable has failed to read them from a pipe before.
+        """
+        env = os.getenv('KEEPASSXC_CLI_TTY')
+        if env is not None:
+            return env == '1'
+        if self.tty is not None:
+            return self.tty
+        return executable in DatabaseCommand._tty_executables
+
+    def _run_tty(self, command: List[str]) -> Tuple[int, str, str]:
+        import pexpect
+        # with echo disabled from the start, no password can be echoed before keepassxc-cli disables it itself
+        started = time.perf_counter()
+        child = pexpect.spawn(command[0], command[1:], env=self._env, encoding=self._encoding, echo=False)
+        spawned = time.perf_counter()
+        self.metrics.spawn += spawned - started
+        child.delaybeforesend = None  # _answer_prompts() waits for the echo to be disabled instead
         stdout = self._run_expect(child)
         stderr = ''
         child.wait()
+        # the child has been reaped, so closing the terminal does not need to give the kernel time to update it
+        child.ptyproc.delayafterclose = 0
+        child.close()
+        self.metrics.run += time.perf_counter() - spawned
 
         # Note that lines are terminated by CR/LF (rn) combination even on UNIX-like systems
         # because this is the standard for pseudottys.
@@ -217,25 +485,236 @@ class DatabaseCommand(Command):
 
         return return_code, stdout.strip(), stderr.strip()
 
-    def _run_expect(self, child: pexpect.spawn) -> Optional[str]:
-        if self._database.has_password():
-            child.expect('Enter password to unlock {}: '.format(self._database.get_path()))
-            child.sendline(self._database.get_password())
+    def _run_expect(self, child: 'pexpect.spawn') -> Optional[str]:
+        import pexpect
+        self._answer_prompts(child)
         child.expect(pexpect.EOF)
         return child.before
 
+    def _get_unlock_prompts(self) -> List[Tuple[str, str]]:
+        """
+        :return: Pairs of prompt and password the command asks for, starting with the database itself.
+        """
+        prompts = self._get_prompts()
+        if self._database.has_password():
+            prompts.insert(0, (self.get_unlock_prompt(self._database), self._database.get_password()))
+        return prompts
+
+    def _answer_prompts(self, child: 'Union[pexpect.spawn, ShellProcess]'):
+        for prompt, password in self._get_unlock_prompts():
+            started = time.perf_counter()
+            child.expect_exact(prompt)
+            if not isinstance(child, ShellProcess):
+                self._wait_for_noecho(child)
+            self.metrics.add_prompt_wait(time.perf_counter() - started)
+            child.sendline(password)
+
+    @staticmethod
+    def _wait_for_noecho(child: 'pexpect.spawn', timeout: float = 5.0):
+        """
+        Waits until keepassxc-cli has disabled the terminal echo after printing a prompt,
+        so the password does not end up in the output.
+        """
+        delay = 0.0005
+        deadline = time.monotonic() + timeout
+        while child.getecho() and time.monotonic() < deadline:
+            time.sleep(delay)
+            delay = min(delay * 2, 0.01)
+
+    @staticmethod
+    def get_unlock_prompt(database: IDatabase) -> str:
+        return 'Enter password to unlock {}: '.format(database.get_path())
+
+    @staticmethod
+    def quote_interactive(string: str) -> str:
+        """
+        Quotes an argument for the interactive shell, which only knows double quotes and backslash escapes.
+        """
+        if len(string) == 0:
+            return '""'
+        return re.sub(r'([\\"\s])', r'\\\1', string)
+
+
+class OpenDatabaseCommand(DatabaseCommand):
+    def __init__(self, database: IDatabase):
+        super().__init__(database, 'open')
+
+    def spawn(self, timeout: int = 30) -> Tuple['ShellProcess', str]:
+        """
+        Starts the interactive shell and unlocks the database.
+
+        :param timeout: Seconds to wait for the shell to answer
+        :raise CalledProcessError: If the shell exits before prompting for a command.
+        :raise TimeoutExpired: If the shell does not prompt for a command within the timeout.
+        :return: The shell process and its command prompt.
+        """
+        command = self._build_command()
+        logging.debug('Executing command `{}`'.format(' '.join(self.quote(part) for part in command)))
+
+        self._start_metrics()
+        try:
+            started = time.perf_counter()
+            # pipes instead of a pseudo terminal keep line editing and input echo out of the output
+            child = ShellProcess(command, timeout, self._env, self._encoding)
+            spawned = time.perf_counter()
+            self.metrics.spawn += spawned - started
+            try:
+                self._answer_prompts(child)
+                unlocked = child.expect_end('> ')
+            except EOFError:
+                unlocked = False
+            except BaseException:
+                child.kill()
+                raise
+            self.metrics.run += time.perf_counter() - spawned
+            if not unlocked:
+                self.return_code = child.wait()
+                self.stdout = child.read_stdout().strip()
+                self.stderr = child.read_stderr().strip()
+                logging.error(self.stderr)
+                raise subprocess.CalledProcessError(self.return_code, command, self.stdout, self.stderr)
+
+            self.return_code = 0
+            return child, child.read_stdout().rsplit('\n', 1)[-1]
+        finally:
+            self._finish_metrics()
+
+
+class ShellProcess:
+    def __init__(self, command: List[str], timeout: float, env: Dict[str, str] = None, encoding: str = 'utf-8'):
+        """
+        A process driven through pipes, e.g. the interactive shell of `keepassxc-cli open`.
+        Unlike pexpect, STDOUT and STDERR are kept apart, so the output of a command can be told from its errors.
+        Both streams are read by threads, so a long output cannot block the process while the other one is awaited.
+
+        :param command: The command line of the process
+        :param timeout: Seconds to wait for the process to answer
+        :param env: [optional] The environment of the process
+        :param encoding: The encoding of the input and output
+        """
+        self.proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                     env=env)
+        self.timeout = timeout
+        # the STDERR that preceded the last match of expect_exact()
+        self.before = ''
+        self._encoding = encoding
+        self._output = {'stdout': [], 'stderr': []}  # type: Dict[str, List[str]]
+        # enough of the end of STDOUT to find a prompt without joining all of it
+        self._tail = ''
+        self._chunks = queue.Queue()  # type: queue.Queue
+        self._open_streams = 2
+        for name, stream in (('stdout', self.proc.stdout), ('stderr', self.proc.stderr)):
+            threading.Thread(target=self._read, args=(name, stream), daemon=True).start()
+
+    def sendline(self, line: str):
+        self.proc.stdin.write((line + '\n').encode(self._encoding))
+        self.proc.stdin.flush()
+
+    def expect_exact(self, string: str):
+        """
+        Waits for a string on STDERR, where keepassxc-cli prompts for passwords and reports errors.
+        STDERR up to the string is stored in `before`, the string itself is consumed.
+
+        :raise EOFError: If the process closed STDERR before printing the string.
+        :raise TimeoutExpired: If the string was not printed within the timeout.
+        """
+        if not self._read_until(lambda: string in self._get('stderr')):
+            raise EOFError('{} exited before printing {!r}.'.format(self.proc.args[0], string))
+        self.before, rest = self._get('stderr').split(string, 1)
+        self._output['stderr'] = [rest]
+
+    def expect_end(self, suffix: str) -> bool:
+        """
+        Waits until STDOUT ends with a suffix, e.g. the prompt of the shell.
+
+        :raise TimeoutExpired: If STDOUT did not end with the suffix within the timeout.
+        :return: Whether STDOUT ends with the suffix, `False` if the process closed STDOUT first.
+        """
+        if len(suffix) > 4096:
+            raise ValueError('Suffix is too long.')
+        return self._read_until(lambda: self._tail.endswith(suffix))
+
+    def read_stdout(self) -> str:
+        """
+        :return: The STDOUT collected so far, which is discarded.
+        """
+        output = self._get('stdout')
+        self._output['stdout'] = []
+        self._tail = ''
+        return output
+
+    def read_stderr(self) -> str:
+        """
+        :return: The STDERR collected so far, which is discarded.
+        """
+        output = self._get('stderr')
+        self._output['stderr'] = []
+        return output
+
+    def wait(self) -> int:
+        """
+        Closes STDIN and waits for the process to exit.
+
+        :raise TimeoutExpired: If the process did not exit within the timeout.
+        :return: The return code of the process.
+        """
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        self._read_until(lambda: False)
+        return self.proc.wait(self.timeout)
+
+    def kill(self):
+        self.proc.kill()
+        self.proc.wait()
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+
+    def _get(self, name: str) -> str:
+        chunks = self._output[name]
+        if len(chunks) > 1:
+            chunks[:] = [''.join(chunks)]
+        return chunks[0] if len(chunks) > 0 else ''
+
+    def _read(self, name: str, stream):
+        decoder = codecs.getincrementaldecoder(self._encoding)(errors='replace')
+        try:
+            for data in iter(lambda: stream.read1(65536), b''):
+                self._chunks.put((name, decoder.decode(data)))
+            self._chunks.put((name, decoder.decode(b'', final=True)))
+        finally:
+            stream.close()
+            self._chunks.put((name, None))
+
+    def _read_until(self, condition: Callable[[], bool]) -> bool:
+        deadline = time.monotonic() + self.timeout
+        while not condition():
+            if self._open_streams == 0:
+                return False
+            try:
+                name, text = self._chunks.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise subprocess.TimeoutExpired(self.proc.args, self.timeout)
+            if text is None:
+                self._open_streams -= 1
+            elif len(text) > 0:
+                self._output[name].append(text)
+                if name == 'stdout':
+                    self._tail = (self._tail + text)[-4096:]
+        return True
+
 
 class DatabaseInfoCommand(DatabaseCommand):
+    cacheable = True
+
     def __init__(self, database: IDatabase):
         super().__init__(database, 'db-info')
 
-    def execute(self, check: bool = True) -> dict:
-        output = super().execute()
-        assert len(output) > 0
-        return self._parse_output(output)
-
     @staticmethod
-    def _parse_output(output: str) -> dict:
+    def _parse_output(output: str) -> parsers.DatabaseInfo:
         """
         UUID: {deaedbd6-2d29-49f4-9357-3d16ca00e716}
         Name: Passwörter
@@ -244,14 +723,8 @@ class DatabaseInfoCommand(DatabaseCommand):
         KDF: Argon2 (20 rounds, 65536 KB)
         Recycle bin is enabled.
         """
-        info = {}
-        pattern = re.compile('^([A-Za-z]+):\s+(.*)$')
-        for line in output.splitlines():
-            m = pattern.match(line)
-            if m:
-                k, v = m.groups()
-                info[k.lower()] = v
-        return info
+        assert len(output) > 0
+        return parsers.parse_database_info(output)
 
 
 class AnalyzeDatabaseCommand(DatabaseCommand):
@@ -263,20 +736,44 @@ class AnalyzeDatabaseCommand(DatabaseCommand):
 
         super().__init__(database, 'analyze', options=options)
 
+    def _parse_output(self, output: str) -> List[parsers.Finding]:
+        return list(parsers.iter_findings(output))
+
 
 class ExportDatabaseCommand(DatabaseCommand):
+    cacheable = True
+    # in earlier versions "export" was called "extract" and could only export XML
+    aliases = ('extract',)
+
     def __init__(self, database: IDatabase, format: str = None):
+        """
+        The installed keepassxc-cli is checked for the format when the command is executed,
+        a format it does not support raises :py:class:`ValueError` then.
+        """
+        self._format = format
         if format is None:
             options = None
         else:
             assert format in ['xml', 'csv']
             options = ['--format', format]
 
-        # in earlier versions "export" was called "extract"
         super().__init__(database, 'export', options=options)
 
+    def _resolve(self):
+        super()._resolve()
+        if self._command == 'extract' and self._format is not None:
+            if not self._format == 'xml':
+                from capabilities import get_capabilities
+                raise ValueError('keepassxc-cli {} cannot export {}.'.format(get_capabilities().version, self._format))
+            # the format options come first
+            del self._options[:2]
+            del self._interactive_options[:2]
+
 
 class CompareDatabaseCommand(DatabaseCommand):
+    NOT_MODIFIED = parsers.NOT_MODIFIED
+    cacheable = True
+
     def __init__(self, database: IDatabase, database_from: IDatabase):
         self._database_from = database_from
 
@@ -292,16 +789,143 @@ class CompareDatabaseCommand(DatabaseCommand):
 
         super().__init__(database, 'merge', options=options, args=args)
 
-    def execute(self, check: bool = True) -> Set[str]:
-        output = super().execute(check)
-        return {l.strip() for l in output.splitlines(keepends=False)}
+    def get_cache_key(self) -> tuple:
+        from cache import credentials_key, fingerprint
+        return super().get_cache_key() + (
+            fingerprint(self._database_from.get_path()),
+            credentials_key(self._database_from.get_password(), self._database_from.get_key_file()))
 
-    def _run_expect(self, child: pexpect.spawn) -> Optional[str]:
-        if self._database.has_password():
-            child.expect('Enter password to unlock {}: '.format(self._database.get_path()))
-            child.sendline(self._database.get_password())
+    def _parse_output(self, output: str) -> Set[str]:
+        return {change.message for change in parsers.iter_merge_changes(output)}
+
+    def _get_prompts(self) -> List[Tuple[str, str]]:
         if self._database_from.has_password():
-            child.expect('Enter password to unlock {}: '.format(self._database_from.get_path()))
-            child.sendline(self._database_from.get_password())
-        child.expect('Database was not modified by merge operation.')
+            return [(self.get_unlock_prompt(self._database_from), self._database_from.get_password())]
+        return []
+
+    def _run_expect(self, child: 'pexpect.spawn') -> Optional[str]:
+        self._answer_prompts(child)
+        child.expect_exact(self.NOT_MODIFIED)
         return child.before
+
+
+class ListDatabaseCommand(DatabaseCommand):
+    def __init__(self, database: IDatabase, group: str = None, recursive: bool = False):
+        options = ['--recursive'] if recursive else None
+        args = None if group is None else [group]
+        super().__init__(database, 'ls', options=options, args=args)
+
+    def _parse_output(self, output: str) -> List[str]:
+        return [l for l in output.splitlines() if len(l.strip()) > 0]
+
+
+class SearchDatabaseCommand(DatabaseCommand):
+    # "search" was called "locate" before keepassxc-cli 2.6
+    aliases = ('locate',)
+
+    def __init__(self, database: IDatabase, term: str):
+        super().__init__(database, 'search', args=[term])
+
+    def _parse_output(self, output: str) -> List[str]:
+        return [l.strip() for l in output.splitlines() if len(l.strip()) > 0]
+
+
+class ShowEntryCommand(DatabaseCommand):
+    def __init__(self, database: IDatabase, entry: str):
+        super().__init__(database, 'show', args=[entry])
+
+    def _parse_output(self, output: str) -> dict:
+        """
+        Title: Test entry
+        UserName: garfield
+        Password: PROTECTED
+        URL: wikipedia.org
+        Notes:
+        """
+        return parsers.parse_attributes(output)
+
+
+class WriteDatabaseCommand(DatabaseCommand):
+    SUCCESS = 'Successfully'
+
+    def _parse_output(self, output: str) -> str:
+        """
+        The interactive shell has no exit status per command, a write has failed unless it reports its success.
+
+        :raise CalledProcessError: If the output is not a success message.
+        """
+        if self.SUCCESS not in output:
+            raise subprocess.CalledProcessError(1, self._build_interactive_command(), output, output)
+        return output
+
+
+class AddEntryCommand(WriteDatabaseCommand):
+    PASSWORD_PROMPT = 'Enter password for new entry: '
+
+    def __init__(self, database: IDatabase, entry: str, username: str = None, url: str = None, password: str = None,
+                 notes: str = None):
+        """
+        :param entry: Path of the new entry, e.g. 'websites/Wikipedia'
+        :param password: [optional] Password of the new entry, it is written to STDIN and never passed as argument
+        :param notes: [optional] Notes of the new entry, requires keepassxc-cli 2.6
+        """
+        self._password = password
+        super().__init__(database, 'add', options=_get_entry_options(username, url, password, notes), args=[entry])
+
+    def _get_prompts(self) -> List[Tuple[str, str]]:
+        if self._password is not None:
+            return [(self.PASSWORD_PROMPT, self._password)]
+        return []
+
+
+class EditEntryCommand(WriteDatabaseCommand):
+    PASSWORD_PROMPT = 'Enter new password for entry: '
+
+    def __init__(self, database: IDatabase, entry: str, title: str = None, username: str = None, url: str = None,
+                 password: str = None, notes: str = None):
+        """
+        Changes the given fields of an entry, the others are left as they are.
+
+        :param entry: Path of the entry, e.g. 'websites/Wikipedia'
+        :param title: [optional] New title of the entry
+        """
+        self._password = password
+        options = _get_entry_options(username, url, password, notes)
+        if title is not None:
+            options += ['--title', title]
+        super().__init__(database, 'edit', options=options, args=[entry])
+
+    def _get_prompts(self) -> List[Tuple[str, str]]:
+        if self._password is not None:
+            return [(self.PASSWORD_PROMPT, self._password)]
+        return []
+
+
+class RemoveEntryCommand(WriteDatabaseCommand):
+    def __init__(self, database: IDatabase, entry: str):
+        """
+        Moves an entry to the recycle bin, or deletes it if it already is in the recycle bin or there is none.
+        """
+        super().__init__(database, 'rm', args=[entry])
+
+
+class AddGroupCommand(WriteDatabaseCommand):
+    def __init__(self, database: IDatabase, group: str):
+        """
+        :param group: Path of the new group, its parent has to exist
+        """
+        super().__init__(database, 'mkdir', args=[group])
+
+
+def _get_entry_options(username: Optional[str], url: Optional[str], password: Optional[str],
+                       notes: Optional[str]) -> List[str]:
+    options = []
+    if username is not None:
+        options += ['--username', username]
+    if url is not None:
+        options += ['--url', url]
+    if notes is not None:
+        options += ['--notes', notes]
+    if password is not None:
+        options.append('--password-prompt')
+    return options
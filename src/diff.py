@@ -0,0 +1,93 @@
+from typing import Dict, Iterable, Optional, Set, Tuple
+from export import EntryRecord, Field
+
+
+class DatabaseSnapshot:
+    def __init__(self, entries: Iterable[EntryRecord], fingerprint: Optional[Tuple[int, int, int]] = None):
+        """
+        The content hashes of the entries of a database at one point in time, see :py:meth:`~entity.Database.snapshot`.
+        It holds no passwords or other secrets, only keyed hashes of them, which are valid within this process.
+
+        :param entries: Entries with digests, see :py:func:`export.iter_records`
+        :param fingerprint: [optional] Fingerprint of the database file the entries were read from
+        """
+        self.entries = {}  # type: Dict[str, EntryRecord]
+        for entry in entries:
+            assert entry.digests is not None, 'Entry {} has no digests.'.format(entry.uuid)
+            self.entries[entry.uuid] = entry
+        self.fingerprint = fingerprint
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def diff(self, baseline: 'DatabaseSnapshot') -> 'DatabaseDiff':
+        return diff(baseline, self)
+
+
+class EntryChange:
+    __slots__ = ('uuid', 'old', 'new', 'fields')
+
+    def __init__(self, old: EntryRecord, new: EntryRecord, fields: Set[Field]):
+        """
+        An entry that exists in both snapshots with different content.
+
+        :param old: The entry in the baseline
+        :param new: The entry now
+        :param fields: Names of the changed fields, e.g. {'Password', ('meta', 'Group')},
+            see :py:func:`export.digest_entry`
+        """
+        self.uuid = new.uuid
+        self.old = old
+        self.new = new
+        self.fields = fields
+
+    def __repr__(self) -> str:
+        return 'EntryChange({!r}, {})'.format(self.uuid, sorted(self.fields, key=str))
+
+
+class DatabaseDiff:
+    __slots__ = ('added', 'removed', 'modified')
+
+    def __init__(self, added: Dict[str, EntryRecord], removed: Dict[str, EntryRecord],
+                 modified: Dict[str, EntryChange]):
+        """
+        The changes from a baseline to the current content of a database, each keyed by entry UUID.
+        An entry moved to another group is modified, not removed and added.
+        """
+        self.added = added
+        self.removed = removed
+        self.modified = modified
+
+    def __bool__(self) -> bool:
+        return len(self.added) > 0 or len(self.removed) > 0 or len(self.modified) > 0
+
+    def get_uuids(self) -> Set[str]:
+        return set(self.added) | set(self.removed) | set(self.modified)
+
+    def __repr__(self) -> str:
+        return 'DatabaseDiff(added={}, removed={}, modified={})'.format(
+            len(self.added), len(self.removed), len(self.modified))
+
+
+def diff(baseline: DatabaseSnapshot, current: DatabaseSnapshot) -> DatabaseDiff:
+    """
+    Compares two snapshots by the content hashes of their entries, only entries with different hashes
+    are compared field by field.
+    """
+    if baseline is current:
+        return DatabaseDiff({}, {}, {})
+
+    added, modified = {}, {}
+    for uuid, entry in current.entries.items():
+        old = baseline.entries.get(uuid)
+        if old is None:
+            added[uuid] = entry
+        elif not old.digest == entry.digest:
+            modified[uuid] = EntryChange(old, entry, _get_changed_fields(old, entry))
+    removed = {uuid: entry for uuid, entry in baseline.entries.items() if uuid not in current.entries}
+    return DatabaseDiff(added, removed, modified)
+
+
+def _get_changed_fields(old: EntryRecord, new: EntryRecord) -> Set[Field]:
+    names = set(old.digests) | set(new.digests)
+    return {name for name in names if not old.digests.get(name) == new.digests.get(name)}
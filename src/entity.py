@@ -1,22 +1,40 @@
+import copy
+import hashlib
 import os
-import shutil
-from typing import Optional
+import subprocess
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Set, Union
+from cache import ResultCache, fingerprint
+from changes import AddEntry, BatchResult, Change
+from diff import DatabaseDiff, DatabaseSnapshot, diff
+from export import EntryRecord, GroupRecord, iter_records
+from fileops import CopyResult, copy_file, hash_file
+from hibp import HibpFile
+from parsers import DatabaseInfo, Finding, iter_findings, iter_lines
 from interface import IDatabase
+from session import DatabaseSession
+from watch import FileWatcher, Subscription, get_watcher
 import command
 
 
 class Database(IDatabase):
-    def __init__(self, path: str, password: str = None, key_file: str = None):
+    def __init__(self, path: str, password: str = None, key_file: str = None, cache: ResultCache = None):
         """
 
         :param path: Path to the database file
         :param password: [optional] Password to open the database
         :param key_file: [optional] Path to the key-file to open the database
+        :param cache: [optional] Cache for the results of read-only commands (info, export and compare).
+            Cached results are invalidated as soon as a database file is modified.
         """
         assert os.path.exists(path), 'Database at {} does not exist.'.format(path)
         self._path = os.path.abspath(path)
         self._password = password
         self._key_file = os.path.abspath(key_file) if key_file is not None else None
+        self._session = None
+        self._cache = cache
+        self._snapshot = None  # type: Optional[DatabaseSnapshot]
 
     def get_path(self) -> str:
         return self._path
@@ -33,35 +51,302 @@ class Database(IDatabase):
     def get_key_file(self) -> Optional[str]:
         return self._key_file
 
-    def get_info(self) -> dict:
-        return command.DatabaseInfoCommand(self).execute()
+    def get_cache(self) -> Optional[ResultCache]:
+        return self._cache
 
-    def compare(self, database_from: IDatabase):
-        return command.CompareDatabaseCommand(self, database_from).execute()
+    @contextmanager
+    def session(self, timeout: int = 30) -> Iterator[DatabaseSession]:
+        """
+        Unlocks the database once and keeps it open in an interactive `keepassxc-cli open` shell.
+        While the context is active, all commands of this database are sent into that shell.
+
+        >>> with database.session():
+        ...     database.get_info()
+        ...     database.export()
+
+        :param timeout: Seconds to wait for the shell to answer a command
+        :raise CalledProcessError: If the database could not be unlocked.
+        """
+        if self._session is not None:
+            yield self._session
+            return
+
+        with DatabaseSession(self, timeout) as session:
+            self._session = session
+            try:
+                yield session
+            finally:
+                self._session = None
+
+    def get_info(self) -> DatabaseInfo:
+        return self._execute(command.DatabaseInfoCommand(self))
+
+    def compare(self, database_from: IDatabase) -> Set[str]:
+        return self._execute(command.CompareDatabaseCommand(self, database_from))
 
     def export(self, format: str = None) -> str:
-        return command.ExportDatabaseCommand(self, format).execute()
+        return self._execute(command.ExportDatabaseCommand(self, format))
 
-    def export_to(self, target_path: str, format: str = None):
-        if os.path.exists(target_path):
-            raise IOError('File at {} already exists.'.format(target_path))
-        content = self.export(format=format)
-        with open(target_path, 'w') as f:
-            f.write(content)
-        with open(target_path, 'r') as f:
-            exported_content = f.read()
-        if not exported_content == content:
-            os.remove(target_path)
-            raise IOError
+    def analyze(self, hibp_path: str = None) -> Iterator[Finding]:
+        """
+        Analyzes the passwords of the database for weaknesses with keepassxc-cli and yields the findings
+        while it is still running. See :py:meth:`find_leaked` to check the passwords in-process instead.
+
+        :param hibp_path: [optional] Path to a file of leaked password hashes from https://haveibeenpwned.com
+        """
+        analyze_command = command.AnalyzeDatabaseCommand(self, hibp_path)
+        if self._session is not None:
+            yield from analyze_command.execute_in(self._session)
+        else:
+            yield from iter_findings(iter_lines(analyze_command.stream()))
+
+    def find_leaked(self, hibp: Union[str, HibpFile]) -> Iterator[Finding]:
+        """
+        Looks up the SHA-1 of every password of an XML export in a file of leaked password hashes
+        (see :py:class:`hibp.HibpFile`) and yields a finding per leaked password as the export is parsed.
+        Entries without a password are skipped.
+
+        :param hibp: The file of leaked password hashes or its path
+        """
+        hibp_file = HibpFile(hibp) if isinstance(hibp, str) else hibp
+        try:
+            for record in iter_records(self.export_iter(format='xml'), password_hashes=True):
+                if isinstance(record, EntryRecord) and record.password_sha1 is not None:
+                    count = hibp_file.get_hash_count(record.password_sha1)
+                    if count > 0:
+                        # like keepassxc-cli, the path without the root group
+                        yield Finding('leaked', record.path.lstrip('/'), count, record.uuid)
+        finally:
+            if hibp_file is not hibp:
+                hibp_file.close()
+
+    def apply(self, changes: Iterable[Change], check: bool = True) -> BatchResult:
+        """
+        Writes many changes in a single :py:meth:`session`, so the database is unlocked once for the whole batch
+        instead of once per change. keepassxc-cli still saves the database after every change.
+
+        >>> database.apply([AddGroup('websites'), AddEntry('websites/Wikipedia', password='monday123'),
+        ...                 RemoveEntry('Old entry')])
+        BatchResult(applied=3, errors=0, duration=1.372, rate=2.2/s)
 
-    def copy_to(self, target_path: str):
+        :param changes: :py:class:`~changes.AddEntry`, :py:class:`~changes.EditEntry`,
+            :py:class:`~changes.RemoveEntry` and :py:class:`~changes.AddGroup` in the order they are applied
+        :param check: Stop at the first change that fails instead of collecting the errors in the result.
+            Without `check`, all changes after the session has failed are collected as errors with its exception.
+        :raise CalledProcessError: If the database could not be unlocked or a change failed and `check` is set.
+        :raise IOError: If the session failed and `check` is set.
+        """
+        result = BatchResult()
+        started = time.perf_counter()
+        changes = iter(changes)
+        try:
+            with self.session():
+                for change in changes:
+                    try:
+                        self._run(change.get_command(self))
+                    except subprocess.CalledProcessError as e:
+                        if check:
+                            raise
+                        result.errors.append((change, e))
+                    except (OSError, subprocess.TimeoutExpired) as e:
+                        # the shell has exited or stopped answering, none of the remaining changes can be written
+                        if check:
+                            raise
+                        result.errors.append((change, e))
+                        result.errors += [(remaining, e) for remaining in changes]
+                    else:
+                        result.applied += 1
+        finally:
+            result.duration = time.perf_counter() - started
+        return result
+
+    def create_entries(self, entries: Iterable[AddEntry], check: bool = True) -> BatchResult:
+        """
+        Adds many entries in a single session, see :py:meth:`apply`.
+        """
+        return self.apply(entries, check)
+
+    def create_entry(self, path: str, username: str = None, url: str = None, password: str = None,
+                     notes: str = None):
+        """
+        Adds an entry. To add many, use :py:meth:`create_entries`.
+
+        :param path: Path of the new entry, e.g. 'websites/Wikipedia'
+        :raise CalledProcessError: If the entry could not be added.
+        """
+        self._run(command.AddEntryCommand(self, path, username, url, password, notes))
+
+    def list_entries(self, group: str = None, recursive: bool = False) -> List[str]:
+        """
+        Lists the entries and groups of a group.
+
+        :param group: Path of the group, defaults to the root group
+        :param recursive: Also list the contents of subgroups
+        :return: Names of the entries and groups (groups end with a slash)
+        """
+        return self._execute(command.ListDatabaseCommand(self, group, recursive))
+
+    def search(self, term: str) -> List[str]:
+        """
+        Finds entries quickly.
+
+        :param term: Search term
+        :return: Paths of the matching entries
+        """
+        return self._execute(command.SearchDatabaseCommand(self, term))
+
+    def show_entry(self, entry: str) -> dict:
+        """
+        Shows the attributes of an entry. Protected attributes are masked.
+
+        :param entry: Path of the entry
+        :return: Attribute names (lower case) and values
+        """
+        return self._execute(command.ShowEntryCommand(self, entry))
+
+    def _execute(self, database_command: command.DatabaseCommand) -> Any:
+        if self._cache is None or not database_command.cacheable:
+            return self._run(database_command)
+
+        key = database_command.get_cache_key()
+        found, result = self._cache.get(key)
+        if not found:
+            result = self._run(database_command)
+            self._cache.set(key, result)
+        # callers may modify the dictionaries and sets they get
+        return copy.copy(result)
+
+    def _run(self, database_command: command.DatabaseCommand) -> Any:
+        if self._session is not None:
+            return database_command.execute_in(self._session)
+        return database_command.execute()
+
+    def export_iter(self, format: str = None, chunk_size: int = 65536) -> Iterator[str]:
+        """
+        Exports the content of the database in the specified format and yields it in chunks
+        while keepassxc-cli is still writing it. Inside a :py:meth:`session` or with a cache
+        the export is yielded at once.
+        WARNING: Passwords are extracted in plaintext!
+
+        :param format: The output format ('xml' or 'csv')
+        :param chunk_size: Maximum number of characters per chunk
+        """
+        export_command = command.ExportDatabaseCommand(self, format)
+        if self._cache is not None:
+            yield self._execute(export_command)
+        elif self._session is not None:
+            yield export_command.execute_in(self._session)
+        else:
+            yield from export_command.stream(chunk_size)
+
+    def iter_entries(self) -> Iterator[EntryRecord]:
+        """
+        Yields the entries of the database, parsed incrementally from an XML export.
+        Entries in the history of other entries are skipped.
+        """
+        for record in iter_records(self.export_iter(format='xml')):
+            if isinstance(record, EntryRecord):
+                yield record
+
+    def iter_groups(self) -> Iterator[GroupRecord]:
+        """
+        Yields the groups of the database, parsed incrementally from an XML export.
+        """
+        for record in iter_records(self.export_iter(format='xml')):
+            if isinstance(record, GroupRecord):
+                yield record
+
+    def snapshot(self) -> DatabaseSnapshot:
+        """
+        Hashes the content of every entry. The snapshot is kept until the database file changes,
+        so repeated calls on an unchanged file neither unlock nor export the database.
+        """
+        current = fingerprint(self._path)
+        snapshot = self._snapshot
+        if snapshot is None or not snapshot.fingerprint == current:
+            records = iter_records(self.export_iter(format='xml'), digests=True)
+            snapshot = DatabaseSnapshot((record for record in records if isinstance(record, EntryRecord)), current)
+            self._snapshot = snapshot
+        return snapshot
+
+    def diff(self, other: Union['Database', DatabaseSnapshot]) -> DatabaseDiff:
+        """
+        Compares the entries of this database with a baseline: `added` entries exist only here, `removed` entries
+        only in the baseline and `modified` entries in both with different content. Only entries whose content
+        hashes differ are compared, and the snapshots of both databases are reused while their files do not change.
+
+        >>> baseline = database.snapshot()
+        >>> # ... the database is synchronized ...
+        >>> changes = database.diff(baseline)
+
+        :param other: The baseline, another database (e.g. an older copy) or an earlier snapshot
+        """
+        baseline = other if isinstance(other, DatabaseSnapshot) else other.snapshot()
+        return diff(baseline, self.snapshot())
+
+    def watch(self, callback: Callable[['Database'], None] = None, watcher: FileWatcher = None) -> Subscription:
+        """
+        Watches the database file, so views derived from it can be refreshed as soon as it changes instead of
+        on a timer. On a change the snapshot is dropped and `callback` is called with this database,
+        in the thread of the watcher.
+
+        >>> subscription = database.watch(lambda database: print(database.diff(baseline)))
+        >>> subscription.cancel()
+
+        :param callback: [optional] Called each time the file has changed
+        :param watcher: [optional] The watcher, by default one shared by all databases, see :py:func:`watch.get_watcher`
+        """
+        def on_change(database: 'Database'):
+            database._snapshot = None
+            if callback is not None:
+                callback(database)
+
+        return (watcher if watcher is not None else get_watcher()).subscribe(self, on_change)
+
+    def export_to(self, target_path: str, format: str = None) -> str:
+        """
+        Writes an export to a new file, see :py:meth:`export_iter`.
+
+        :return: BLAKE2b hash of the written file, in hexadecimal digits, see :py:func:`fileops.hash_file`
+        :raise IOError: If the file exists or differs from the export once it is written.
+        """
         if os.path.exists(target_path):
             raise IOError('File at {} already exists.'.format(target_path))
-        shutil.copyfile(self._path, target_path)
-        with open(self._path, 'r') as f:
-            source_content = f.read()
-        with open(target_path, 'r') as f:
-            target_content = f.read()
-        if not source_content == target_content:
+        return self._write_to(target_path, self.export_iter(format=format))
+
+    @staticmethod
+    def _write_to(target_path: str, chunks: Iterable[str]) -> str:
+        """
+        Writes the chunks to a new file, hashing them on the way, so the content is never held in memory
+        as a whole. Once the file is synced to disk, it is read back in chunks and its hash compared to the one
+        of the content. Only a file created by this call is removed if anything fails.
+
+        :return: BLAKE2b hash of the written content, in hexadecimal digits
+        :raise FileExistsError: If the file exists.
+        :raise IOError: If the written file differs from the content.
+        """
+        digest = hashlib.blake2b()
+        f = open(target_path, 'x+b')
+        try:
+            with f:
+                for chunk in chunks:
+                    data = chunk.encode('utf-8')
+                    digest.update(data)
+                    f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+                if not hash_file(f.fileno()) == digest.hexdigest():
+                    raise IOError('Verification of {} failed.'.format(target_path))
+        except BaseException:
             os.remove(target_path)
-            raise IOError
+            raise
+        return digest.hexdigest()
+
+    def copy_to(self, target_path: str, overwrite: bool = False) -> CopyResult:
+        """
+        Copies the database file atomically and verifies the copy, see :py:func:`fileops.copy_file`.
+
+        :param target_path: The path of the copy
+        :param overwrite: Replace an existing file instead of raising :py:class:`FileExistsError`
+        """
+        return copy_file(self._path, target_path, overwrite=overwrite)
@@ -0,0 +1,278 @@
+import base64
+import binascii
+import gzip
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from xml.etree.ElementTree import Element, XMLPullParser, tostring
+
+EPOCH = datetime(1, 1, 1, tzinfo=timezone.utc)
+
+# content digests are keyed, so they reveal nothing about passwords, the key never leaves the process
+_digest_key = os.urandom(32)
+
+# the name of a field of an entry, a custom string by its key or a namespaced field like ('meta', 'Group')
+Field = Union[str, Tuple[str, str]]
+
+
+class GroupRecord:
+    __slots__ = ('uuid', 'name', 'path')
+
+    def __init__(self, uuid: str, name: str, path: str):
+        """
+        A group of an exported database.
+
+        :param uuid: UUID as 32 hexadecimal digits
+        :param name: Name of the group
+        :param path: Path of the group, the root group is '/'
+        """
+        self.uuid = uuid
+        self.name = name
+        self.path = path
+
+    def __repr__(self) -> str:
+        return 'GroupRecord({!r}, {!r})'.format(self.uuid, self.path)
+
+
+class EntryRecord:
+    __slots__ = ('uuid', 'group', 'title', 'username', 'url', 'created', 'modified', 'accessed', 'expires',
+                 'digest', 'digests', 'password_sha1')
+
+    def __init__(self, uuid: str, group: str, title: str = None, username: str = None, url: str = None,
+                 created: datetime = None, modified: datetime = None, accessed: datetime = None,
+                 expires: datetime = None, digests: Dict[Field, bytes] = None, password_sha1: bytes = None):
+        """
+        An entry of an exported database, without its password, notes and history.
+
+        :param uuid: UUID as 32 hexadecimal digits
+        :param group: Path of the group containing the entry
+        :param expires: Expiry time, `None` if the entry does not expire
+        :param digests: [optional] Keyed hashes of the entry's fields (see :py:func:`digest_entry`)
+        :param password_sha1: [optional] Unsalted SHA-1 of the password to look it up in breach lists,
+            `None` if the entry has no password
+        """
+        self.uuid = uuid
+        self.group = group
+        self.title = title
+        self.username = username
+        self.url = url
+        self.created = created
+        self.modified = modified
+        self.accessed = accessed
+        self.expires = expires
+        self.digests = digests
+        self.password_sha1 = password_sha1
+        self.digest = None if digests is None else _digest(b''.join(
+            '\0'.join(name).encode('utf-8') + b'\0\0' + value
+            for name, value in sorted((_get_namespaced(name), value) for name, value in digests.items())))
+
+    @property
+    def path(self) -> str:
+        return '{}/{}'.format(self.group.rstrip('/'), self.title or '')
+
+    def __repr__(self) -> str:
+        return 'EntryRecord({!r}, {!r})'.format(self.uuid, self.path)
+
+
+class _OpenGroup:
+    __slots__ = ('uuid', 'name', 'path', 'reported')
+
+    def __init__(self, parent: Optional['_OpenGroup']):
+        self.uuid = None
+        self.name = None
+        self.path = '/' if parent is None else None
+        self.reported = False
+
+
+def iter_records(chunks: Iterable[str], digests: bool = False, password_hashes: bool = False) \
+        -> Iterator[Union[GroupRecord, EntryRecord]]:
+    """
+    Parses an XML export incrementally and yields its groups and entries in document order.
+    Every group is yielded before its entries and subgroups. Elements are discarded as soon as they have been
+    processed, so the memory used is bounded by the largest entry rather than the size of the database.
+
+    :param chunks: The XML export, e.g. from :py:meth:`~entity.Database.export_iter`
+    :param digests: Hash the content of the entries, see :py:func:`digest_entry`
+    :param password_hashes: Hash the passwords of the entries with SHA-1, see :py:class:`hibp.HibpFile`
+    """
+    parser = XMLPullParser(events=('start', 'end'))
+    stack = []  # type: List[Element]
+    groups = []  # type: List[_OpenGroup]
+    history = 0
+    binaries = {}  # type: Dict[str, bytes]
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if event == 'start':
+                if element.tag == 'History':
+                    history += 1
+                elif history == 0 and element.tag in ('Group', 'Entry') and len(groups) > 0:
+                    yield from _report_group(groups)
+                if element.tag == 'Group' and history == 0:
+                    groups.append(_OpenGroup(groups[-1] if len(groups) > 0 else None))
+                stack.append(element)
+                continue
+
+            stack.pop()
+            parent = stack[-1] if len(stack) > 0 else None
+            if element.tag == 'History':
+                history -= 1
+            elif history > 0:
+                continue
+            elif element.tag == 'Entry':
+                yield _parse_entry(element, groups[-1].path, digests, password_hashes, binaries)
+                parent.remove(element)
+            elif element.tag == 'Group':
+                yield from _report_group(groups)
+                groups.pop()
+                parent.remove(element)
+            elif parent is not None and parent.tag == 'Group' and element.tag in ('UUID', 'Name'):
+                group = groups[-1]
+                if element.tag == 'UUID':
+                    group.uuid = _parse_uuid(element.text)
+                else:
+                    group.name = element.text or ''
+                    if len(groups) > 1:
+                        group.path = '{}/{}'.format(groups[-2].path.rstrip('/'), group.name)
+            elif element.tag in ('Meta', 'DeletedObjects'):
+                if element.tag == 'Meta' and digests:
+                    # the attachments shared by the entries, only their digests are kept
+                    binaries = digest_binaries(element)
+                parent.remove(element)
+    parser.close()
+
+
+def _report_group(groups: List[_OpenGroup]) -> Iterator[GroupRecord]:
+    group = groups[-1]
+    if not group.reported:
+        group.reported = True
+        yield GroupRecord(group.uuid, group.name, group.path)
+
+
+def _parse_entry(element: Element, group: str, digests: bool = False, password_hashes: bool = False,
+                 binaries: Dict[str, bytes] = None) -> EntryRecord:
+    strings = {}
+    for string in element.iterfind('String'):
+        strings[string.findtext('Key')] = string.findtext('Value')
+
+    times = element.find('Times')
+    if times is None:
+        times = Element('Times')
+    expires = times.findtext('Expires', 'False') == 'True'
+
+    return EntryRecord(
+        uuid=_parse_uuid(element.findtext('UUID')),
+        group=group,
+        title=strings.get('Title'),
+        username=strings.get('UserName'),
+        url=strings.get('URL'),
+        created=parse_time(times.findtext('CreationTime')),
+        modified=parse_time(times.findtext('LastModificationTime')),
+        accessed=parse_time(times.findtext('LastAccessTime')),
+        expires=parse_time(times.findtext('ExpiryTime')) if expires else None,
+        digests=digest_entry(element, group, binaries) if digests else None,
+        password_sha1=hashlib.sha1(strings['Password'].encode('utf-8')).digest()
+        if password_hashes and strings.get('Password') else None
+    )
+
+
+def digest_entry(element: Element, group: str, binaries: Dict[str, bytes] = None) -> Dict[Field, bytes]:
+    """
+    Hashes each field of an entry that a user can change: its strings by key (e.g. 'Password'),
+    ('meta', 'Group'), ('meta', 'Expires'), ('meta', 'Tags'), ('meta', 'Icon'), ('meta', 'Colors'),
+    ('meta', 'AutoType') and the content of its attachments (('attachment', <name>)), so a string named
+    like one of the other fields does not collide with it.
+    Times that change without a user's intent (last access, usage count) and the history are left out.
+
+    :param element: The `Entry` element of an XML export
+    :param group: Path of the group containing the entry
+    :param binaries: [optional] Digests of the attachments the entry refers to, by ID, see :py:func:`digest_binaries`
+    """
+    fields = {('meta', 'Group'): group}  # type: Dict[Field, str]
+    for string in element.iterfind('String'):
+        fields[string.findtext('Key') or ''] = string.findtext('Value') or ''
+    times = element.find('Times')
+    if times is not None and times.findtext('Expires') == 'True':
+        fields[('meta', 'Expires')] = times.findtext('ExpiryTime') or ''
+    fields[('meta', 'Tags')] = element.findtext('Tags') or ''
+    fields[('meta', 'Icon')] = '{}/{}'.format(element.findtext('IconID') or '',
+                                              element.findtext('CustomIconUUID') or '')
+    fields[('meta', 'Colors')] = '{}/{}'.format(element.findtext('ForegroundColor') or '',
+                                                element.findtext('BackgroundColor') or '')
+    auto_type = element.find('AutoType')
+    if auto_type is not None:
+        fields[('meta', 'AutoType')] = tostring(auto_type, encoding='unicode')
+    digests = {name: _digest(value.encode('utf-8')) for name, value in fields.items()}
+
+    for binary in element.iterfind('Binary'):
+        value = binary.find('Value')
+        if value is None:
+            digest = _digest(b'')
+        elif value.get('Ref') is not None:
+            # an unknown reference is kept apart from any content
+            digest = (binaries or {}).get(value.get('Ref')) or _digest(b'Ref\0' + value.get('Ref').encode('utf-8'))
+        else:
+            digest = _digest(_decode_binary(value))
+        digests[('attachment', binary.findtext('Key') or '')] = digest
+    return digests
+
+
+def digest_binaries(meta: Element) -> Dict[str, bytes]:
+    """
+    Hashes the content of the attachments of a database, which its entries refer to by ID.
+
+    :param meta: The `Meta` element of an XML export
+    :return: The digests by ID
+    """
+    return {binary.get('ID', ''): _digest(_decode_binary(binary)) for binary in meta.iterfind('Binaries/Binary')}
+
+
+def _decode_binary(element: Element) -> bytes:
+    try:
+        data = base64.b64decode(element.text or '')
+    except binascii.Error:
+        return (element.text or '').encode('utf-8')
+    if element.get('Compressed') == 'True':
+        try:
+            return gzip.decompress(data)
+        except (OSError, EOFError):
+            return data
+    return data
+
+
+def _get_namespaced(name: Field) -> Tuple[str, str]:
+    return ('string', name) if isinstance(name, str) else name
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, key=_digest_key, digest_size=16).digest()
+
+
+def _parse_uuid(text: Optional[str]) -> Optional[str]:
+    if text is None:
+        return None
+    try:
+        data = base64.b64decode(text, validate=True)
+    except binascii.Error:
+        return text
+    return data.hex() if len(data) == 16 else text
+
+
+def parse_time(text: Optional[str]) -> Optional[datetime]:
+    """
+    Parses a time of a KeePass XML file, either in ISO 8601 format (KDBX 3.1)
+    or as base64 encoded seconds since 0001-01-01 (KDBX 4).
+    """
+    if text is None or len(text) == 0:
+        return None
+    try:
+        return datetime.strptime(text, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+    except ValueError:
+        pass
+    try:
+        data = base64.b64decode(text, validate=True)
+        return EPOCH + timedelta(seconds=int.from_bytes(data, 'little', signed=True))
+    except (binascii.Error, OverflowError):
+        return None
@@ -0,0 +1,232 @@
+import errno
+import hashlib
+import os
+import stat
+import sys
+import tempfile
+from typing import Callable
+
+CHUNK_SIZE = 1024 * 1024
+# ioctl FICLONE of Linux, shares the extents of a file on btrfs, XFS and other copy-on-write filesystems
+FICLONE = 0x40049409
+# errors of a reflink, copy_file_range and sendfile meaning "not possible here", the copy falls back to the next method,
+# any other error (e.g. EPERM or EBADF) is raised
+_UNSUPPORTED = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOTTY}
+
+
+class CopyResult:
+    __slots__ = ('path', 'size', 'digest', 'method')
+
+    def __init__(self, path: str, size: int, digest: str, method: str):
+        """
+        A verified copy of a file, see :py:func:`copy_file`.
+
+        :param path: Path of the copy
+        :param size: Bytes copied
+        :param digest: BLAKE2b hash of the content, in hexadecimal digits
+        :param method: How the data has been copied, 'reflink', 'copy_file_range', 'sendfile' or 'read'
+        """
+        self.path = path
+        self.size = size
+        self.digest = digest
+        self.method = method
+
+    def __repr__(self) -> str:
+        return 'CopyResult({!r}, size={}, method={!r})'.format(self.path, self.size, self.method)
+
+
+def copy_file(source_path: str, target_path: str, verify: bool = True, overwrite: bool = False,
+              digest: str = None) -> CopyResult:
+    """
+    Copies a file atomically, without reading it into memory: a reflink where the filesystem supports it,
+    otherwise copy_file_range or sendfile within the kernel, otherwise chunk by chunk. The copy is written
+    to a temporary file next to the target, synced to disk and then renamed, so the target is either
+    missing or complete, even after a crash.
+
+    :param source_path: The file to copy
+    :param target_path: The path of the copy
+    :param verify: Compare the hashes of the source and the synced copy, reading both in chunks
+    :param overwrite: Replace an existing file at the target instead of raising :py:class:`FileExistsError`
+    :param digest: [optional] The expected hash of the source, see :py:func:`hash_file`
+    :raise IOError: If the copy differs from the source or the source has not the expected hash,
+        the target is left untouched.
+    """
+    target_path = os.path.abspath(target_path)
+    if not overwrite and os.path.lexists(target_path):
+        raise FileExistsError(errno.EEXIST, 'File at {} already exists.'.format(target_path), target_path)
+    directory, name = os.path.split(target_path)
+
+    with open(source_path, 'rb') as source:
+        source_stat = os.fstat(source.fileno())
+        fd, temp_path = tempfile.mkstemp(prefix='.{}.'.format(name), suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as target:
+                os.fchmod(target.fileno(), stat.S_IMODE(source_stat.st_mode))
+                method = _copy(source.fileno(), target.fileno(), source_stat.st_size)
+                target.flush()
+                os.fsync(target.fileno())
+                size = os.fstat(target.fileno()).st_size
+                # the verification reads the copy back from the disk instead of the page cache
+                _advise(target.fileno(), 'POSIX_FADV_DONTNEED')
+            # the source is hashed through the open file, so a KeePassXC that replaces the file meanwhile
+            # does not make the copy fail
+            source_digest = hash_file(source.fileno())
+            if digest is not None and not source_digest == digest:
+                raise IOError('{} does not have the expected hash.'.format(source_path))
+            digest = source_digest
+            if verify and not hash_path(temp_path) == digest:
+                raise IOError('Copy of {} at {} is corrupted.'.format(source_path, target_path))
+            _rename(temp_path, target_path, overwrite)
+        except BaseException:
+            if os.path.lexists(temp_path):
+                os.remove(temp_path)
+            raise
+    _sync_directory(directory)
+    return CopyResult(target_path, size, digest, method)
+
+
+def write_file(path: str, data: bytes):
+    """
+    Writes a small file atomically: to a temporary file next to it, synced to disk and renamed.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix='.{}.'.format(os.path.basename(path)), suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.lexists(temp_path):
+            os.remove(temp_path)
+        raise
+    _sync_directory(directory)
+
+
+def hash_file(fd: int, chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    :param fd: An open file, read from its start with pread, the file position is not changed
+    :return: BLAKE2b hash of the content, in hexadecimal digits
+    """
+    digest = hashlib.blake2b()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    offset = 0
+    while True:
+        count = _pread_into(fd, buffer, offset)
+        if count == 0:
+            return digest.hexdigest()
+        digest.update(view[:count])
+        offset += count
+
+
+def hash_path(path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    with open(path, 'rb') as f:
+        _advise(f.fileno(), 'POSIX_FADV_SEQUENTIAL')
+        return hash_file(f.fileno(), chunk_size)
+
+
+def _copy(source: int, target: int, size: int) -> str:
+    copies = [('reflink', _reflink), ('copy_file_range', _copy_file_range), ('sendfile', _sendfile)]
+    for method, copy in copies:
+        try:
+            if copy(source, target, size):
+                return method
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED:
+                raise
+        # a method that stopped half way leaves a partial copy
+        os.ftruncate(target, 0)
+        os.lseek(target, 0, os.SEEK_SET)
+    _read_write(source, target)
+    return 'read'
+
+
+def _reflink(source: int, target: int, size: int) -> bool:
+    import fcntl
+    if not sys.platform.startswith('linux'):
+        return False
+    fcntl.ioctl(target, FICLONE, source)
+    return True
+
+
+def _copy_file_range(source: int, target: int, size: int) -> bool:
+    if not hasattr(os, 'copy_file_range'):
+        return False
+    return _copy_all(lambda offset, count: os.copy_file_range(source, target, count, offset, offset), size)
+
+
+def _sendfile(source: int, target: int, size: int) -> bool:
+    # sendfile to a regular file is possible on Linux only
+    if not hasattr(os, 'sendfile') or not sys.platform.startswith('linux'):
+        return False
+    return _copy_all(lambda offset, count: os.sendfile(target, source, offset, count), size)
+
+
+def _copy_all(copy: Callable[[int, int], int], size: int) -> bool:
+    offset = 0
+    while True:
+        count = copy(offset, max(size - offset, CHUNK_SIZE))
+        if count == 0:
+            return True
+        offset += count
+
+
+def _read_write(source: int, target: int):
+    buffer = bytearray(CHUNK_SIZE)
+    view = memoryview(buffer)
+    offset = 0
+    while True:
+        count = _pread_into(source, buffer, offset)
+        if count == 0:
+            return
+        written = 0
+        while written < count:
+            written += os.write(target, view[written:count])
+        offset += count
+
+
+def _pread_into(fd: int, buffer: bytearray, offset: int) -> int:
+    if hasattr(os, 'preadv'):
+        return os.preadv(fd, [buffer], offset)
+    data = os.pread(fd, len(buffer), offset)
+    buffer[:len(data)] = data
+    return len(data)
+
+
+def _rename(temp_path: str, target_path: str, overwrite: bool):
+    if overwrite:
+        os.replace(temp_path, target_path)
+        return
+    # a hard link fails if the target has been created meanwhile, unlike a rename
+    try:
+        os.link(temp_path, target_path)
+    except FileExistsError:
+        raise FileExistsError(errno.EEXIST, 'File at {} already exists.'.format(target_path), target_path)
+    except OSError:
+        # filesystems without hard links
+        if os.path.lexists(target_path):
+            raise FileExistsError(errno.EEXIST, 'File at {} already exists.'.format(target_path), target_path)
+        os.rename(temp_path, target_path)
+        return
+    os.remove(temp_path)
+
+
+def _sync_directory(directory: str):
+    # makes the rename durable, not possible on all platforms
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _advise(fd: int, advice: str):
+    if hasattr(os, 'posix_fadvise') and hasattr(os, advice):
+        os.posix_fadvise(fd, 0, 0, getattr(os, advice))
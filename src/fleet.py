@@ -0,0 +1,145 @@
+import struct
+import time
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Union
+import kdbx
+import parallel
+from interface import IDatabase
+from watch import FileWatcher, Subscription, get_watcher
+
+# memory of a keepassxc-cli process besides its KDF
+BASE_MEMORY = 32 * 1024 * 1024
+# assumed KDF memory of a database whose header cannot be read (the default of KeePassXC)
+DEFAULT_KDF_MEMORY = 64 * 1024 * 1024
+
+
+class DatabaseResult:
+    __slots__ = ('database', 'result', 'error', 'duration')
+
+    def __init__(self, database: IDatabase, result: Any = None, error: BaseException = None, duration: float = 0.0):
+        """
+        The outcome of an operation on one database of a :py:class:`DatabaseSet`.
+
+        :param result: The return value of the operation
+        :param error: The exception raised by the operation
+        :param duration: Seconds the operation took
+        """
+        self.database = database
+        self.result = result
+        self.error = error
+        self.duration = duration
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def get(self) -> Any:
+        """
+        :raise: The exception of the operation, if any.
+        :return: The return value of the operation.
+        """
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def __repr__(self) -> str:
+        return 'DatabaseResult({!r}, {})'.format(self.database.get_path(), 'ok' if self.ok else repr(self.error))
+
+
+def estimate_memory(database: IDatabase) -> int:
+    """
+    Estimates the memory needed to unlock a database from the KDF parameters in its unencrypted header.
+
+    :return: Bytes
+    """
+    try:
+        with open(database.get_path(), 'rb') as f:
+            header = kdbx.read_header(memoryview(f.read(65536)), database.get_path())
+    except (OSError, ValueError, IndexError, KeyError, struct.error):
+        return BASE_MEMORY + DEFAULT_KDF_MEMORY
+    return BASE_MEMORY + header.kdf_parameters.get('M', 0)
+
+
+def get_workers(databases: List[IDatabase], max_workers: int = None) -> int:
+    """
+    :return: As many workers as there are CPUs and as fit into the available memory
+        when each unlocks the most memory-hard of the databases, at most `max_workers`.
+    """
+    memory = max((estimate_memory(database) for database in databases), default=BASE_MEMORY)
+    workers = min(parallel.get_default_workers(memory), max(len(databases), 1))
+    return workers if max_workers is None else max(min(workers, max_workers), 1)
+
+
+def run_many(databases: Iterable[IDatabase], operation: Union[str, Callable[[IDatabase], Any]],
+             max_workers: int = None, ordered: bool = False) -> Iterator[DatabaseResult]:
+    """
+    Runs an operation on many databases in parallel and yields a result per database as soon as it is done.
+    An exception raised for one database is part of its result and does not stop the others.
+    Every operation spends its time in keepassxc-cli or in a KDF that releases the GIL, so threads suffice.
+
+    >>> for result in run_many(databases, 'get_info'):
+    ...     print(result.database.get_path(), result.result if result.ok else result.error)
+
+    :param databases: The databases
+    :param operation: Name of a method of the databases without arguments or a function called with each database
+    :param max_workers: [optional] Maximum number of parallel operations, see :py:func:`get_workers`
+    :param ordered: Yield the results in the order of the databases instead of as they finish
+    """
+    databases = list(databases)
+    if isinstance(operation, str):
+        name = operation
+        operation = lambda database: getattr(database, name)()
+
+    def run(database: IDatabase) -> DatabaseResult:
+        started = time.perf_counter()
+        try:
+            return DatabaseResult(database, result=operation(database), duration=time.perf_counter() - started)
+        except Exception as e:
+            return DatabaseResult(database, error=e, duration=time.perf_counter() - started)
+
+    if len(databases) == 0:
+        return iter([])
+    return parallel.imap(run, databases, workers=get_workers(databases, max_workers), ordered=ordered)
+
+
+class DatabaseSet:
+    def __init__(self, databases: Iterable[IDatabase] = (), max_workers: int = None):
+        """
+        A fleet of databases that are operated on in parallel, see :py:func:`run_many`.
+
+        :param databases: The databases
+        :param max_workers: [optional] Maximum number of parallel operations
+        """
+        self._databases = list(databases)
+        self._max_workers = max_workers
+
+    def __len__(self) -> int:
+        return len(self._databases)
+
+    def __iter__(self) -> Iterator[IDatabase]:
+        return iter(self._databases)
+
+    def add(self, database: IDatabase):
+        self._databases.append(database)
+
+    def run(self, operation: Union[str, Callable[[IDatabase], Any]], ordered: bool = False) \
+            -> Iterator[DatabaseResult]:
+        return run_many(self._databases, operation, self._max_workers, ordered)
+
+    def get_info(self) -> Iterator[DatabaseResult]:
+        return self.run('get_info')
+
+    def export(self, format: str = None) -> Iterator[DatabaseResult]:
+        return self.run(lambda database: database.export(format=format))
+
+    def analyze(self, hibp_path: Optional[str] = None) -> Iterator[DatabaseResult]:
+        return self.run(lambda database: list(database.analyze(hibp_path)))
+
+    def watch(self, callback: Callable[[IDatabase], None], watcher: FileWatcher = None) -> List[Subscription]:
+        """
+        Calls `callback` with each database whose file has changed, see :py:class:`watch.FileWatcher`.
+        Only the changed databases need to be read again, instead of polling all of them.
+        Databases that can watch themselves (see :py:meth:`entity.Database.watch`) also drop their snapshots.
+        """
+        watcher = watcher if watcher is not None else get_watcher()
+        return [database.watch(callback, watcher) if hasattr(database, 'watch') else
+                watcher.subscribe(database, callback) for database in self._databases]
@@ -0,0 +1,83 @@
+import binascii
+import hashlib
+import mmap
+import os
+from typing import Optional, Union
+
+HASH_LENGTH = 40
+
+
+class HibpFile:
+    def __init__(self, path: str):
+        """
+        A file of leaked password hashes from https://haveibeenpwned.com/Passwords in the "ordered by hash"
+        SHA-1 format, one `HASH:COUNT` line per password. The file is mapped into memory and binary searched,
+        so a lookup reads about log2(n) lines (a few dozen pages of a file of several GB) and nothing is
+        scanned or loaded up front.
+
+        >>> with HibpFile('pwned-passwords-sha1-ordered-by-hash-v8.txt') as hibp:
+        ...     hibp.get_count('1234')
+
+        :param path: Path to the file
+        """
+        self._path = os.path.abspath(path)
+        self._file = open(self._path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        # an empty file cannot be mapped
+        self._view = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size > 0 else b''
+        if size > 0 and hasattr(self._view, 'madvise'):
+            self._view.madvise(mmap.MADV_RANDOM)
+
+    def get_path(self) -> str:
+        return self._path
+
+    def close(self):
+        if isinstance(self._view, mmap.mmap):
+            self._view.close()
+        self._file.close()
+
+    def __enter__(self) -> 'HibpFile':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get_count(self, password: str) -> int:
+        """
+        :return: How often the password has been seen in breaches, 0 if it has not been leaked.
+        """
+        return self.get_hash_count(hashlib.sha1(password.encode('utf-8')).digest())
+
+    def get_hash_count(self, sha1: Union[bytes, str]) -> int:
+        """
+        :param sha1: SHA-1 of a password, the digest or 40 hexadecimal digits
+        :return: How often the password has been seen in breaches, 0 if it has not been leaked.
+        """
+        target = (binascii.hexlify(sha1) if isinstance(sha1, bytes) else sha1.encode('ascii')).upper()
+        if not len(target) == HASH_LENGTH:
+            raise ValueError('Invalid SHA-1 hash.')
+
+        line = self._find(target)
+        if line is None:
+            return 0
+        _, _, count = line.partition(b':')
+        # files without counts list each password once
+        return int(count) if count.strip() else 1
+
+    def _find(self, target: bytes) -> Optional[bytes]:
+        view = self._view
+        low, high = 0, len(view)
+        # invariant: `low` is the start of a line, the target lies within [low, high)
+        while low < high:
+            middle = (low + high) // 2
+            start = view.rfind(b'\n', low, middle) + 1 or low
+            end = view.find(b'\n', start)
+            end = len(view) if end < 0 else end
+            key = view[start:start + HASH_LENGTH].upper()
+            if key == target:
+                return view[start:end].rstrip(b'\r')
+            if key < target:
+                low = end + 1
+            else:
+                high = start
+        return None
@@ -0,0 +1,128 @@
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from entity import Database
+from export import EntryRecord
+
+
+def normalize_host(url: str) -> Optional[str]:
+    """
+    Extracts the host of a URL, in lower case and without a leading 'www.'.
+
+    >>> normalize_host('https://WWW.Wikipedia.org:443/wiki')
+    'wikipedia.org'
+    >>> normalize_host('wikipedia.org')
+    'wikipedia.org'
+    """
+    if url is None or len(url.strip()) == 0:
+        return None
+    url = url.strip()
+    if '://' not in url:
+        url = '//' + url
+    try:
+        host = urlsplit(url).hostname
+    except ValueError:
+        return None
+    if host is None:
+        return None
+    host = host.rstrip('.')
+    return host[4:] if host.startswith('www.') else host
+
+
+class DatabaseIndex:
+    def __init__(self, database: Database):
+        """
+        An in-memory index of the entries of a database, built from a single export.
+        Lookups are dictionary accesses and never spawn keepassxc-cli.
+
+        :param database: The database to index
+        """
+        self._database = database
+        self._lock = threading.Lock()
+        self._fingerprint = None  # type: Optional[Tuple[int, int]]
+        self._by_uuid = {}  # type: Dict[str, EntryRecord]
+        self._by_title = {}  # type: Dict[str, List[EntryRecord]]
+        self._by_host = {}  # type: Dict[str, List[EntryRecord]]
+        self._by_group = {}  # type: Dict[str, List[EntryRecord]]
+
+    def __len__(self) -> int:
+        return len(self._by_uuid)
+
+    def get_database(self) -> Database:
+        return self._database
+
+    def build(self):
+        """
+        Exports the database and rebuilds the index.
+        """
+        with self._lock:
+            fingerprint = self._get_fingerprint()
+            by_uuid, by_title, by_host, by_group = {}, {}, {}, {}
+            for entry in self._database.iter_entries():
+                by_uuid[entry.uuid] = entry
+                by_title.setdefault(self._normalize_title(entry.title), []).append(entry)
+                host = normalize_host(entry.url)
+                if host is not None:
+                    by_host.setdefault(host, []).append(entry)
+                for prefix in self._get_prefixes(entry.group):
+                    by_group.setdefault(prefix, []).append(entry)
+
+            self._by_uuid, self._by_title, self._by_host, self._by_group = by_uuid, by_title, by_host, by_group
+            self._fingerprint = fingerprint
+
+    def refresh(self) -> bool:
+        """
+        Rebuilds the index if the database file has been modified since the index was built.
+
+        :return: `True` if the index has been rebuilt.
+        """
+        if self._fingerprint is not None and self._fingerprint == self._get_fingerprint():
+            return False
+        self.build()
+        return True
+
+    def is_stale(self) -> bool:
+        return self._fingerprint is None or not self._fingerprint == self._get_fingerprint()
+
+    def by_uuid(self, uuid: str) -> Optional[EntryRecord]:
+        """
+        :param uuid: UUID as 32 hexadecimal digits (with or without dashes and braces)
+        """
+        return self._by_uuid.get(uuid.strip('{}').replace('-', '').lower())
+
+    def by_title(self, title: str) -> List[EntryRecord]:
+        """
+        :param title: Title of the entries, compared case-insensitively
+        """
+        return list(self._by_title.get(self._normalize_title(title), []))
+
+    def by_url(self, url: str) -> List[EntryRecord]:
+        """
+        :param url: A URL or a host name, matched against the normalized hosts of the entries' URLs
+        """
+        return list(self._by_host.get(normalize_host(url), []))
+
+    def by_group(self, path: str) -> List[EntryRecord]:
+        """
+        :param path: Path of a group, e.g. '/websites'
+        :return: The entries of the group and all of its subgroups
+        """
+        return list(self._by_group.get(self._normalize_group(path), []))
+
+    def _get_fingerprint(self) -> Tuple[int, int]:
+        stat = os.stat(self._database.get_path())
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _normalize_title(title: Optional[str]) -> str:
+        return '' if title is None else title.casefold()
+
+    @staticmethod
+    def _normalize_group(path: str) -> str:
+        return '/' + path.strip('/')
+
+    @classmethod
+    def _get_prefixes(cls, group: str) -> List[str]:
+        parts = cls._normalize_group(group).strip('/').split('/')
+        return ['/'] + ['/' + '/'.join(parts[:i]) for i in range(1, len(parts) + 1) if len(parts[0]) > 0]
@@ -0,0 +1,172 @@
+import bisect
+import threading
+from typing import Dict, List, Optional, Tuple
+from interface import ICommand, ICommandObserver
+
+# upper bounds in seconds, from spawning a process to deriving a key with a strong KDF
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASES = ('spawn', 'prompt_wait', 'run', 'parse', 'total')
+
+
+class CommandMetrics:
+    __slots__ = ('command', 'session', 'spawn', 'prompt_wait', 'run', 'parse', 'total', 'output_bytes',
+                 'return_code')
+
+    def __init__(self, command: str, session: bool = False):
+        """
+        Where the time of a single command went. Durations are in seconds:
+        `spawn` starting the process, `prompt_wait` waiting for password prompts (this includes key derivation
+        of additional databases), `run` from the started process to its exit (including `prompt_wait`),
+        `parse` parsing the output and `total` all of it including the wrapper's own overhead.
+        `output_bytes` is only counted while observers are registered.
+
+        :param command: Name of the command, e.g. 'db-info'
+        :param session: Whether the command ran in an interactive session instead of its own process
+        """
+        self.command = command
+        self.session = session
+        self.spawn = 0.0
+        # the time keepassxc-cli took to prompt for passwords, None if the passwords were written ahead
+        self.prompt_wait = None  # type: Optional[float]
+        self.run = 0.0
+        self.parse = 0.0
+        self.total = 0.0
+        self.output_bytes = 0
+        self.return_code = None  # type: Optional[int]
+
+    def add_prompt_wait(self, seconds: float):
+        self.prompt_wait = seconds if self.prompt_wait is None else self.prompt_wait + seconds
+
+    def __repr__(self) -> str:
+        return 'CommandMetrics({!r}, total={:.6f}, return_code={!r})'.format(self.command, self.total,
+                                                                           self.return_code)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Counts observations per bucket, see https://prometheus.io/docs/concepts/metric_types/#histogram
+
+        :param buckets: Sorted upper bounds, an implicit last bucket takes everything above
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def get_cumulative_counts(self) -> List[int]:
+        """
+        :return: Number of observations less than or equal to each bound, the last one is the total count.
+        """
+        cumulative, total = [], 0
+        for count in self.counts:
+            total += count
+            cumulative.append(total)
+        return cumulative
+
+
+class HistogramObserver(ICommandObserver):
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Aggregates the metrics of all commands in memory: a histogram per command and phase,
+        the output size per command and a counter per command and return code.
+
+        >>> observer = HistogramObserver()
+        >>> Command.observers.append(observer)
+        >>> print(observer.to_openmetrics())
+
+        :param buckets: Upper bounds of the histogram buckets in seconds
+        """
+        self._buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._histograms = {}  # type: Dict[Tuple[str, str], Histogram]
+        self._output_bytes = {}  # type: Dict[str, int]
+        self._return_codes = {}  # type: Dict[Tuple[str, Optional[int]], int]
+
+    def on_start(self, command: ICommand):
+        pass
+
+    def on_finish(self, command: ICommand, metrics: CommandMetrics):
+        with self._lock:
+            for phase in PHASES:
+                value = getattr(metrics, phase)
+                if value is not None:
+                    self._get_histogram(metrics.command, phase).observe(value)
+            self._output_bytes[metrics.command] = self._output_bytes.get(metrics.command, 0) + metrics.output_bytes
+            key = (metrics.command, metrics.return_code)
+            self._return_codes[key] = self._return_codes.get(key, 0) + 1
+
+    def get_histogram(self, command: str, phase: str = 'total') -> Optional[Histogram]:
+        """
+        :param command: Name of the command, e.g. 'db-info'
+        :param phase: One of 'spawn', 'prompt_wait', 'run', 'parse' and 'total'
+        """
+        return self._histograms.get((command, phase))
+
+    def get_output_bytes(self, command: str) -> int:
+        return self._output_bytes.get(command, 0)
+
+    def get_return_codes(self, command: str) -> Dict[Optional[int], int]:
+        return {code: n for (name, code), n in self._return_codes.items() if name == command}
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._output_bytes.clear()
+            self._return_codes.clear()
+
+    def to_openmetrics(self, prefix: str = 'keepassxc_cli') -> str:
+        """
+        Dumps the metrics in the OpenMetrics text format, see https://openmetrics.io
+        """
+        with self._lock:
+            lines = [
+                '# TYPE {}_duration_seconds histogram'.format(prefix),
+                '# UNIT {}_duration_seconds seconds'.format(prefix),
+                '# HELP {}_duration_seconds Duration of the phases of keepassxc-cli commands.'.format(prefix),
+            ]
+            for (name, phase), histogram in sorted(self._histograms.items()):
+                labels = 'command="{}",phase="{}"'.format(_escape(name), phase)
+                bounds = [_format_float(bound) for bound in histogram.buckets] + ['+Inf']
+                for bound, count in zip(bounds, histogram.get_cumulative_counts()):
+                    lines.append('{}_duration_seconds_bucket{{{},le="{}"}} {}'.format(prefix, labels, bound, count))
+                lines.append('{}_duration_seconds_count{{{}}} {}'.format(prefix, labels, histogram.count))
+                lines.append('{}_duration_seconds_sum{{{}}} {}'.format(prefix, labels, _format_float(histogram.sum)))
+
+            lines += [
+                '# TYPE {}_output_bytes counter'.format(prefix),
+                '# UNIT {}_output_bytes bytes'.format(prefix),
+                '# HELP {}_output_bytes Output written to STDOUT by keepassxc-cli.'.format(prefix),
+            ]
+            for name, size in sorted(self._output_bytes.items()):
+                lines.append('{}_output_bytes_total{{command="{}"}} {}'.format(prefix, _escape(name), size))
+
+            lines += [
+                '# TYPE {}_commands counter'.format(prefix),
+                '# HELP {}_commands Executed keepassxc-cli commands by return code.'.format(prefix),
+            ]
+            for (name, code), n in sorted(self._return_codes.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+                lines.append('{}_commands_total{{command="{}",return_code="{}"}} {}'.format(
+                    prefix, _escape(name), '' if code is None else code, n))
+
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def _get_histogram(self, command: str, phase: str) -> Histogram:
+        histogram = self._histograms.get((command, phase))
+        if histogram is None:
+            histogram = self._histograms[(command, phase)] = Histogram(self._buckets)
+        return histogram
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_float(value: float) -> str:
+    return repr(float(value))
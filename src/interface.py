@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Any, Optional
+from typing import Any, Hashable, Optional
 
 
 class ICommand(ABC):
@@ -60,10 +60,49 @@ class IDatabase(ABC):
         pass
 
     @abstractmethod
-    def copy_to(self, target_path: str):
+    def copy_to(self, target_path: str, overwrite: bool = False):
         """
         Copy the database file to another location.
 
         :param target_path:
+        :param overwrite: Replace an existing file at the target
+        """
+        pass
+
+
+class ICache(ABC):
+    @abstractmethod
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+
+        :param key:
+        :param default: Returned if the key is not cached or has expired
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    def set(self, key: Hashable, value: Any):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+
+class ICommandObserver(ABC):
+    @abstractmethod
+    def on_start(self, command: ICommand):
+        """
+        Called before the command is run.
+        """
+        pass
+
+    @abstractmethod
+    def on_finish(self, command: ICommand, metrics: Any):
+        """
+        Called after the command has finished, also if it has failed.
+
+        :param metrics: The :py:class:`~instrument.CommandMetrics` of the command
         """
         pass
@@ -0,0 +1,477 @@
+import base64
+import hashlib
+import hmac
+import mmap
+import os
+import re
+import struct
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple
+from uuid import UUID
+from xml.etree import ElementTree
+
+# optional dependencies of the native backend, imported by _load_dependencies() on first use
+# because loading their C extensions takes longer than importing the whole package
+AES = ChaCha20 = Salsa20 = argon2 = None
+_dependencies_loaded = False
+
+SIGNATURE = (0x9AA2D903, 0xB54BFB67)
+
+CIPHER_AES256 = UUID('31c1f2e6-bf71-4350-be58-05216afc5aff')
+CIPHER_CHACHA20 = UUID('d6038a2b-8b6f-4cb5-a524-339a31dbb59a')
+CIPHER_TWOFISH = UUID('ad68f29f-576f-4bb9-a36a-d47af965346c')
+CIPHER_NAMES = {CIPHER_AES256: 'AES 256-bit', CIPHER_CHACHA20: 'ChaCha20 256-bit', CIPHER_TWOFISH: 'Twofish 256-bit'}
+
+KDF_AES_KDBX3 = UUID('c9d9f39a-628a-4460-bf74-0d08c18a4fea')
+KDF_AES_KDBX4 = UUID('7c02bb82-79a7-4ac0-927d-114a00648238')
+KDF_ARGON2D = UUID('ef636ddf-8c29-444b-91f7-a9a403e30a0c')
+KDF_ARGON2ID = UUID('9e298b19-56db-4773-b23d-fc3ec6f0a1e6')
+
+STREAM_SALSA20 = 2
+STREAM_CHACHA20 = 3
+SALSA20_NONCE = bytes.fromhex('e830094b97205d2a')
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+
+def is_available() -> bool:
+    """
+    :return: Whether the dependencies of the native backend (pycryptodome) are installed.
+        Databases using Argon2 additionally require argon2-cffi.
+    """
+    _load_dependencies()
+    return AES is not None
+
+
+def _load_dependencies():
+    global AES, ChaCha20, Salsa20, argon2, _dependencies_loaded
+    if _dependencies_loaded:
+        return
+    try:
+        from Crypto.Cipher import AES, ChaCha20, Salsa20
+    except ImportError:
+        pass
+    try:
+        from argon2 import low_level as argon2
+    except ImportError:
+        pass
+    _dependencies_loaded = True
+
+
+def _require(module: Any, package: str):
+    if module is None:
+        raise ImportError('The native backend requires {}, install it with `pip install {}`.'.format(package, package))
+
+
+class KdbxHeader:
+    __slots__ = ('version', 'cipher', 'compressed', 'master_seed', 'encryption_iv', 'kdf', 'kdf_parameters',
+                 'stream_id', 'stream_key', 'stream_start_bytes', 'end')
+
+    def __init__(self, version: Tuple[int, int]):
+        """
+        The unencrypted outer header of a KDBX file.
+
+        :param version: Major and minor version of the file format
+        """
+        self.version = version
+        self.cipher = None  # type: Optional[UUID]
+        self.compressed = False
+        self.master_seed = None  # type: Optional[bytes]
+        self.encryption_iv = None  # type: Optional[bytes]
+        self.kdf = None  # type: Optional[UUID]
+        self.kdf_parameters = {}  # type: Dict[str, Any]
+        # KDBX 3.1 only, KDBX 4 keeps them in the inner header
+        self.stream_id = None  # type: Optional[int]
+        self.stream_key = None  # type: Optional[bytes]
+        self.stream_start_bytes = None  # type: Optional[bytes]
+        # offset of the first byte after the header
+        self.end = 0
+
+    def get_kdf_key(self) -> tuple:
+        """
+        :return: The KDF and all of its parameters, including the salt. Equal keys derive equal keys.
+        """
+        return (self.kdf,) + tuple(sorted(self.kdf_parameters.items()))
+
+    def get_cipher_name(self) -> str:
+        return CIPHER_NAMES.get(self.cipher, str(self.cipher))
+
+    def get_kdf_name(self) -> str:
+        """
+        :return: A description of the KDF in the format of `keepassxc-cli db-info`.
+        """
+        if self.kdf in (KDF_AES_KDBX3, KDF_AES_KDBX4):
+            return 'AES ({} rounds)'.format(self.kdf_parameters['R'])
+        if self.kdf in (KDF_ARGON2D, KDF_ARGON2ID):
+            return '{} ({} rounds, {} KB)'.format('Argon2' if self.kdf == KDF_ARGON2D else 'Argon2id',
+                                                 self.kdf_parameters['I'], self.kdf_parameters['M'] // 1024)
+        return str(self.kdf)
+
+
+class KdbxPayload:
+    __slots__ = ('header', 'xml', 'stream_id', 'stream_key')
+
+    def __init__(self, header: KdbxHeader, xml: bytes, stream_id: int, stream_key: bytes):
+        """
+        The decrypted content of a KDBX file. Values with the attribute `Protected="True"`
+        are still encrypted with the inner random stream.
+        """
+        self.header = header
+        self.xml = xml
+        self.stream_id = stream_id
+        self.stream_key = stream_key
+
+    def get_tree(self) -> ElementTree.Element:
+        """
+        :return: The parsed XML with all protected values decrypted. They are marked `ProtectInMemory="True"`
+            like in an XML export.
+        """
+        root = ElementTree.fromstring(self.xml)
+        stream = _get_inner_stream(self.stream_id, self.stream_key)
+        # the values are encrypted in document order with a single stream
+        for element in root.iter():
+            if element.get('Protected') == 'True':
+                del element.attrib['Protected']
+                element.set('ProtectInMemory', 'True')
+                if element.text:
+                    element.text = stream(base64.b64decode(element.text)).decode('utf-8')
+        return root
+
+    def get_xml(self) -> str:
+        """
+        :return: The XML in the format of `keepassxc-cli export`.
+            WARNING: Passwords are in plaintext!
+        """
+        xml = ElementTree.tostring(self.get_tree(), encoding='unicode')
+        # ElementTree puts a space before the slash of empty elements, KeePassXC does not ('>' is always escaped)
+        return XML_DECLARATION + xml.replace(' />', '/>') + '\n'
+
+
+def get_composite_key(password: str = None, key_file: str = None) -> bytes:
+    """
+    Combines the credentials into the key that is passed to the KDF.
+    """
+    parts = []
+    if password is not None:
+        parts.append(hashlib.sha256(password.encode('utf-8')).digest())
+    if key_file is not None:
+        parts.append(read_key_file(key_file))
+    return hashlib.sha256(b''.join(parts)).digest()
+
+
+def read_key_file(path: str) -> bytes:
+    """
+    Reads a key-file in any format supported by KeePassXC: XML (version 1.0 and 2.0), 32 raw bytes,
+    64 hexadecimal digits or any other file, which is hashed.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if data.lstrip().startswith(b'<?xml') or data.lstrip().startswith(b'<KeyFile'):
+        try:
+            root = ElementTree.fromstring(data)
+        except ElementTree.ParseError:
+            root = None
+        if root is not None and root.tag == 'KeyFile':
+            version = root.findtext('Meta/Version', '').strip()
+            text = root.findtext('Key/Data', '')
+            if version.startswith('2'):
+                key = bytes.fromhex(re.sub(r'\s', '', text))
+                expected = root.find('Key/Data').get('Hash')
+                if expected is not None and not hashlib.sha256(key).hexdigest()[:8].lower() == expected.lower():
+                    raise ValueError('Key-file {} is corrupt.'.format(path))
+                return key
+            return base64.b64decode(text)
+
+    if len(data) == 32:
+        return data
+    if len(data) == 64 and re.fullmatch(rb'[0-9a-fA-F]{64}', data):
+        return bytes.fromhex(data.decode('ascii'))
+    return hashlib.sha256(data).digest()
+
+
+def transform_key(header: KdbxHeader, composite_key: bytes) -> bytes:
+    """
+    Derives the key from the composite key with the KDF of the header. This is the expensive part of unlocking.
+    """
+    _load_dependencies()
+    parameters = header.kdf_parameters
+    if header.kdf in (KDF_AES_KDBX3, KDF_AES_KDBX4):
+        _require(AES, 'pycryptodome')
+        return _transform_aes(composite_key, parameters['S'], parameters['R'])
+    if header.kdf in (KDF_ARGON2D, KDF_ARGON2ID):
+        _require(argon2, 'argon2-cffi')
+        return argon2.hash_secret_raw(
+            secret=composite_key,
+            salt=parameters['S'],
+            time_cost=parameters['I'],
+            memory_cost=parameters['M'] // 1024,
+            parallelism=parameters['P'],
+            hash_len=32,
+            type=argon2.Type.D if header.kdf == KDF_ARGON2D else argon2.Type.ID,
+            version=parameters.get('V', 0x13)
+        )
+    raise ValueError('Unsupported KDF {}.'.format(header.kdf))
+
+
+def _transform_aes(key: bytes, seed: bytes, rounds: int, chunk_blocks: int = 65536) -> bytes:
+    # Encrypting zeros in CBC mode encrypts the previous ciphertext block again, so the last block of
+    # n zero blocks encrypted with the key as IV is the key encrypted n times - without a loop in Python.
+    halves = []
+    for half in (key[:16], key[16:]):
+        remaining = rounds
+        while remaining > 0:
+            blocks = min(remaining, chunk_blocks)
+            half = AES.new(seed, AES.MODE_CBC, iv=half).encrypt(bytes(16 * blocks))[-16:]
+            remaining -= blocks
+        halves.append(half)
+    return hashlib.sha256(b''.join(halves)).digest()
+
+
+def load(path: str, composite_key: bytes, transform: Callable[[KdbxHeader, bytes], bytes] = transform_key) \
+        -> KdbxPayload:
+    """
+    Decrypts a KDBX 3.1 or 4 file. The file is memory-mapped, hashes and HMACs are computed on the mapping
+    without copying it.
+
+    :param composite_key: See :py:func:`get_composite_key`
+    :param transform: Derives the key, see :py:func:`transform_key`
+    :raise ImportError: If the dependencies of the native backend are not installed.
+    :raise ValueError: If the credentials are invalid or the file uses an unsupported cipher or KDF.
+    :raise IOError: If the file is not a KDBX file or is corrupt.
+    """
+    _load_dependencies()
+    _require(AES, 'pycryptodome')
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < 12:
+            raise IOError('{} is not a KDBX file.'.format(path))
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        view = memoryview(buffer)
+        header = read_header(view, path)
+        transformed_key = transform(header, composite_key)
+        if header.version[0] >= 4:
+            return _decrypt_kdbx4(view, header, transformed_key, path)
+        return _decrypt_kdbx3(view, header, transformed_key, path)
+    finally:
+        view = None
+        try:
+            buffer.close()
+        except BufferError:
+            # slices are still referenced by the traceback of an exception, the mapping is closed with them
+            pass
+
+
+def read_header(view: memoryview, path: str = None) -> KdbxHeader:
+    signature_1, signature_2, minor, major = struct.unpack_from('<IIHH', view, 0)
+    if not (signature_1, signature_2) == SIGNATURE:
+        raise IOError('{} is not a KDBX file.'.format(path))
+    if major not in (3, 4):
+        raise ValueError('Unsupported KDBX version {}.{}.'.format(major, minor))
+
+    header = KdbxHeader((major, minor))
+    offset = 12
+    while True:
+        if major >= 4:
+            field, size = struct.unpack_from('<BI', view, offset)
+            offset += 5
+        else:
+            field, size = struct.unpack_from('<BH', view, offset)
+            offset += 3
+        data = bytes(view[offset:offset + size])
+        offset += size
+
+        if field == 0:
+            break
+        elif field == 2:
+            header.cipher = UUID(bytes=data)
+        elif field == 3:
+            header.compressed = struct.unpack('<I', data)[0] == 1
+        elif field == 4:
+            header.master_seed = data
+        elif field == 5:
+            header.kdf = KDF_AES_KDBX3
+            header.kdf_parameters['S'] = data
+        elif field == 6:
+            header.kdf_parameters['R'] = struct.unpack('<Q', data)[0]
+        elif field == 7:
+            header.encryption_iv = data
+        elif field == 8:
+            header.stream_key = data
+        elif field == 9:
+            header.stream_start_bytes = data
+        elif field == 10:
+            header.stream_id = struct.unpack('<I', data)[0]
+        elif field == 11:
+            header.kdf_parameters = _read_variant_dictionary(data)
+            header.kdf = UUID(bytes=header.kdf_parameters.pop('$UUID'))
+
+    header.end = offset
+    return header
+
+
+def _read_variant_dictionary(data: bytes) -> Dict[str, Any]:
+    result = {}
+    offset = 2  # version
+    while True:
+        kind = data[offset]
+        offset += 1
+        if kind == 0:
+            return result
+        size, = struct.unpack_from('<i', data, offset)
+        key = data[offset + 4:offset + 4 + size].decode('utf-8')
+        offset += 4 + size
+        size, = struct.unpack_from('<i', data, offset)
+        value = data[offset + 4:offset + 4 + size]
+        offset += 4 + size
+
+        if kind == 0x04:
+            result[key] = struct.unpack('<I', value)[0]
+        elif kind == 0x05:
+            result[key] = struct.unpack('<Q', value)[0]
+        elif kind == 0x08:
+            result[key] = value != b'\x00'
+        elif kind == 0x0C:
+            result[key] = struct.unpack('<i', value)[0]
+        elif kind == 0x0D:
+            result[key] = struct.unpack('<q', value)[0]
+        elif kind == 0x18:
+            result[key] = value.decode('utf-8')
+        else:
+            result[key] = value
+
+
+def _decrypt_kdbx4(view: memoryview, header: KdbxHeader, transformed_key: bytes, path: str) -> KdbxPayload:
+    offset = header.end
+    if not hashlib.sha256(view[:offset]).digest() == view[offset:offset + 32]:
+        raise IOError('Header of {} is corrupt.'.format(path))
+    hmac_key = hashlib.sha512(header.master_seed + transformed_key + b'\x01').digest()
+    if not hmac.compare_digest(_hmac(hmac_key, 0xFFFFFFFFFFFFFFFF, view[:offset]), view[offset + 32:offset + 64]):
+        raise ValueError('Invalid credentials for {}.'.format(path))
+    offset += 64
+
+    decryptor = _Decryptor(header, hashlib.sha256(header.master_seed + transformed_key).digest())
+    output = _Output(header.compressed)
+    index = 0
+    while True:
+        size, = struct.unpack_from('<i', view, offset + 32)
+        block = view[offset + 36:offset + 36 + size]
+        expected = _hmac(hmac_key, index, view[offset + 32:offset + 36], block)
+        if not hmac.compare_digest(expected, view[offset:offset + 32]):
+            raise IOError('Block {} of {} is corrupt.'.format(index, path))
+        offset += 36 + size
+        index += 1
+        if size == 0:
+            break
+        output.write(decryptor.decrypt(block))
+    output.write(decryptor.finish())
+    data = output.finish()
+
+    # inner header: stream cipher of the protected values and attachments
+    stream_id, stream_key = None, None
+    offset = 0
+    while True:
+        field, size = struct.unpack_from('<BI', data, offset)
+        value = bytes(data[offset + 5:offset + 5 + size])
+        offset += 5 + size
+        if field == 0:
+            break
+        elif field == 1:
+            stream_id = struct.unpack('<I', value)[0]
+        elif field == 2:
+            stream_key = value
+    del data[:offset]
+    return KdbxPayload(header, bytes(data), stream_id, stream_key)
+
+
+def _decrypt_kdbx3(view: memoryview, header: KdbxHeader, transformed_key: bytes, path: str) -> KdbxPayload:
+    decryptor = _Decryptor(header, hashlib.sha256(header.master_seed + transformed_key).digest())
+    try:
+        data = decryptor.decrypt(view[header.end:]) + decryptor.finish()
+    except ValueError:
+        raise ValueError('Invalid credentials for {}.'.format(path))
+    if not data[:32] == header.stream_start_bytes:
+        raise ValueError('Invalid credentials for {}.'.format(path))
+
+    plaintext = memoryview(data)
+    output = _Output(header.compressed)
+    offset = 32
+    while True:
+        index, expected, size = struct.unpack_from('<I32sI', plaintext, offset)
+        block = plaintext[offset + 40:offset + 40 + size]
+        offset += 40 + size
+        if size == 0:
+            break
+        if not hashlib.sha256(block).digest() == expected:
+            raise IOError('Block {} of {} is corrupt.'.format(index, path))
+        output.write(block)
+    return KdbxPayload(header, bytes(output.finish()), header.stream_id, header.stream_key)
+
+
+def _hmac(key: bytes, index: int, *data) -> bytes:
+    index = struct.pack('<Q', index)
+    mac = hmac.new(hashlib.sha512(index + key).digest(), digestmod=hashlib.sha256)
+    if len(data) > 1:
+        mac.update(index)
+    for part in data:
+        mac.update(part)
+    return mac.digest()
+
+
+class _Decryptor:
+    def __init__(self, header: KdbxHeader, key: bytes):
+        if header.cipher == CIPHER_AES256:
+            self._cipher = AES.new(key, AES.MODE_CBC, iv=header.encryption_iv)
+            self._padded = True
+        elif header.cipher == CIPHER_CHACHA20:
+            self._cipher = ChaCha20.new(key=key, nonce=header.encryption_iv)
+            self._padded = False
+        else:
+            raise ValueError('Unsupported cipher {}.'.format(header.get_cipher_name()))
+        self._pending = b''
+
+    def decrypt(self, data: memoryview) -> bytes:
+        if not self._padded:
+            return self._cipher.decrypt(data)
+        # the last block holds the padding, so it is kept until the end
+        if len(self._pending) > 0:
+            data = self._pending + bytes(data)
+        end = len(data) - 16 if len(data) % 16 == 0 else len(data) - len(data) % 16
+        self._pending = bytes(data[end:])
+        return self._cipher.decrypt(data[:end]) if end > 0 else b''
+
+    def finish(self) -> bytes:
+        if not self._padded:
+            return b''
+        if not len(self._pending) == 16:
+            raise ValueError('Invalid padding.')
+        block = self._cipher.decrypt(self._pending)
+        padding = block[-1]
+        if not 1 <= padding <= 16 or not block[-padding:] == bytes([padding]) * padding:
+            raise ValueError('Invalid padding.')
+        return block[:-padding]
+
+
+class _Output:
+    def __init__(self, compressed: bool):
+        self._data = bytearray()
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if compressed else None
+
+    def write(self, data):
+        self._data += data if self._decompressor is None else self._decompressor.decompress(data)
+
+    def finish(self) -> bytearray:
+        if self._decompressor is not None:
+            self._data += self._decompressor.flush()
+        return self._data
+
+
+def _get_inner_stream(stream_id: Optional[int], key: Optional[bytes]) -> Callable[[bytes], bytes]:
+    if stream_id == STREAM_SALSA20:
+        return Salsa20.new(key=hashlib.sha256(key).digest(), nonce=SALSA20_NONCE).decrypt
+    if stream_id == STREAM_CHACHA20:
+        digest = hashlib.sha512(key).digest()
+        return ChaCha20.new(key=digest[:32], nonce=digest[32:44]).decrypt
+    if stream_id in (None, 0):
+        return lambda data: data
+    raise ValueError('Unsupported inner random stream {}.'.format(stream_id))
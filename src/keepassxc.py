@@ -1,13 +1,42 @@
+import copy
+import hashlib
+import os
+import threading
+from typing import Any, Iterable, Iterator, Optional, TYPE_CHECKING
 import command
-from entity import IDatabase, Database
+from interface import IDatabase
+from parsers import PasswordEstimate
+
+if TYPE_CHECKING:
+    # the backends and the batch functions import most of the package, they are imported when they are used
+    from cache import DerivedKeyCache, LRUCache
+    from entity import Database
+
+# estimations are cached by a keyed hash of the password, the key never leaves the process
+_estimate_cache = None  # type: Optional[LRUCache]
+_estimate_cache_key = os.urandom(32)
+_estimate_cache_lock = threading.Lock()
+
+
+def __getattr__(name: str) -> Any:
+    # `keepassxc.Database` without importing the entity module along with this one
+    if name == 'Database':
+        from entity import Database
+        return Database
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
 
 
 def get_version() -> str:
     """
-    Shows the KeePassXC version.
+    Shows the KeePassXC version. The version is probed once per executable, see :py:mod:`capabilities`.
     :return: The version string.
     """
-    return command.Command(options=['--version']).execute()
+    from capabilities import get_capabilities
+    version = get_capabilities().version
+    if version is None:
+        # runs keepassxc-cli again, so its error is raised
+        return command.Command(options=['--version']).execute()
+    return version
 
 
 def generate_password(config: command.GeneratePasswordConfig = None) -> str:
@@ -28,7 +57,46 @@ def generate_diceware(words: int = None) -> str:
     return command.GenerateDicewareCommand(words).execute()
 
 
-def estimate_password(password: str) -> dict:
+def generate_passwords(n: int, config: command.GeneratePasswordConfig = None, workers: int = None) -> Iterator[str]:
+    """
+    Generate many new random passwords. The keepassxc-cli processes run in parallel and
+    the passwords are yielded as they are generated.
+
+    >>> for password in generate_passwords(1000, GeneratePasswordConfig(length=32)):
+    ...     provision(password)
+
+    :param n: Password count
+    :param config: Password generation options
+    :param workers: Number of parallel processes, defaults to the number of CPUs
+    :return:
+    """
+    if not isinstance(n, int) or n < 0:
+        raise ValueError('Invalid password count.')
+    import parallel
+    command.GeneratePasswordCommand(config)  # validates the options before anything is spawned
+    return parallel.imap(lambda _: command.GeneratePasswordCommand(config).execute(),
+                         range(n), workers, ordered=False)
+
+
+def generate_dicewares(n: int, words: int = None, workers: int = None) -> Iterator[str]:
+    """
+    Generate many new random diceware passphrases. The keepassxc-cli processes run in parallel and
+    the passphrases are yielded as they are generated.
+
+    :param n: Passphrase count
+    :param words: Word count
+    :param workers: Number of parallel processes, defaults to the number of CPUs
+    :return:
+    """
+    if not isinstance(n, int) or n < 0:
+        raise ValueError('Invalid passphrase count.')
+    import parallel
+    command.GenerateDicewareCommand(words)  # validates the word count before anything is spawned
+    return parallel.imap(lambda _: command.GenerateDicewareCommand(words).execute(),
+                         range(n), workers, ordered=False)
+
+
+def estimate_password(password: str) -> PasswordEstimate:
     """
     Estimate the strength of a password.
 
@@ -41,6 +109,75 @@ def estimate_password(password: str) -> dict:
     return command.EstimatePasswordCommand(password).execute()
 
 
+def estimate_passwords(passwords: Iterable[str], workers: int = None, cache: bool = True) \
+        -> Iterator[PasswordEstimate]:
+    """
+    Estimate the strength of many passwords. The keepassxc-cli processes run in parallel,
+    the estimations are yielded in the order of the passwords.
+
+    >>> list(estimate_passwords(['1234', '1234']))
+    [{'length': 4, 'entropy': 2.0, 'log10': 0.602}, {'length': 4, 'entropy': 2.0, 'log10': 0.602}]
+
+    :param passwords: The passwords to estimate
+    :param workers: Number of parallel processes, defaults to the number of CPUs
+    :param cache: Reuse the estimations of passwords that have been estimated before.
+        Passwords are never cached, only a keyed hash of them.
+    :return:
+    """
+    import parallel
+    return parallel.imap(_estimate_password_cached if cache else estimate_password, passwords, workers)
+
+
+def _get_estimate_cache() -> 'LRUCache':
+    global _estimate_cache
+    with _estimate_cache_lock:
+        if _estimate_cache is None:
+            from cache import LRUCache
+            _estimate_cache = LRUCache(maxsize=65536)
+        return _estimate_cache
+
+
+def _estimate_password_cached(password: str) -> PasswordEstimate:
+    key = hashlib.blake2b(password.encode('utf-8'), key=_estimate_cache_key).digest()
+    estimate_cache = _get_estimate_cache()
+    estimation = estimate_cache.get(key)
+    if estimation is None:
+        estimation = estimate_password(password)
+        estimate_cache.set(key, estimation)
+    # callers may modify the dictionaries they get
+    return copy.copy(estimation)
+
+
+def open_database(path: str, password: str = None, key_file: str = None, backend: str = None,
+                  key_cache: 'DerivedKeyCache' = None) -> 'Database':
+    """
+    Opens a database with the selected backend.
+
+    :param path: Path to the database file
+    :param password: [optional] Password to open the database
+    :param key_file: [optional] Path to the key-file to open the database
+    :param backend: 'cli' runs keepassxc-cli for every operation, 'native' decrypts the database in-process
+        (see :py:class:`~native.NativeDatabase`) and 'auto' chooses 'native' if its dependencies are installed.
+        Defaults to `KEEPASSXC_BACKEND` or 'cli'.
+    :param key_cache: [optional] Cache for derived keys, shared by the databases opened with the native backend
+    :raise ValueError: If the backend is unknown.
+    :raise ImportError: If the native backend has been selected and its dependencies are not installed.
+    """
+    import kdbx
+    from entity import Database
+    if backend is None:
+        backend = os.getenv('KEEPASSXC_BACKEND', 'cli')
+    if backend == 'auto':
+        backend = 'native' if kdbx.is_available() else 'cli'
+
+    if backend == 'cli':
+        return Database(path, password, key_file)
+    if backend == 'native':
+        from native import NativeDatabase
+        return NativeDatabase(path, password, key_file, key_cache=key_cache)
+    raise ValueError('Unknown backend {}.'.format(backend))
+
+
 def create_database(path: str, password: str = None, key_file: str = None, decryption_time: int = None) -> IDatabase:
     """
     A wrapper around :py:meth:`~entity.Database.create`.
@@ -48,6 +185,7 @@ def create_database(path: str, password: str = None, key_file: str = None, decry
     :return: The newly created database
     :raise IOError: If the database file already exists and `decryption_time` has been specified.
     """
+    from entity import Database
     database = Database(path, password, key_file)
     if not database.exists():
         database.create(decryption_time)
@@ -0,0 +1,30 @@
+import ctypes
+import threading
+from typing import Optional
+
+_libc = None  # type: Optional[ctypes.CDLL]
+_loaded = False
+_lock = threading.Lock()
+
+
+def get_libc(*functions: str) -> Optional[ctypes.CDLL]:
+    """
+    The C library, shared by all modules that call into it through ctypes. Finding the library may run ldconfig,
+    so it is loaded on first use instead of on import. `errno` is saved after every call, see `ctypes.get_errno`.
+
+    :param functions: Names of the functions the caller needs
+    :return: The C library, `None` if it cannot be loaded or lacks one of the functions.
+    """
+    global _libc, _loaded
+    with _lock:
+        if not _loaded:
+            import ctypes.util
+            try:
+                _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            except (OSError, TypeError):
+                # TypeError: no C library has been found on Windows
+                _libc = None
+            _loaded = True
+    if _libc is None or not all(hasattr(_libc, function) for function in functions):
+        return None
+    return _libc
@@ -0,0 +1,196 @@
+import base64
+import copy
+import io
+import os
+import threading
+from typing import Iterator, List, Optional, Tuple
+from uuid import UUID
+from xml.etree.ElementTree import Element, iterparse
+import kdbx
+from cache import DerivedKeyCache, ResultCache
+from entity import Database
+from parsers import DatabaseInfo, Finding
+
+
+class NativeDatabase(Database):
+    def __init__(self, path: str, password: str = None, key_file: str = None, cache: ResultCache = None,
+                 key_cache: DerivedKeyCache = None):
+        """
+        A database that is decrypted in-process instead of by keepassxc-cli. The key is derived once and
+        the decrypted payload is held until the file changes or :py:meth:`close` is called.
+        `get_info`, `export`, `list_entries` and everything built on `export_iter` run natively,
+        all other operations run keepassxc-cli like :py:class:`~entity.Database`.
+        Requires pycryptodome, and argon2-cffi for databases using Argon2.
+
+        :param path: Path to the database file
+        :param password: [optional] Password to open the database
+        :param key_file: [optional] Path to the key-file to open the database
+        :param cache: [optional] Cache for the results of operations that run keepassxc-cli
+        :param key_cache: [optional] Cache for the derived key, shared by all databases that use it.
+            Without one, the key is kept by this database until :py:meth:`close` is called.
+        :raise ImportError: If pycryptodome is not installed.
+        """
+        kdbx._load_dependencies()
+        kdbx._require(kdbx.AES, 'pycryptodome')
+        super().__init__(path, password, key_file, cache)
+        self._lock = threading.Lock()
+        self._fingerprint = None  # type: Optional[Tuple[int, int, int]]
+        self._payload = None  # type: Optional[kdbx.KdbxPayload]
+        # the information of the payload it has been read from
+        self._info = None  # type: Optional[Tuple[kdbx.KdbxPayload, DatabaseInfo]]
+        self._derived = None  # type: Optional[Tuple[tuple, bytes, bytes]]
+        self._key_cache = key_cache
+
+    def load(self) -> kdbx.KdbxPayload:
+        """
+        Decrypts the database file, unless it has not changed since it was last decrypted.
+        The derived key is reused as long as the KDF parameters of the file do not change.
+
+        :raise ValueError: If the credentials are invalid.
+        :raise IOError: If the file is corrupt.
+        """
+        with self._lock:
+            stat = os.stat(self._path)
+            fingerprint = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            if self._payload is None or not self._fingerprint == fingerprint:
+                composite_key = kdbx.get_composite_key(self._password, self._key_file)
+                self._payload = kdbx.load(self._path, composite_key, self._transform_key)
+                self._fingerprint = fingerprint
+            return self._payload
+
+    def close(self):
+        """
+        Forgets the decrypted payload and the derived key, except for a key in a shared key cache.
+        """
+        with self._lock:
+            self._payload = None
+            self._info = None
+            self._fingerprint = None
+            self._derived = None
+
+    def _transform_key(self, header: kdbx.KdbxHeader, composite_key: bytes) -> bytes:
+        kdf_key = header.get_kdf_key()
+        if self._key_cache is not None:
+            transformed_key = self._key_cache.get(kdf_key, composite_key)
+            if transformed_key is None:
+                transformed_key = kdbx.transform_key(header, composite_key)
+                self._key_cache.set(kdf_key, composite_key, transformed_key)
+            return transformed_key
+
+        if self._derived is not None and self._derived[0] == kdf_key and self._derived[1] == composite_key:
+            return self._derived[2]
+        transformed_key = kdbx.transform_key(header, composite_key)
+        self._derived = (kdf_key, composite_key, transformed_key)
+        return transformed_key
+
+    def get_info(self) -> DatabaseInfo:
+        """
+        :return: The information of `keepassxc-cli db-info`. KeePassXC does not store a database UUID,
+            so the UUID is the one of the root group. It is read once per decrypted payload.
+        """
+        payload = self.load()
+        with self._lock:
+            info = self._info
+        if info is None or info[0] is not payload:
+            info = (payload, self._read_info(payload))
+            with self._lock:
+                self._info = info
+        # callers may modify the dictionaries they get
+        return copy.copy(info[1])
+
+    @staticmethod
+    def _read_info(payload: kdbx.KdbxPayload) -> DatabaseInfo:
+        # only the XML up to the UUID of the root group is parsed, none of the entries or protected values
+        values = {}
+        path = []
+        for event, element in iterparse(io.BytesIO(payload.xml), events=('start', 'end')):
+            if event == 'start':
+                path.append(element.tag)
+                continue
+            key = '/'.join(path[1:])
+            path.pop()
+            if key in ('Meta/DatabaseName', 'Meta/DatabaseDescription', 'Root/Group/UUID'):
+                values[key] = element.text or ''
+                if key == 'Root/Group/UUID':
+                    break
+        return DatabaseInfo(
+            uuid='{{{}}}'.format(UUID(bytes=base64.b64decode(values['Root/Group/UUID']))),
+            name=values.get('Meta/DatabaseName', ''),
+            description=values.get('Meta/DatabaseDescription', ''),
+            cipher=payload.header.get_cipher_name(),
+            kdf=payload.header.get_kdf_name(),
+        )
+
+    def export(self, format: str = None) -> str:
+        if format is None or format == 'xml':
+            content = self.load().get_xml()
+        else:
+            assert format == 'csv'
+            content = self._export_csv(self.load().get_tree())
+        # like the output of keepassxc-cli, see Command._handle_result()
+        return content.strip('\r\n')
+
+    def export_iter(self, format: str = None, chunk_size: int = 65536) -> Iterator[str]:
+        content = self.export(format)
+        for start in range(0, len(content), chunk_size):
+            yield content[start:start + chunk_size]
+
+    def analyze(self, hibp_path: str = None) -> Iterator[Finding]:
+        """
+        Checks the passwords against a file of leaked password hashes in-process, see
+        :py:meth:`~entity.Database.find_leaked`. Without one, keepassxc-cli analyzes the database.
+        """
+        if hibp_path is None:
+            return super().analyze()
+        return self.find_leaked(hibp_path)
+
+    def list_entries(self, group: str = None, recursive: bool = False) -> List[str]:
+        """
+        See :py:meth:`~entity.Database.list_entries`.
+
+        :raise ValueError: If the group does not exist.
+        """
+        element = self.load().get_tree().find('Root/Group')
+        for name in [] if group is None else [name for name in group.strip('/').split('/') if len(name) > 0]:
+            element = next((child for child in element.iterfind('Group') if child.findtext('Name') == name), None)
+            if element is None:
+                raise ValueError('Cannot find group {}.'.format(group))
+        return self._list_group(element, recursive, 0)
+
+    @classmethod
+    def _list_group(cls, group: Element, recursive: bool, depth: int) -> List[str]:
+        # the output of `keepassxc-cli ls`: entries before groups, subgroups indented
+        prefix = '  ' * depth
+        entries, groups = group.findall('Entry'), group.findall('Group')
+        if len(entries) == 0 and len(groups) == 0:
+            return [prefix + '[empty]']
+        lines = [prefix + cls._get_string(entry, 'Title') for entry in entries]
+        for child in groups:
+            lines.append(prefix + (child.findtext('Name') or '') + '/')
+            if recursive:
+                lines += cls._list_group(child, recursive, depth + 1)
+        return lines
+
+    @classmethod
+    def _export_csv(cls, root: Element) -> str:
+        # the columns and quoting of `keepassxc-cli export --format csv`
+        def quote(values: List[str]) -> str:
+            return ','.join('"{}"'.format(value.replace('"', '""')) for value in values) + '\n'
+
+        lines = [quote(['Group', 'Title', 'Username', 'Password', 'URL', 'Notes'])]
+        stack = [(root.find('Root/Group'), '')]
+        while len(stack) > 0:
+            group, path = stack.pop()
+            path = '{}/{}'.format(path, group.findtext('Name') or '') if path else group.findtext('Name') or ''
+            for entry in group.iterfind('Entry'):
+                lines.append(quote([path] + [cls._get_string(entry, key)
+                                             for key in ('Title', 'UserName', 'Password', 'URL', 'Notes')]))
+            stack += [(child, path) for child in reversed(group.findall('Group'))]
+        return ''.join(lines)
+
+    @staticmethod
+    def _get_string(entry: Element, key: str) -> str:
+        for string in entry.iterfind('String'):
+            if string.findtext('Key') == key:
+                return string.findtext('Value') or ''
+        return ''
@@ -0,0 +1,77 @@
+import itertools
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+def get_default_workers(memory_per_worker: int = None) -> int:
+    """
+    :param memory_per_worker: [optional] Bytes each worker needs, e.g. for a memory-hard KDF
+    :return: The number of CPUs, limited by the number of workers that fit into the available memory.
+    """
+    workers = os.cpu_count() or 1
+    if memory_per_worker is not None and memory_per_worker > 0:
+        available = get_available_memory()
+        if available is not None:
+            workers = min(workers, available // memory_per_worker)
+    return max(workers, 1)
+
+
+def get_available_memory() -> Optional[int]:
+    """
+    :return: Bytes of memory available without swapping or `None` if unknown.
+    """
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def imap(function: Callable[[T], R], iterable: Iterable[T], workers: int = None, ordered: bool = True) -> Iterator[R]:
+    """
+    Applies a function to the items of an iterable in a bounded pool of threads and yields the results.
+    Every call of the function runs a keepassxc-cli subprocess, so threads suffice to run them in parallel.
+    At most twice as many items as there are workers are in flight, so neither the iterable nor
+    the results are ever held in memory as a whole.
+
+    :param function: Called with each item
+    :param iterable: The items
+    :param workers: Number of parallel calls, defaults to the number of CPUs
+    :param ordered: Yield the results in the order of the items instead of as they finish
+    :raise ValueError: If the number of workers is less than one.
+    :return: The results of the calls. An exception raised by a call is raised when its result is due.
+    """
+    if workers is None:
+        workers = get_default_workers()
+    if workers < 1:
+        raise ValueError('Invalid worker count.')
+
+    items = iter(iterable)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque(executor.submit(function, item) for item in itertools.islice(items, 2 * workers))
+        try:
+            while len(pending) > 0:
+                if ordered:
+                    done = [pending.popleft()]
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.remove(future)
+                for future in done:
+                    for item in itertools.islice(items, 1):
+                        pending.append(executor.submit(function, item))
+                    yield future.result()
+        finally:
+            for future in pending:  # type: Future
+                future.cancel()
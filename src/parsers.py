@@ -0,0 +1,235 @@
+import re
+from typing import Dict, Iterable, Iterator, Optional, Union
+
+# `Key: value` lines of `db-info` and `show`
+ATTRIBUTE_PATTERN = re.compile(r'^([A-Za-z]+):\s+(.*)$')
+# `Argon2 (20 rounds, 65536 KB)`, `AES (1000000 rounds)`
+KDF_PATTERN = re.compile(r'^(.*?)\s*\(([0-9]+) rounds?(?:, ([0-9]+) KB)?\)$')
+ESTIMATE_PATTERN = re.compile(r'^Length ([0-9]+)\s+Entropy ([0-9.]+)\s+Log10 ([0-9.]+)$')
+# the messages of KeePassXC's Merger, most end with the UUID or value in brackets
+MERGE_PATTERN = re.compile(
+    r'^(Creating missing|Relocating|Overwriting|Synchronizing from newer source|Synchronizing from older source|'
+    r'Deleting child|Deleting orphan|Adding missing icon|Adding custom data|Removed custom data|Merge) '
+    r'(.*?)(?: \[([^\]]*)\])?$')
+NOT_MODIFIED = 'Database was not modified by merge operation.'
+# `Password for 'websites/Wikipedia' has been leaked 3 time(s)!`, older versions print `times!`
+LEAK_PATTERN = re.compile(r"^Password for '(.*)' has been leaked(?: ([0-9]+) time(?:\(s\)|s)?)?!$")
+
+
+class DatabaseInfo(dict):
+    __slots__ = ()
+
+    def __init__(self, uuid: str = None, name: str = None, description: str = None, cipher: str = None,
+                 kdf: str = None, **attributes: str):
+        """
+        The output of `keepassxc-cli db-info` with the KDF parameters parsed. It is the dictionary
+        of the attributes (keys in lower case) that :py:meth:`~entity.Database.get_info` always returned,
+        so it compares equal to it, and it has attributes for the fields.
+
+        :param kdf: The KDF as printed, e.g. 'Argon2 (20 rounds, 65536 KB)'
+        :param attributes: Other attributes printed by `db-info`
+        """
+        super().__init__((k, v) for k, v in (('uuid', uuid), ('name', name), ('description', description),
+                                             ('cipher', cipher), ('kdf', kdf)) if v is not None)
+        self.update(attributes)
+
+    uuid = property(lambda self: self.get('uuid'))  # type: Optional[str]
+    name = property(lambda self: self.get('name'))  # type: Optional[str]
+    description = property(lambda self: self.get('description'))  # type: Optional[str]
+    cipher = property(lambda self: self.get('cipher'))  # type: Optional[str]
+    kdf = property(lambda self: self.get('kdf'))  # type: Optional[str]
+
+    @property
+    def kdf_name(self) -> Optional[str]:
+        match = self._match_kdf()
+        return self.kdf if match is None else match.group(1)
+
+    @property
+    def kdf_rounds(self) -> Optional[int]:
+        match = self._match_kdf()
+        return None if match is None else int(match.group(2))
+
+    @property
+    def kdf_memory(self) -> Optional[int]:
+        """
+        :return: Bytes, `None` for KDFs that are not memory-hard
+        """
+        match = self._match_kdf()
+        return None if match is None or match.group(3) is None else int(match.group(3)) * 1024
+
+    @classmethod
+    def from_dict(cls, info: Dict[str, str]) -> 'DatabaseInfo':
+        """
+        :param info: The attributes, e.g. of :py:func:`parse_attributes`
+        """
+        return cls(**info)
+
+    def to_dict(self) -> Dict[str, str]:
+        return dict(self)
+
+    def _match_kdf(self):
+        return None if self.kdf is None else KDF_PATTERN.match(self.kdf)
+
+
+class PasswordEstimate(dict):
+    __slots__ = ()
+
+    def __init__(self, length: int, entropy: float, log10: float):
+        """
+        The output of `keepassxc-cli estimate`. It is the dictionary with the keys 'length', 'entropy' and 'log10'
+        that :py:func:`~keepassxc.estimate_password` always returned, and it has attributes for them.
+
+        :param entropy: Bits of entropy
+        :param log10: Decimal logarithm of the number of guesses
+        """
+        super().__init__(length=length, entropy=entropy, log10=log10)
+
+    length = property(lambda self: self['length'])  # type: int
+    entropy = property(lambda self: self['entropy'])  # type: float
+    log10 = property(lambda self: self['log10'])  # type: float
+
+    def to_dict(self) -> dict:
+        return dict(self)
+
+
+class MergeChange:
+    __slots__ = ('action', 'path', 'detail', 'message')
+
+    def __init__(self, message: str, action: str = None, path: str = None, detail: str = None):
+        """
+        A change of `keepassxc-cli merge`, e.g. 'Creating missing Test entry [898c7067a74e4aada0d2a3cf590f8c2a]'.
+
+        :param message: The line as printed
+        :param action: The action, e.g. 'Creating missing', `None` if the message is unknown
+        :param path: The entry, group or custom data the action applies to
+        :param detail: The text in brackets, mostly the UUID of an entry or the value of custom data
+        """
+        self.message = message
+        self.action = action
+        self.path = path
+        self.detail = detail
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, MergeChange) and self.message == other.message
+
+    def __hash__(self) -> int:
+        return hash(self.message)
+
+    def __str__(self) -> str:
+        return self.message
+
+    def __repr__(self) -> str:
+        return 'MergeChange({!r})'.format(self.message)
+
+
+class Finding:
+    __slots__ = ('kind', 'path', 'count', 'uuid')
+
+    def __init__(self, kind: str, path: str, count: int = None, uuid: str = None):
+        """
+        A weakness of an entry found by `keepassxc-cli analyze` or :py:meth:`~entity.Database.find_leaked`.
+
+        :param kind: 'leaked' for a password listed in a breach
+        :param path: Path of the entry below the root group, e.g. 'websites/Wikipedia'
+        :param count: How often the password has been seen in breaches, if known
+        :param uuid: [optional] UUID of the entry, keepassxc-cli does not print it
+        """
+        self.kind = kind
+        self.path = path
+        self.count = count
+        self.uuid = uuid
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Finding) and (self.kind, self.path, self.count, self.uuid) == \
+            (other.kind, other.path, other.count, other.uuid)
+
+    def __hash__(self) -> int:
+        return hash((self.kind, self.path, self.count, self.uuid))
+
+    def __repr__(self) -> str:
+        return 'Finding({!r}, {!r}, count={!r})'.format(self.kind, self.path, self.count)
+
+
+def iter_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Splits a stream of chunks, e.g. from :py:meth:`~command.Command.stream`, into lines without line breaks.
+    """
+    rest = ''
+    for chunk in chunks:
+        lines = (rest + chunk).split('\n')
+        rest = lines.pop()
+        for line in lines:
+            yield line.rstrip('\r')
+    if len(rest) > 0:
+        yield rest.rstrip('\r')
+
+
+def parse_attributes(output: Union[str, Iterable[str]]) -> Dict[str, str]:
+    """
+    Parses `Key: value` lines, the keys in lower case. Other lines are skipped.
+
+    :param output: The output or its lines
+    """
+    attributes = {}
+    for line in _get_lines(output):
+        match = ATTRIBUTE_PATTERN.match(line)
+        if match is not None:
+            attributes[match.group(1).lower()] = match.group(2)
+    return attributes
+
+
+def parse_database_info(output: Union[str, Iterable[str]]) -> DatabaseInfo:
+    """
+    Parses the `Key: value` lines of `db-info`, see :py:func:`parse_attributes`.
+    """
+    return DatabaseInfo.from_dict(parse_attributes(output))
+
+
+def parse_password_estimate(output: Union[str, Iterable[str]]) -> PasswordEstimate:
+    """
+    :raise ValueError: If the first line is not an estimation.
+    """
+    line = next(iter(_get_lines(output)), '')
+    match = ESTIMATE_PATTERN.match(line)
+    if match is None:
+        raise ValueError('{} does not match {}'.format(line, ESTIMATE_PATTERN.pattern))
+    return PasswordEstimate(int(match.group(1)), _to_number(match.group(2)), _to_number(match.group(3)))
+
+
+def parse_merge_change(line: str) -> MergeChange:
+    line = line.strip()
+    match = MERGE_PATTERN.match(line)
+    if match is None:
+        return MergeChange(line)
+    return MergeChange(line, *match.groups())
+
+
+def iter_merge_changes(output: Union[str, Iterable[str]]) -> Iterator[MergeChange]:
+    """
+    Yields the changes of `keepassxc-cli merge`, blank lines and the final message are skipped.
+    """
+    for line in _get_lines(output):
+        line = line.strip()
+        if len(line) > 0 and not line == NOT_MODIFIED:
+            yield parse_merge_change(line)
+
+
+def iter_findings(output: Union[str, Iterable[str]]) -> Iterator[Finding]:
+    """
+    Yields the findings of `keepassxc-cli analyze`, progress messages are skipped.
+    """
+    for line in _get_lines(output):
+        match = LEAK_PATTERN.match(line.strip())
+        if match is not None:
+            yield Finding('leaked', match.group(1), None if match.group(2) is None else int(match.group(2)))
+
+
+def _get_lines(output: Union[str, Iterable[str]]) -> Iterable[str]:
+    return output.splitlines() if isinstance(output, str) else output
+
+
+def _to_number(string: str) -> Union[int, float]:
+    try:
+        return int(string)
+    except ValueError:
+        return float(string)
@@ -0,0 +1,260 @@
+import hmac
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
+import command
+from interface import IDatabase
+from session import DatabaseSession
+
+
+class _Bucket:
+    def __init__(self, database: IDatabase):
+        self.database = database
+        self.idle = deque()  # type: Deque[Tuple[DatabaseSession, float]]
+        self.size = 0
+        # the credentials of `database` are only bound to the bucket once a session has been unlocked with them
+        self.unlocked = False
+
+
+class SessionPool:
+    def __init__(self, min_size: int = 0, max_size: int = 4, idle_timeout: float = 300.0, timeout: int = 30,
+                 health_check: Callable[[DatabaseSession], bool] = None):
+        """
+        A thread-safe pool of unlocked :py:class:`~session.DatabaseSession` objects.
+        Sessions are keyed by database path and key-file, each session is used by one thread at a time.
+
+        :param min_size: Sessions kept open per database, even when idle
+        :param max_size: Maximum number of sessions per database
+        :param idle_timeout: Seconds after which idle sessions beyond `min_size` are closed
+        :param timeout: Seconds to wait for a session's shell to answer a command
+        :param health_check: [optional] Called before an idle session is handed out, unhealthy sessions are replaced
+        """
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError('Invalid pool size.')
+        self._min_size = min_size
+        self._max_size = max_size
+        self._idle_timeout = idle_timeout
+        self._timeout = timeout
+        self._health_check = health_check
+        self._buckets = {}  # type: Dict[Tuple[str, Optional[str]], _Bucket]
+        self._condition = threading.Condition()
+        self._closed = False
+        self._metrics = {'hits': 0, 'misses': 0, 'waits': 0, 'wait_time': 0.0, 'opened': 0, 'closed': 0,
+                         'unhealthy': 0}
+
+    def __enter__(self) -> 'SessionPool':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def get_key(database: IDatabase) -> Tuple[str, Optional[str]]:
+        return database.get_path(), database.get_key_file()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        :return: Counters of the pool: `hits` (idle session reused), `misses` (new session opened),
+            `waits` (all sessions busy), `wait_time` (seconds spent waiting), `opened`, `closed` and `unhealthy`
+            sessions as well as the current number of `idle` and `busy` sessions.
+        """
+        with self._condition:
+            metrics = dict(self._metrics)
+            metrics['idle'] = sum(len(bucket.idle) for bucket in self._buckets.values())
+            metrics['busy'] = sum(bucket.size for bucket in self._buckets.values()) - metrics['idle']
+            return metrics
+
+    def warm(self, database: IDatabase):
+        """
+        Opens sessions until `min_size` sessions of the database exist.
+        """
+        sessions = []
+        with self._condition:
+            bucket = self._get_bucket(database)
+            while bucket is None:
+                self._condition.wait()
+                bucket = self._get_bucket(database)
+            missing = max(0, self._min_size - bucket.size)
+            bucket.size += missing
+        try:
+            for _ in range(missing):
+                sessions.append(self._open(bucket))
+        finally:
+            with self._condition:
+                bucket.size -= missing - len(sessions)
+                bucket.idle.extend((session, time.monotonic()) for session in sessions)
+                self._drop_if_locked(bucket)
+                self._condition.notify_all()
+
+    @contextmanager
+    def acquire(self, database: IDatabase, wait_timeout: float = None) -> Iterator[DatabaseSession]:
+        """
+        Checks out an unlocked session of the database, opening one if none is idle and the pool is not full.
+
+        :param database: The database to unlock
+        :param wait_timeout: [optional] Seconds to wait for a busy session to be released
+        :raise ValueError: If the password differs from the one the pooled sessions were opened with.
+        :raise TimeoutError: If no session became available within `wait_timeout`.
+        """
+        session = self._checkout(database, wait_timeout)
+        try:
+            yield session
+        finally:
+            self._release(database, session)
+
+    def execute(self, database_command: command.DatabaseCommand, check: bool = True) -> Any:
+        """
+        Executes a database command in a pooled session of its database.
+        """
+        with self.acquire(database_command.get_database()) as session:
+            return database_command.execute_in(session, check)
+
+    def prune(self):
+        """
+        Closes sessions that have been idle for longer than `idle_timeout`, keeping `min_size` sessions per database.
+        """
+        expired = []
+        deadline = time.monotonic() - self._idle_timeout
+        with self._condition:
+            for bucket in self._buckets.values():
+                while len(bucket.idle) > 0 and bucket.size > self._min_size and bucket.idle[0][1] < deadline:
+                    expired.append(bucket.idle.popleft()[0])
+                    bucket.size -= 1
+        for session in expired:
+            self._close(session)
+
+    def close(self):
+        """
+        Closes all idle sessions. Busy sessions are closed as soon as they are released.
+        """
+        with self._condition:
+            self._closed = True
+            sessions = []
+            for bucket in self._buckets.values():
+                sessions += [session for session, _ in bucket.idle]
+                bucket.size -= len(bucket.idle)
+                bucket.idle.clear()
+            self._condition.notify_all()
+        for session in sessions:
+            self._close(session)
+
+    def _get_bucket(self, database: IDatabase) -> Optional[_Bucket]:
+        """
+        :return: The bucket of the database, `None` while a session is being opened with other credentials
+            that have not unlocked the database yet.
+        :raise ValueError: If the database has been unlocked with other credentials.
+        """
+        if self._closed:
+            raise IOError('Session pool is closed.')
+        key = self.get_key(database)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(database)
+        elif not hmac.compare_digest((bucket.database.get_password() or '').encode(),
+                                     (database.get_password() or '').encode()) \
+                or bucket.database.has_password() != database.has_password():
+            if bucket.unlocked:
+                raise ValueError('Password does not match the pooled sessions of {}.'.format(database.get_path()))
+            if bucket.size > 0:
+                return None
+            bucket.database = database
+        return bucket
+
+    def _drop_if_locked(self, bucket: _Bucket):
+        # a bucket whose sessions all failed to unlock keeps no credentials, e.g. a mistyped password
+        if not bucket.unlocked and bucket.size == 0 and self._buckets.get(self.get_key(bucket.database)) is bucket:
+            del self._buckets[self.get_key(bucket.database)]
+
+    def _checkout(self, database: IDatabase, wait_timeout: Optional[float]) -> DatabaseSession:
+        self.prune()
+        deadline = None if wait_timeout is None else time.monotonic() + wait_timeout
+        waited = None
+        while True:
+            session = None
+            with self._condition:
+                while True:
+                    bucket = self._get_bucket(database)
+                    if bucket is not None and len(bucket.idle) > 0:
+                        # still counted in the size of the bucket until it turns out to be unhealthy
+                        session, _ = bucket.idle.pop()
+                        break
+
+                    if bucket is not None and bucket.size < self._max_size:
+                        self._metrics['misses'] += 1
+                        self._record_wait(waited)
+                        bucket.size += 1
+                        break
+
+                    if waited is None:
+                        waited = time.monotonic()
+                        self._metrics['waits'] += 1
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._record_wait(waited)
+                        raise TimeoutError('No session of {} became available.'.format(database.get_path()))
+                    self._condition.wait(remaining)
+
+            if session is None:
+                break
+            # the health check and closing may take as long as a command, other checkouts must not wait for them
+            if self._is_healthy(session):
+                with self._condition:
+                    self._metrics['hits'] += 1
+                    self._record_wait(waited)
+                return session
+            with self._condition:
+                self._metrics['unhealthy'] += 1
+                bucket.size -= 1
+                self._condition.notify_all()
+            self._close(session)
+
+        try:
+            return self._open(bucket)
+        except BaseException:
+            with self._condition:
+                bucket.size -= 1
+                self._drop_if_locked(bucket)
+                self._condition.notify_all()
+            raise
+
+    def _release(self, database: IDatabase, session: DatabaseSession):
+        with self._condition:
+            bucket = self._buckets[self.get_key(database)]
+            if not self._closed and session.is_open():
+                bucket.idle.append((session, time.monotonic()))
+                self._condition.notify_all()
+                return
+            bucket.size -= 1
+            self._condition.notify_all()
+        self._close(session)
+
+    def _is_healthy(self, session: DatabaseSession) -> bool:
+        if not session.is_open():
+            return False
+        if self._health_check is None:
+            return True
+        try:
+            return self._health_check(session)
+        except Exception as e:
+            logging.error('Health check of session for {} failed: {}'.format(session.get_database().get_path(), e))
+            return False
+
+    def _record_wait(self, waited: Optional[float]):
+        if waited is not None:
+            self._metrics['wait_time'] += time.monotonic() - waited
+
+    def _open(self, bucket: _Bucket) -> DatabaseSession:
+        session = DatabaseSession(bucket.database, self._timeout)
+        session.open()
+        with self._condition:
+            self._metrics['opened'] += 1
+            bucket.unlocked = True
+        return session
+
+    def _close(self, session: DatabaseSession):
+        session.close()
+        with self._condition:
+            self._metrics['closed'] += 1
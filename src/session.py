@@ -0,0 +1,126 @@
+import binascii
+import logging
+import os
+import subprocess
+import threading
+from typing import List, Tuple
+import command
+from interface import IDatabase
+
+# the name of the unknown command that marks the end of the output of a command
+SENTINEL_PREFIX = 'pykeepassxc-end'
+
+
+class DatabaseSession:
+    def __init__(self, database: IDatabase, timeout: int = 30):
+        """
+        An unlocked database, held open by the interactive shell of `keepassxc-cli open`.
+        The key derivation is paid once when the session is opened instead of once per command.
+
+        :param database: The database to unlock
+        :param timeout: Seconds to wait for the shell to answer a command
+        """
+        self._database = database
+        self._timeout = timeout
+        self._child = None
+        self._prompt = None
+        self._lock = threading.RLock()
+
+    def __enter__(self) -> 'DatabaseSession':
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get_database(self) -> IDatabase:
+        return self._database
+
+    def is_open(self) -> bool:
+        return self._child is not None and self._child.proc.poll() is None
+
+    def open(self):
+        """
+        Starts the shell and unlocks the database.
+
+        :raise CalledProcessError: If the database could not be unlocked.
+        """
+        with self._lock:
+            if self.is_open():
+                return
+            self._child, self._prompt = command.OpenDatabaseCommand(self._database).spawn(self._timeout)
+
+    def close(self):
+        """
+        Quits the shell. The database is locked again afterwards.
+        """
+        with self._lock:
+            if self._child is None:
+                return
+            try:
+                if self.is_open():
+                    self._child.sendline('quit')
+                self._child.wait()
+            except (subprocess.TimeoutExpired, OSError):
+                logging.error('Session for {} did not quit, killing it'.format(self._database.get_path()))
+                self._child.kill()
+            finally:
+                self._child = None
+                self._prompt = None
+
+    def run(self, parts: List[str], prompts: List[Tuple[str, str]] = None) -> Tuple[int, str, str]:
+        """
+        Sends a command line into the shell and collects its output. The shell has no exit status per command,
+        so the output ends where the shell rejects an unknown command with a random name sent right after it,
+        and a command failed if it printed an error message on STDERR.
+        If the shell stops answering or anything else goes wrong, the shell is killed and the session is closed,
+        as the rest of the output would otherwise end up in the output of the next command.
+
+        :param parts: The command and its options and arguments, without the database path
+        :param prompts: Pairs of prompt and password the command asks for
+        :raise IOError: If the session is not open.
+        :raise TimeoutExpired: If the shell did not answer within the timeout of the session.
+        :return: Return code, STDOUT and STDERR of the command.
+        """
+        with self._lock:
+            if not self.is_open():
+                raise IOError('Session for {} is not open.'.format(self._database.get_path()))
+            try:
+                return self._run(parts, prompts)
+            except BaseException:
+                logging.error('Command in session for {} failed, killing it'.format(self._database.get_path()))
+                self._child.kill()
+                self._child = None
+                self._prompt = None
+                raise
+
+    def _run(self, parts: List[str], prompts: List[Tuple[str, str]] = None) -> Tuple[int, str, str]:
+        self._child.sendline(' '.join(command.DatabaseCommand.quote_interactive(part) for part in parts))
+        # the shell reads from a pipe and does not echo the input, so only its answer contains the name
+        sentinel = '{}-{}'.format(SENTINEL_PREFIX, binascii.hexlify(os.urandom(8)).decode('ascii'))
+        try:
+            for prompt, password in prompts if prompts is not None else []:
+                self._child.expect_exact(prompt)
+                self._child.sendline(password)
+            self._child.sendline(sentinel)
+            self._child.expect_exact(sentinel)
+            # the last line of STDERR is the start of the answer to the sentinel
+            errors = self._child.before.rsplit('\n', 1)[0] if '\n' in self._child.before else ''
+            self._child.expect_exact('\n')
+            # STDOUT ends with the prompt after the command and the one after the sentinel
+            exited = not self._child.expect_end(self._prompt * 2)
+        except EOFError:
+            exited = True
+
+        if exited:
+            return_code = self._child.wait()
+            stdout, stderr = self._child.read_stdout().strip(), self._child.read_stderr().strip()
+            self._child = None
+            self._prompt = None
+            return return_code if return_code != 0 else 1, stdout, stderr
+
+        output = self._child.read_stdout()[:-2 * len(self._prompt)].strip()
+        errors = errors.strip()
+        if len(errors) > 0:
+            return 1, output, errors
+        return 0, output, ''
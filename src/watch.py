@@ -0,0 +1,328 @@
+import ctypes
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+from cache import fingerprint
+from interface import IDatabase
+from libc import get_libc
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+# the events of a file in a watched directory, KeePassXC saves to a temporary file and renames it (IN_MOVED_TO)
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+Target = Union[str, IDatabase]
+
+
+class Subscription:
+    __slots__ = ('path', 'target', 'callback', '_watcher')
+
+    def __init__(self, watcher: 'FileWatcher', path: str, target: Target, callback: Callable[[Target], None]):
+        """
+        A callback for the changes of a file, see :py:meth:`FileWatcher.subscribe`.
+        """
+        self._watcher = watcher
+        self.path = path
+        self.target = target
+        self.callback = callback
+
+    def cancel(self):
+        self._watcher.unsubscribe(self)
+
+    def __repr__(self) -> str:
+        return 'Subscription({!r})'.format(self.path)
+
+
+class FileWatcher:
+    def __init__(self, debounce: float = 0.2, poll_interval: float = 1.0, backend: str = None):
+        """
+        Notifies subscribers when database files change, e.g. when KeePassXC replaces a file on save.
+        The directories of the files are watched with inotify on Linux, otherwise the files are polled.
+        Bursts of events are debounced: a file is only checked once it has been quiet for `debounce`
+        seconds, and subscribers are only called if its fingerprint has changed.
+
+        Callbacks are called in the thread of the watcher, it is started with the first subscription.
+
+        >>> watcher = FileWatcher()
+        >>> watcher.subscribe(database, lambda database: print(database.get_path(), 'changed'))
+
+        :param debounce: Seconds a file must be quiet before it is checked
+        :param poll_interval: Seconds between two polls of the files, if inotify is not available
+        :param backend: [optional] 'inotify' or 'poll', by default inotify if available
+        """
+        if backend not in (None, 'inotify', 'poll'):
+            raise ValueError('Invalid backend {}.'.format(backend))
+        self._debounce = debounce
+        self._poll_interval = poll_interval
+        self._inotify = None  # type: Optional[_Inotify]
+        if not backend == 'poll':
+            try:
+                self._inotify = _Inotify()
+            except OSError as e:
+                if backend == 'inotify':
+                    raise
+                logging.debug('Polling database files, inotify is not available: {}'.format(e))
+        self._lock = threading.RLock()
+        self._subscriptions = {}  # type: Dict[str, List[Subscription]]
+        self._fingerprints = {}  # type: Dict[str, Optional[Tuple[int, int, int]]]
+        # the fingerprints of the last poll, a file changing during the debounce is polled as changed again
+        self._polled = {}  # type: Dict[str, Optional[Tuple[int, int, int]]]
+        self._pending = {}  # type: Dict[str, float]
+        self._next_poll = 0.0
+        self._wakeup = os.pipe()
+        self._thread = None  # type: Optional[threading.Thread]
+        self._closed = False
+
+    def get_backend(self) -> str:
+        return 'inotify' if self._inotify is not None else 'poll'
+
+    def is_closed(self) -> bool:
+        return self._closed
+
+    def subscribe(self, target: Target, callback: Callable[[Target], None]) -> Subscription:
+        """
+        :param target: Path of the file or the database
+        :param callback: Called with the target each time the file has changed
+        :return: The subscription, to cancel it
+        """
+        path = os.path.abspath(target if isinstance(target, str) else target.get_path())
+        subscription = Subscription(self, path, target, callback)
+        with self._lock:
+            if self._closed:
+                raise ValueError('Watcher is closed.')
+            if path not in self._subscriptions:
+                self._fingerprints[path] = self._polled[path] = _get_fingerprint(path)
+                if self._inotify is not None:
+                    self._inotify.add(path)
+                self._subscriptions[path] = []
+            self._subscriptions[path].append(subscription)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='FileWatcher', daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.path, [])
+            if subscription in subscriptions:
+                subscriptions.remove(subscription)
+            if len(subscriptions) == 0 and subscription.path in self._subscriptions:
+                del self._subscriptions[subscription.path]
+                del self._fingerprints[subscription.path]
+                del self._polled[subscription.path]
+                self._pending.pop(subscription.path, None)
+                if self._inotify is not None:
+                    self._inotify.remove(subscription.path)
+
+    def get_paths(self) -> List[str]:
+        with self._lock:
+            return list(self._subscriptions)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        os.write(self._wakeup[1], b'\0')
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        for fd in self._wakeup:
+            os.close(fd)
+        if self._inotify is not None:
+            self._inotify.close()
+
+    def __enter__(self) -> 'FileWatcher':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _run(self):
+        while not self._closed:
+            try:
+                changed = self._wait(self._get_timeout())
+            except OSError as e:
+                logging.error('Cannot watch database files: {}'.format(e))
+                changed = self.get_paths()
+                time.sleep(self._poll_interval)
+            now = time.monotonic()
+            with self._lock:
+                for path in changed:
+                    if path in self._subscriptions:
+                        self._pending[path] = now + self._debounce
+                due = [path for path, deadline in self._pending.items() if deadline <= now]
+                for path in due:
+                    del self._pending[path]
+            for path in due:
+                self._check(path)
+
+    def _get_timeout(self) -> Optional[float]:
+        now = time.monotonic()
+        with self._lock:
+            deadlines = list(self._pending.values())
+        if self._inotify is None:
+            deadlines.append(self._next_poll)
+        return max(min(deadlines) - now, 0.0) if len(deadlines) > 0 else None
+
+    def _wait(self, timeout: Optional[float]) -> Iterable[str]:
+        """
+        :return: The files that might have changed
+        """
+        fds = [self._wakeup[0]] if self._inotify is None else [self._wakeup[0], self._inotify.fileno()]
+        ready, _, _ = select.select(fds, [], [], timeout)
+        if self._closed:
+            return []
+        if self._inotify is not None:
+            if self._inotify.fileno() not in ready:
+                return []
+            with self._lock:
+                return self._inotify.read()
+        if time.monotonic() < self._next_poll:
+            return []
+        self._next_poll = time.monotonic() + self._poll_interval
+        with self._lock:
+            paths = list(self._polled)
+        changed = []
+        for path in paths:
+            current = _get_fingerprint(path)
+            with self._lock:
+                if path in self._polled and not self._polled[path] == current:
+                    self._polled[path] = current
+                    changed.append(path)
+        return changed
+
+    def _check(self, path: str):
+        current = _get_fingerprint(path)
+        with self._lock:
+            if path not in self._fingerprints or self._fingerprints[path] == current:
+                return
+            self._fingerprints[path] = current
+            subscriptions = list(self._subscriptions[path])
+        for subscription in subscriptions:
+            try:
+                subscription.callback(subscription.target)
+            except Exception:
+                logging.exception('Callback for changes of {} failed.'.format(path))
+
+
+class _Inotify:
+    def __init__(self):
+        """
+        The directories of the watched files, watched with one inotify instance.
+        """
+        libc = _get_libc()
+        if libc is None:
+            raise OSError(errno.ENOSYS, 'inotify is not available.')
+        self._libc = libc
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise _get_error('inotify_init1')
+        self._directories = {}  # type: Dict[int, str]
+        self._files = {}  # type: Dict[str, set]
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def add(self, path: str):
+        directory, name = os.path.split(path)
+        if directory not in self._files:
+            descriptor = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+            if descriptor < 0:
+                raise _get_error('inotify_add_watch')
+            self._directories[descriptor] = directory
+            self._files[directory] = set()
+        self._files[directory].add(name)
+
+    def remove(self, path: str):
+        directory, name = os.path.split(path)
+        names = self._files.get(directory, set())
+        names.discard(name)
+        if len(names) == 0 and directory in self._files:
+            del self._files[directory]
+            for descriptor in [d for d, other in self._directories.items() if other == directory]:
+                del self._directories[descriptor]
+                self._libc.inotify_rm_watch(self._fd, descriptor)
+
+    def read(self) -> List[str]:
+        """
+        :return: The watched files with events
+        """
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        paths = []
+        offset = 0
+        while offset < len(data):
+            descriptor, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # events have been lost, any file might have changed
+                paths += [os.path.join(d, n) for d, names in self._files.items() for n in names]
+                continue
+            directory = self._directories.get(descriptor)
+            if directory is not None and name in self._files.get(directory, ()):
+                paths.append(os.path.join(directory, name))
+        return paths
+
+    def close(self):
+        os.close(self._fd)
+
+
+def _get_fingerprint(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        return fingerprint(path)
+    except OSError:
+        return None
+
+
+def _get_libc() -> Optional[ctypes.CDLL]:
+    if not sys.platform.startswith('linux'):
+        return None
+    libc = get_libc('inotify_init1', 'inotify_add_watch', 'inotify_rm_watch')
+    if libc is None:
+        return None
+    libc.inotify_init1.argtypes = (ctypes.c_int,)
+    libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+    libc.inotify_rm_watch.argtypes = (ctypes.c_int, ctypes.c_int)
+    return libc
+
+
+def _get_error(function: str) -> OSError:
+    number = ctypes.get_errno()
+    return OSError(number, '{}: {}'.format(function, os.strerror(number)))
+
+
+_watcher = None  # type: Optional[FileWatcher]
+_watcher_lock = threading.Lock()
+
+
+def get_watcher() -> FileWatcher:
+    """
+    :return: The watcher shared by all databases, see :py:meth:`~entity.Database.watch`.
+        A new one is created once it has been closed.
+    """
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None or _watcher.is_closed():
+            _watcher = FileWatcher()
+        return _watcher
@@ -0,0 +1,119 @@
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from agent import AgentClient, AgentDatabase, AgentServer, FRAME_HEADER, receive_frame, send_frame
+from interface import IDatabase
+
+
+class FrameTest(unittest.TestCase):
+    def test_frames(self):
+        a, b = socket.socketpair()
+        with a, b:
+            send_frame(a, {'method': 'get_info', 'args': {'text': 'Passwörter'}})
+            send_frame(a, {})
+            self.assertDictEqual(receive_frame(b, 1024), {'method': 'get_info', 'args': {'text': 'Passwörter'}})
+            self.assertDictEqual(receive_frame(b, 1024), {})
+            a.shutdown(socket.SHUT_WR)
+            self.assertIsNone(receive_frame(b, 1024))
+
+    def test_limit(self):
+        a, b = socket.socketpair()
+        with a, b:
+            a.sendall(FRAME_HEADER.pack(2048))
+            with self.assertRaises(IOError):
+                receive_frame(b, 1024)
+
+    def test_incomplete(self):
+        a, b = socket.socketpair()
+        with a, b:
+            a.sendall(FRAME_HEADER.pack(10) + b'{}')
+            a.shutdown(socket.SHUT_WR)
+            with self.assertRaises(IOError):
+                receive_frame(b, 1024)
+
+
+class AgentTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.temp_dir.name, 'agent', 'agent.sock')
+        self.start()
+        self.client = AgentClient(self.socket_path, timeout=30)
+        self.database = AgentDatabase('assets/password.kdbx', password='1234', client=self.client)
+
+    def tearDown(self):
+        self.client.close()
+        self.stop()
+        self.temp_dir.cleanup()
+
+    def start(self):
+        self.server = AgentServer(self.socket_path)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def test_interface(self):
+        self.assertIsInstance(self.database, IDatabase)
+        self.assertEqual(self.database.get_path(), os.path.abspath('assets/password.kdbx'))
+
+    def test_permissions(self):
+        self.assertEqual(os.stat(self.socket_path).st_mode & 0o777, 0o600)
+        self.assertEqual(os.stat(os.path.dirname(self.socket_path)).st_mode & 0o777, 0o700)
+
+    def test_public_directory(self):
+        directory = os.path.join(self.temp_dir.name, 'public')
+        os.mkdir(directory, 0o755)
+        os.chmod(directory, 0o755)
+        with self.assertRaises(PermissionError):
+            AgentServer(os.path.join(directory, 'agent.sock'))
+        self.assertListEqual(os.listdir(directory), [])
+
+    def test_get_info(self):
+        info = self.database.get_info()
+        self.assertSetEqual(set(info.keys()), {"uuid", "name", "description", "cipher", "kdf"})
+        self.assertDictEqual(self.database.get_info(), info)
+        metrics = self.client.get_metrics()
+        self.assertEqual(metrics['hits'], 1)
+        self.assertEqual(metrics['opened'], 1)
+
+    def test_export(self):
+        self.assertIn('<KeePassFile>', self.database.export(format='xml'))
+        target_path = os.path.join(self.temp_dir.name, 'export.xml')
+        self.database.export_to(target_path, format='xml')
+        with self.assertRaises(IOError):
+            self.database.export_to(target_path, format='xml')
+
+    def test_list_entries(self):
+        self.assertIsInstance(self.database.list_entries(recursive=True), list)
+        self.assertIsInstance(self.database.search('entry'), list)
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            self.client.call('unknown', self.database)
+        with self.assertRaises(FileNotFoundError):
+            AgentDatabase(os.path.join(self.temp_dir.name, 'missing.kdbx'), client=self.client).get_info()
+        self.database.get_info()
+        # the session of the agent has been unlocked with another password
+        with self.assertRaises(ValueError):
+            AgentDatabase('assets/password.kdbx', password='wrong', client=self.client).get_info()
+
+    def test_restart(self):
+        self.assertTrue(self.client.ping())
+        self.stop()
+        self.assertFalse(AgentClient(self.socket_path).ping())
+        self.start()
+        # the connection to the stopped agent is replaced
+        self.database.get_info()
+
+    def test_running(self):
+        with self.assertRaises(IOError):
+            AgentServer(self.socket_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import os
+import shutil
+import stat
+import subprocess
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import aio
+from command import DatabaseCommand, DatabaseInfoCommand, GeneratePasswordConfig, SearchDatabaseCommand
+from entity import Database
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+class Test(unittest.IsolatedAsyncioTestCase):
+    async def test_get_version(self):
+        self.assertRegex(await aio.get_version(), "^\\d\\.\\d\\.\\d$")
+
+    async def test_generate_password_length(self):
+        self.assertEqual(
+            len(await aio.generate_password(GeneratePasswordConfig(length=20))),
+            20)
+
+    async def test_generate_diceware(self):
+        self.assertEqual(
+            len((await aio.generate_diceware(words=7)).split(' ')),
+            7)
+
+    async def test_estimate_password(self):
+        self.assertDictEqual(
+            await aio.estimate_password('1234'),
+            {'length': 4, 'entropy': 2.0, 'log10': 0.602})
+
+    async def test_prompt_timeout(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # never prompts for the password
+            executable = os.path.join(temp_dir, 'keepassxc-cli')
+            with open(executable, 'w') as f:
+                f.write('#!/bin/sh\nexec sleep 60\n')
+            os.chmod(executable, os.stat(executable).st_mode | stat.S_IXUSR)
+            with mock.patch.dict(os.environ, {'KEEPASSXC_CLI_EXE': executable}):
+                with self.assertRaises(subprocess.TimeoutExpired):
+                    await aio.execute(DatabaseInfoCommand(Database('assets/password.kdbx', password='1234')),
+                                      timeout=0.5)
+
+    async def test_tty_required(self):
+        database = Database('assets/password.kdbx', password='1234')
+        expected = database.get_info()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # reads passwords from a terminal only
+            executable = os.path.join(temp_dir, 'keepassxc-cli')
+            with open(executable, 'w') as f:
+                f.write('#!/bin/sh\n[ -t 0 ] || {{ echo "Failed to read password" >&2; exit 1; }}\nexec {} "$@"\n'.format(
+                    shutil.which(os.getenv('KEEPASSXC_CLI_EXE', 'keepassxc-cli'))))
+            os.chmod(executable, os.stat(executable).st_mode | stat.S_IXUSR)
+            try:
+                with mock.patch.dict(os.environ, {'KEEPASSXC_CLI_EXE': executable}):
+                    self.assertDictEqual(await aio.execute(DatabaseInfoCommand(database)), expected)
+                    self.assertIn(executable, DatabaseCommand._tty_executables)
+            finally:
+                DatabaseCommand._tty_executables.discard(executable)
+
+    async def test_probe_in_executor(self):
+        # probing the executable runs it, which must not block the event loop
+        threads = []
+
+        def get_capabilities():
+            threads.append(threading.current_thread())
+            return mock.Mock(select=lambda name, *aliases: name)
+
+        with mock.patch('capabilities.get_capabilities', side_effect=get_capabilities):
+            await aio.execute(SearchDatabaseCommand(Database('assets/password.kdbx', password='1234'), 'test'))
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+
+
+class AsyncDatabaseTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.database = Database('assets/password.kdbx', password='1234')
+        self.async_database = aio.AsyncDatabase(self.database)
+
+    async def test_get_info(self):
+        self.assertDictEqual(
+            await self.async_database.get_info(),
+            self.database.get_info()
+        )
+
+    async def test_concurrent_get_info(self):
+        infos = await asyncio.gather(*[self.async_database.get_info() for _ in range(10)])
+        self.assertEqual(len(infos), 10)
+
+    async def test_export(self):
+        self.assertEqual(
+            await self.async_database.export(format='xml'),
+            self.database.export(format='xml')
+        )
+
+    async def test_export_to(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            target_path = os.path.join(temp_dir, 'export.xml')
+            await self.async_database.export_to(target_path, format='xml')
+            with open(target_path, 'r', encoding='utf-8') as f:
+                self.assertEqual(f.read().strip(), self.database.export(format='xml'))
+            with self.assertRaises(IOError):
+                await self.async_database.export_to(target_path, format='xml')
+
+    async def test_wrong_password(self):
+        database = aio.AsyncDatabase(Database('assets/password.kdbx', password='wrong'))
+        with self.assertRaises(Exception):
+            await database.get_info()
+
+
+class AsyncKeyFileDatabaseTest(AsyncDatabaseTest):
+    def setUp(self):
+        self.database = Database('assets/keyfile.kdbx', key_file='assets/keyfile.key')
+        self.async_database = aio.AsyncDatabase(self.database)
+
+    async def test_wrong_password(self):
+        pass
+
+
+class AsyncCompareDatabaseTest(unittest.IsolatedAsyncioTestCase):
+    async def test_compare(self):
+        database_1 = Database('assets/new.kdbx', password='1234')
+        database_2 = Database('assets/merge.kdbx', password='merge')
+        self.assertSetEqual(
+            await aio.AsyncDatabase(database_1).compare(database_2),
+            database_1.compare(database_2)
+        )
@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import unittest
+from backup import COPIED, DEDUPLICATED, UNCHANGED, SnapshotStore
+from entity import Database
+
+
+class SnapshotStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = SnapshotStore(os.path.join(self.temp_dir.name, 'store'), max_workers=2)
+        self.sources = []
+        for name in ('password', 'keyfile', 'copy'):
+            path = os.path.join(self.temp_dir.name, name + '.kdbx')
+            shutil.copyfile('assets/{}.kdbx'.format('password' if name == 'copy' else name), path)
+            self.sources.append(path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def get_statuses(self, snapshot) -> dict:
+        return {os.path.basename(source): file.status for source, file in snapshot.files.items()}
+
+    def test_snapshot(self):
+        snapshot = self.store.snapshot(self.sources)
+        self.assertTrue(snapshot.ok)
+        self.assertEqual(len(snapshot.files), 3)
+        # the copy of password.kdbx has the same content
+        self.assertEqual(sorted(self.get_statuses(snapshot).values()), [COPIED, COPIED, DEDUPLICATED])
+        self.assertEqual(snapshot.get_copied_bytes(),
+                         os.path.getsize(self.sources[0]) + os.path.getsize(self.sources[1]))
+        self.assertEqual(snapshot.get_deduplicated_bytes(), os.path.getsize(self.sources[2]))
+
+    def test_incremental(self):
+        first = self.store.snapshot(self.sources)
+        with open(self.sources[1], 'ab') as f:
+            f.write(b'changed')
+        second = self.store.snapshot(self.sources)
+        self.assertDictEqual(self.get_statuses(second),
+                             {'password.kdbx': UNCHANGED, 'keyfile.kdbx': COPIED, 'copy.kdbx': UNCHANGED})
+        self.assertEqual(second.get_copied_bytes(), os.path.getsize(self.sources[1]))
+        self.assertNotEqual(first.get_file(self.sources[1]).digest, second.get_file(self.sources[1]).digest)
+
+        # rewritten with the same content, like KeePassXC saving an unchanged database
+        shutil.copyfile(self.sources[2], self.sources[2] + '.new')
+        os.replace(self.sources[2] + '.new', self.sources[2])
+        self.assertEqual(self.get_statuses(self.store.snapshot(self.sources))['copy.kdbx'], DEDUPLICATED)
+
+    def test_list_snapshots(self):
+        self.assertIsNone(self.store.get_latest())
+        first = self.store.snapshot(self.sources[:1])
+        second = self.store.snapshot(self.sources)
+        self.assertListEqual([snapshot.id for snapshot in self.store.list_snapshots()], [first.id, second.id])
+        self.assertEqual(self.store.get_latest().id, second.id)
+        self.assertEqual(self.store.get_snapshot(first.id).get_file(self.sources[0]).digest,
+                         first.get_file(self.sources[0]).digest)
+        with self.assertRaises(KeyError):
+            self.store.get_snapshot('missing')
+
+    def test_restore(self):
+        snapshot = self.store.snapshot([Database(self.sources[0], password='1234')])
+        with open(self.sources[0], 'rb') as f:
+            content = f.read()
+        with open(self.sources[0], 'ab') as f:
+            f.write(b'changed')
+
+        target_path = os.path.join(self.temp_dir.name, 'restored.kdbx')
+        self.store.restore(snapshot.id, self.sources[0], target_path)
+        with open(target_path, 'rb') as f:
+            self.assertEqual(f.read(), content)
+        with self.assertRaises(IOError):
+            self.store.restore(snapshot, self.sources[0])
+        self.store.restore(snapshot, self.sources[0], overwrite=True)
+        with open(self.sources[0], 'rb') as f:
+            self.assertEqual(f.read(), content)
+        with self.assertRaises(KeyError):
+            self.store.restore(snapshot, self.sources[1])
+
+    def test_corrupted_object(self):
+        snapshot = self.store.snapshot(self.sources[:1])
+        with open(self.store.get_object_path(snapshot.get_file(self.sources[0]).digest), 'ab') as f:
+            f.write(b'corrupted')
+        with self.assertRaises(IOError):
+            self.store.restore(snapshot, self.sources[0], os.path.join(self.temp_dir.name, 'restored.kdbx'))
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir.name, 'restored.kdbx')))
+
+        # the current database is kept
+        with open(self.sources[0], 'rb') as f:
+            content = f.read()
+        with self.assertRaises(IOError):
+            self.store.restore(snapshot, self.sources[0], overwrite=True)
+        with open(self.sources[0], 'rb') as f:
+            self.assertEqual(f.read(), content)
+        self.assertListEqual(sorted(os.listdir(self.temp_dir.name)), ['copy.kdbx', 'keyfile.kdbx', 'password.kdbx',
+                                                                      'store'])
+
+    def test_missing_source(self):
+        snapshot = self.store.snapshot(self.sources + [os.path.join(self.temp_dir.name, 'missing.kdbx')])
+        self.assertFalse(snapshot.ok)
+        self.assertEqual(len(snapshot.files), 3)
+        self.assertListEqual(list(snapshot.errors), [os.path.join(self.temp_dir.name, 'missing.kdbx')])
+
+
+if __name__ == '__main__':
+    unittest.main()
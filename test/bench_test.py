@@ -0,0 +1,35 @@
+import unittest
+
+import bench
+
+
+class BenchTest(unittest.TestCase):
+    def test_percentile(self):
+        samples = [float(i) for i in range(1, 101)]
+        self.assertAlmostEqual(bench.percentile(samples, 50), 50.5)
+        self.assertAlmostEqual(bench.percentile(samples, 99), 99.01)
+        self.assertEqual(bench.percentile([3.0], 95), 3.0)
+        with self.assertRaises(ValueError):
+            bench.percentile([], 50)
+
+    def test_summarize(self):
+        summary = bench.summarize([0.01, 0.02, 0.03, 0.04])
+        self.assertEqual(summary['iterations'], 4)
+        self.assertAlmostEqual(summary['p50_ms'], 25.0)
+        self.assertAlmostEqual(summary['ops_per_sec'], 40.0)
+
+    def test_run_fake(self):
+        results = list(bench.run_fake([10], [0, 1], iterations=2, warmup=0, only=['get_info', 'export_xml']))
+        self.assertListEqual([r['name'] for r in results], ['get_info', 'export_xml'] * 2)
+        self.assertListEqual([r['scenario']['kdf_ms'] for r in results], [0, 0, 1, 1])
+        for result in results:
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+    def test_compare_results(self):
+        scenario = {'entries': 10}
+        baseline = {'results': [{'name': 'get_info', 'scenario': scenario, 'p50_ms': 10.0}]}
+        current = {'results': [{'name': 'get_info', 'scenario': scenario, 'p50_ms': 15.0},
+                               {'name': 'compare', 'scenario': scenario, 'p50_ms': 1.0}]}
+        lines = list(bench.compare_results(baseline, current))
+        self.assertEqual(len(lines), 1)
+        self.assertIn('+50.0%', lines[0])
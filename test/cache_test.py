@@ -0,0 +1,176 @@
+import os
+import tempfile
+import time
+import unittest
+
+from cache import DerivedKeyCache, DiskCache, LRUCache, ResultCache
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_get_set(self):
+        cache = LRUCache(maxsize=2)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('a', 0), 0)
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(len(cache), 1)
+
+    def test_eviction(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(len(cache), 2)
+
+    def test_clear(self):
+        cache = LRUCache()
+        cache.set('a', 1)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            LRUCache(maxsize=0)
+
+    def test_ttl(self):
+        cache = LRUCache(ttl=0.01)
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+
+class DiskCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.temp_dir.name, 'cache')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_get_set(self):
+        cache = DiskCache(self.directory)
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', {'name': 'Passwörter'})
+        self.assertDictEqual(DiskCache(self.directory).get('a'), {'name': 'Passwörter'})
+        self.assertEqual(os.stat(self.directory).st_mode & 0o777, 0o700)
+
+    def test_tampered(self):
+        cache = DiskCache(self.directory)
+        cache.set('a', 1)
+        path = cache._get_path('a')
+        with open(path, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b'\x00')
+        self.assertIsNone(cache.get('a'))
+
+    def test_ttl(self):
+        cache = DiskCache(self.directory, ttl=-1)
+        cache.set('a', 1)
+        self.assertIsNone(cache.get('a'))
+
+    def test_prune_expired(self):
+        cache = DiskCache(self.directory, ttl=60)
+        cache.set('a', 1)
+        os.utime(cache._get_path('a'), (time.time() - 120, time.time() - 120))
+        cache.set('b', 2)
+        self.assertFalse(os.path.exists(cache._get_path('a')))
+        self.assertEqual(cache.get('b'), 2)
+
+    def test_max_entries(self):
+        cache = DiskCache(self.directory, max_entries=2)
+        for i, key in enumerate(['a', 'b', 'c']):
+            cache.set(key, i)
+            os.utime(cache._get_path(key), (time.time() - 10 + i, time.time() - 10 + i))
+        cache.set('d', 3)
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 2)
+        self.assertEqual(cache.get('d'), 3)
+
+    def test_max_bytes(self):
+        cache = DiskCache(self.directory, max_bytes=1024)
+        cache.set('a', 'x' * 512)
+        cache.set('b', 'y' * 512)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 'y' * 512)
+        # too large to be stored, also replaces the older value
+        cache.set('b', 'z' * 2048)
+        self.assertIsNone(cache.get('b'))
+
+    def test_secret_path(self):
+        secret_path = os.path.join(self.temp_dir.name, 'secret')
+        cache = DiskCache(self.directory, secret_path=secret_path)
+        cache.set('a', 1)
+        self.assertListEqual([name for name in os.listdir(self.directory) if not name.endswith('.cache')], [])
+        self.assertEqual(os.stat(secret_path).st_mode & 0o777, 0o600)
+        self.assertEqual(DiskCache(self.directory, secret_path=secret_path).get('a'), 1)
+        self.assertIsNone(DiskCache(self.directory).get('a'))
+
+    def test_clear(self):
+        cache = DiskCache(self.directory)
+        cache.set('a', 1)
+        cache.clear()
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(DiskCache(self.directory).get_secret(), cache.get_secret())
+
+
+class ResultCacheTest(unittest.TestCase):
+    def test_metrics(self):
+        cache = ResultCache()
+        self.assertEqual(cache.get(('db-info', 'a')), (False, None))
+        cache.set(('db-info', 'a'), None)
+        self.assertEqual(cache.get(('db-info', 'a')), (True, None))
+        self.assertDictEqual(cache.get_metrics(), {'hits': 1, 'misses': 1})
+
+    def test_disk_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            ResultCache(DiskCache(directory)).set(('db-info', 'a'), {'name': 'a'})
+            self.assertEqual(ResultCache(DiskCache(directory)).get(('db-info', 'a')), (True, {'name': 'a'}))
+
+
+class DerivedKeyCacheTest(unittest.TestCase):
+    KDF = ('argon2', ('S', b'salt'))
+
+    def test_get_set(self):
+        cache = DerivedKeyCache()
+        self.assertIsNone(cache.get(self.KDF, b'composite'))
+        cache.set(self.KDF, b'composite', b'derived')
+        self.assertEqual(cache.get(self.KDF, b'composite'), b'derived')
+        self.assertIsNone(cache.get(self.KDF, b'other'))
+        self.assertIsNone(cache.get(('argon2', ('S', b'new salt')), b'composite'))
+        self.assertDictEqual(cache.get_metrics(), {'hits': 1, 'misses': 3, 'size': 1})
+
+    def test_expiry(self):
+        cache = DerivedKeyCache(ttl=0.01)
+        cache.set(self.KDF, b'composite', b'derived')
+        buffer = list(cache._items.values())[0][1]
+        time.sleep(0.02)
+        self.assertIsNone(cache.get(self.KDF, b'composite'))
+        self.assertEqual(buffer.get(), bytes(7))
+        self.assertEqual(len(cache), 0)
+
+    def test_eviction(self):
+        cache = DerivedKeyCache(maxsize=1)
+        cache.set(self.KDF, b'a', b'derived a')
+        buffer = list(cache._items.values())[0][1]
+        cache.set(self.KDF, b'b', b'derived b')
+        self.assertEqual(buffer.get(), bytes(9))
+        self.assertIsNone(cache.get(self.KDF, b'a'))
+        self.assertEqual(cache.get(self.KDF, b'b'), b'derived b')
+
+    def test_prune_clear(self):
+        cache = DerivedKeyCache(ttl=-1)
+        cache.set(self.KDF, b'a', b'derived')
+        cache.prune()
+        self.assertEqual(len(cache), 0)
+        cache = DerivedKeyCache()
+        cache.set(self.KDF, b'a', b'derived')
+        buffer = list(cache._items.values())[0][1]
+        cache.clear()
+        self.assertEqual(buffer.get(), bytes(7))
@@ -0,0 +1,116 @@
+import os
+import stat
+import tempfile
+import unittest
+from unittest import mock
+
+import capabilities
+from cache import DiskCache
+from capabilities import Capabilities, CapabilityRegistry
+from command import ExportDatabaseCommand, SearchDatabaseCommand
+from entity import Database
+
+# keepassxc-cli 2.3 had `extract` instead of `export`
+OLD_CLI = '''#!/bin/sh
+case "$1" in
+--version) echo 2.3.4 ;;
+--help) printf 'Usage: keepassxc-cli [options] command\\nKeePassXC command line interface.\\n\\nAvailable commands:\\n'
+        printf 'add             Add a new entry to a database.\\n'
+        printf 'locate          Find entries quickly.\\n'
+        printf 'extract         Extract and print the content of a database.\\n\\n'
+        printf 'Options:\\n  -h, --help     Displays this help.\\n' ;;
+extract) printf '  -k, --key-file <path>  Key file of the database.\\n' >&2 ;;
+*) exit 1 ;;
+esac
+'''
+
+
+class CapabilityRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.executable = os.path.join(self.temp_dir.name, 'keepassxc-cli')
+        with open(self.executable, 'w') as f:
+            f.write(OLD_CLI)
+        os.chmod(self.executable, os.stat(self.executable).st_mode | stat.S_IXUSR)
+        self.cache = DiskCache(os.path.join(self.temp_dir.name, 'cache'))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_probe(self):
+        result = CapabilityRegistry().get(self.executable)
+        self.assertEqual(result.version, '2.3.4')
+        self.assertEqual(result.get_version_info(), (2, 3, 4))
+        self.assertSetEqual(result.commands, {'add', 'extract', 'locate'})
+        self.assertFalse(result.supports('export'))
+        self.assertEqual(result.select('export', 'extract'), 'extract')
+
+    def test_cached(self):
+        with mock.patch('capabilities._run', wraps=capabilities._run) as run:
+            registry = CapabilityRegistry(self.cache)
+            self.assertIs(registry.get(self.executable), registry.get(self.executable))
+            self.assertEqual(CapabilityRegistry(self.cache).get(self.executable).version, '2.3.4')
+            self.assertEqual(run.call_count, 2)
+
+    def test_modified(self):
+        registry = CapabilityRegistry(self.cache)
+        registry.get(self.executable)
+        with open(self.executable, 'w') as f:
+            f.write(OLD_CLI.replace('2.3.4', '2.3.5'))
+        stat_result = os.stat(self.executable)
+        os.utime(self.executable, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 1000000000))
+        self.assertEqual(registry.get(self.executable).version, '2.3.5')
+
+    def test_missing(self):
+        result = CapabilityRegistry().get(os.path.join(self.temp_dir.name, 'missing'))
+        self.assertIsNone(result.version)
+        self.assertTrue(result.supports('export', '--format'))
+
+    def test_probe_options(self):
+        registry = CapabilityRegistry(self.cache)
+        # the help of the stub goes to STDERR and is ignored
+        self.assertSetEqual(registry.probe_options('extract', self.executable), frozenset())
+        self.assertTrue(registry.get(self.executable).supports('extract', '--format'))
+
+    def test_export_command(self):
+        database = Database('assets/password.kdbx', password='1234')
+        with mock.patch.dict(os.environ, {'KEEPASSXC_CLI_EXE': self.executable}):
+            parts = ExportDatabaseCommand(database, 'xml')._build_command()
+            self.assertEqual(parts[1], 'extract')
+            self.assertNotIn('--format', parts)
+            self.assertListEqual(ExportDatabaseCommand(database, 'xml')._build_interactive_command(), ['extract'])
+            with self.assertRaises(ValueError):
+                ExportDatabaseCommand(database, 'csv')._build_command()
+
+    def test_search_command(self):
+        database = Database('assets/password.kdbx', password='1234')
+        with mock.patch.dict(os.environ, {'KEEPASSXC_CLI_EXE': self.executable}):
+            self.assertEqual(SearchDatabaseCommand(database, 'test')._build_command()[1], 'locate')
+
+    def test_lazy(self):
+        database = Database('assets/password.kdbx', password='1234')
+        with mock.patch('capabilities.get_capabilities') as get_capabilities:
+            ExportDatabaseCommand(database, 'csv').get_cache_key()
+            get_capabilities.assert_not_called()
+
+
+class CapabilitiesTest(unittest.TestCase):
+    def test_options(self):
+        result = Capabilities('keepassxc-cli', '2.6.2', ['export'], {'export': frozenset(['--format', '-f'])})
+        self.assertTrue(result.supports('export', '--format'))
+        self.assertFalse(result.supports('export', '--unknown'))
+        self.assertTrue(result.supports('export'))
+        self.assertFalse(result.supports('extract'))
+        self.assertEqual(result.get_version_info(), (2, 6, 2))
+
+    def test_parse(self):
+        self.assertListEqual(capabilities._parse_commands(
+            'Usage: keepassxc-cli\n\nAvailable commands:\nadd           Add a new entry.\n'
+            'db-info       Show information.\n\nOptions:\n  -h, --help  Help.\n'), ['add', 'db-info'])
+        self.assertListEqual(capabilities._parse_options(
+            'Usage\n\nOptions:\n  -f, --format <xml|csv>  Format.\n  --no-password  No password.\n'),
+            ['-f', '--format', '--no-password'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from changes import AddEntry, AddGroup, EditEntry, RemoveEntry
+from command import AddEntryCommand, EditEntryCommand, RemoveEntryCommand
+from entity import Database
+
+
+class ApplyTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.database_file = os.path.join(self.temp_dir.name, 'password.kdbx')
+        shutil.copyfile('assets/password.kdbx', self.database_file)
+        self.database = Database(self.database_file, password='1234')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_apply(self):
+        result = self.database.apply([
+            AddGroup('batch'),
+            AddEntry('batch/first', username='garfield', url='wikipedia.org', password='monday123'),
+            AddEntry('batch/second'),
+            EditEntry('batch/first', title='renamed', password='tuesday456'),
+            RemoveEntry('batch/second'),
+        ])
+        self.assertTrue(result.ok)
+        self.assertEqual(result.applied, 5)
+        self.assertGreater(result.get_rate(), 0)
+        self.assertIsNone(self.database._session)
+
+    def test_session_failed(self):
+        def changes():
+            yield AddEntry('first')
+            # the shell exits in the middle of the batch
+            self.database._session._child.proc.kill()
+            self.database._session._child.proc.wait()
+            yield AddEntry('second')
+            yield AddEntry('third')
+
+        result = self.database.apply(changes(), check=False)
+        self.assertEqual(result.applied, 1)
+        self.assertListEqual([change.path for change, _ in result.errors], ['second', 'third'])
+        self.assertIsInstance(result.errors[0][1], IOError)
+        with self.assertRaises(IOError):
+            self.database.apply(changes())
+
+    def test_create_entries(self):
+        result = self.database.create_entries(AddEntry('entry {}'.format(i), password='p{}'.format(i))
+                                              for i in range(20))
+        self.assertEqual(result.applied, 20)
+
+    def test_create_entry(self):
+        self.database.create_entry('single', username='garfield', password='monday123')
+
+    def test_password_not_in_arguments(self):
+        parts = AddEntryCommand(self.database, 'entry', password='monday123')._build_command()
+        self.assertNotIn('monday123', parts)
+        self.assertIn('--password-prompt', parts)
+        self.assertListEqual(EditEntryCommand(self.database, 'entry', password='monday123')._get_prompts(),
+                             [('Enter new password for entry: ', 'monday123')])
+
+    def test_failure_in_session(self):
+        # the interactive shell reports errors in its output only
+        with self.assertRaises(subprocess.CalledProcessError):
+            RemoveEntryCommand(self.database, 'missing')._parse_output('Entry missing not found.')
+
+
+if __name__ == '__main__':
+    unittest.main()
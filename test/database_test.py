@@ -1,10 +1,20 @@
 import logging
 import os
+import shutil
+import subprocess
+import tempfile
 import unittest
 
 from abc import ABC
+from unittest import mock
 from xml.etree import ElementTree
+from cache import ResultCache
+from command import DatabaseCommand
 from entity import Database
+from export import EntryRecord, iter_records
+from fileops import hash_path
+from hibp_test import write_hibp
+from parsers import Finding
 
 logging.basicConfig(level=logging.DEBUG)
 
@@ -38,6 +48,94 @@ class AbstractDatabaseTest(unittest.TestCase, ABC):
             self.database.export(format='xml')
         )
 
+    def test_export_iter(self):
+        chunks = list(self.database.export_iter(format='xml', chunk_size=256))
+        self.assertGreater(len(chunks), 1)
+        self.assertValidXml(''.join(chunks))
+
+    def test_iter_groups(self):
+        groups = list(self.database.iter_groups())
+        self.assertGreater(len(groups), 0)
+        self.assertEqual(groups[0].path, '/')
+
+    def test_iter_entries(self):
+        for entry in self.database.iter_entries():
+            self.assertIsNotNone(entry.uuid)
+            self.assertTrue(entry.path.startswith('/'))
+
+    def test_analyze(self):
+        for finding in self.database.analyze():
+            self.assertIsInstance(finding, Finding)
+
+    def test_find_leaked(self):
+        entries = [entry for entry in iter_records(self.database.export_iter(format='xml'), password_hashes=True)
+                   if isinstance(entry, EntryRecord) and entry.password_sha1 is not None]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            hibp_path = os.path.join(temp_dir, 'hibp.txt')
+            write_hibp(hibp_path, {entry.password_sha1: 42 for entry in entries})
+            findings = list(self.database.find_leaked(hibp_path))
+        self.assertSetEqual({finding.uuid for finding in findings}, {entry.uuid for entry in entries})
+        for finding in findings:
+            self.assertEqual(finding.kind, 'leaked')
+            self.assertEqual(finding.count, 42)
+
+    def test_snapshot(self):
+        snapshot = self.database.snapshot()
+        self.assertIs(self.database.snapshot(), snapshot)
+        self.assertSetEqual(set(snapshot.entries), {entry.uuid for entry in self.database.iter_entries()})
+        self.assertFalse(self.database.diff(snapshot))
+
+    def test_export_to(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            target_path = os.path.join(temp_dir, 'export.xml')
+            self.database.export_to(target_path, format='xml')
+            with open(target_path, 'r', encoding='utf-8') as f:
+                self.assertValidXml(f.read())
+            with self.assertRaises(IOError):
+                self.database.export_to(target_path, format='xml')
+
+    def test_write_to(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            target_path = os.path.join(temp_dir, 'export.xml')
+            # created by another process after export_to checked the path
+            with open(target_path, 'w') as f:
+                f.write('other')
+            with self.assertRaises(FileExistsError):
+                Database._write_to(target_path, ['<KeePassFile/>'])
+            with open(target_path, 'r') as f:
+                self.assertEqual(f.read(), 'other')
+
+            def fail():
+                yield '<KeePassFile>'
+                raise IOError('keepassxc-cli failed')
+
+            with self.assertRaises(IOError):
+                Database._write_to(os.path.join(temp_dir, 'failed.xml'), fail())
+            self.assertListEqual(os.listdir(temp_dir), ['export.xml'])
+
+    def test_write_to_corrupted(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            target_path = os.path.join(temp_dir, 'export.xml')
+            self.assertEqual(Database._write_to(target_path, ['<KeePassFile/>']), hash_path(target_path))
+
+            # the disk returns other content than was written
+            corrupted_path = os.path.join(temp_dir, 'corrupted.xml')
+            with mock.patch('entity.os.fsync', side_effect=lambda fd: os.pwrite(fd, b'!', 0)):
+                with self.assertRaises(IOError):
+                    Database._write_to(corrupted_path, ['<KeePassFile/>'])
+            self.assertFalse(os.path.exists(corrupted_path))
+
+    def test_copy_to(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            target_path = os.path.join(temp_dir, 'copy.kdbx')
+            result = self.database.copy_to(target_path)
+            self.assertEqual(result.size, os.path.getsize(self.database.get_path()))
+            with open(self.database.get_path(), 'rb') as f, open(target_path, 'rb') as g:
+                self.assertEqual(f.read(), g.read())
+            with self.assertRaises(IOError):
+                self.database.copy_to(target_path)
+            self.assertEqual(self.database.copy_to(target_path, overwrite=True).digest, result.digest)
+
     def assertValidXml(self, data: str):
         ElementTree.fromstring(data)
 
@@ -64,6 +162,21 @@ class PasswordDatabaseTest(AbstractDatabaseTest):
         self.assertIsNone(self.database.get_key_file())
 
 
+class PasswordTtyDatabaseTest(PasswordDatabaseTest):
+    def setUp(self):
+        super().setUp()
+        DatabaseCommand.tty = True
+
+    def tearDown(self):
+        DatabaseCommand.tty = None
+
+    def test_export_iter(self):
+        self.assertListEqual(
+            list(self.database.export_iter(format='xml', chunk_size=256)),
+            [self.database.export(format='xml')]
+        )
+
+
 class KeyFileDatabaseTest(AbstractDatabaseTest):
     def setUp(self):
         self.database_file = 'assets/keyfile.kdbx'
@@ -148,6 +261,15 @@ class CompareDatabaseTest(unittest.TestCase):
         )
 
 
+class CompareTtyDatabaseTest(CompareDatabaseTest):
+    def setUp(self):
+        super().setUp()
+        DatabaseCommand.tty = True
+
+    def tearDown(self):
+        DatabaseCommand.tty = None
+
+
 class CompareKeyfileDatabaseTest(CompareDatabaseTest):
     def setUp(self):
         self.database_file_1 = 'assets/keyfile.kdbx'
@@ -180,4 +302,54 @@ class CompareIdenticalDatabaseTest(CompareDatabaseTest):
         )
 
 
+class CachedDatabaseTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.database_file = os.path.join(self.temp_dir.name, 'password.kdbx')
+        shutil.copyfile('assets/password.kdbx', self.database_file)
+        self.cache = ResultCache()
+        self.database = Database(self.database_file, password='1234', cache=self.cache)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_get_info(self):
+        info = self.database.get_info()
+        info['name'] = None
+        self.assertEqual(self.database.get_info(), Database(self.database_file, password='1234').get_info())
+        self.assertDictEqual(self.cache.get_metrics(), {'hits': 1, 'misses': 1})
+
+    def test_invalidation(self):
+        self.database.export(format='xml')
+        stat = os.stat(self.database_file)
+        os.utime(self.database_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+        self.database.export(format='xml')
+        self.assertDictEqual(self.cache.get_metrics(), {'hits': 0, 'misses': 2})
+
+    def test_credentials(self):
+        self.database.get_info()
+        with self.assertRaises(subprocess.CalledProcessError):
+            Database(self.database_file, password='wrong', cache=self.cache).get_info()
+
+
+class DiffDatabaseTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.database_file = os.path.join(self.temp_dir.name, 'password.kdbx')
+        shutil.copyfile('assets/password.kdbx', self.database_file)
+        self.database = Database(self.database_file, password='1234')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_diff_copy(self):
+        self.assertFalse(self.database.diff(Database('assets/password.kdbx', password='1234')))
+
+    def test_snapshot_invalidation(self):
+        snapshot = self.database.snapshot()
+        stat = os.stat(self.database_file)
+        os.utime(self.database_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+        self.assertIsNot(self.database.snapshot(), snapshot)
+        self.assertFalse(self.database.diff(snapshot))
+
 del AbstractDatabaseTest
@@ -0,0 +1,83 @@
+import base64
+import gzip
+import unittest
+
+from diff import DatabaseSnapshot, diff
+from export import iter_records
+from export_test import XML
+
+
+def snapshot(xml: str) -> DatabaseSnapshot:
+    return DatabaseSnapshot(record for record in iter_records([xml], digests=True) if hasattr(record, 'digests'))
+
+
+class DiffTest(unittest.TestCase):
+    def setUp(self):
+        self.baseline = snapshot(XML)
+
+    def test_identical(self):
+        changes = diff(self.baseline, snapshot(XML))
+        self.assertFalse(changes)
+        self.assertSetEqual(changes.get_uuids(), set())
+
+    def test_modified_password(self):
+        changes = snapshot(XML.replace('monday123', 'tuesday456')).diff(self.baseline)
+        self.assertListEqual(list(changes.modified), ['898c7067a74e4aada0d2a3cf590f8c2a'])
+        self.assertSetEqual(changes.modified['898c7067a74e4aada0d2a3cf590f8c2a'].fields, {'Password'})
+        self.assertDictEqual(changes.added, {})
+        self.assertDictEqual(changes.removed, {})
+
+    def test_history_and_access_ignored(self):
+        changed = XML.replace('Old title', 'Older title') \
+            .replace('<Expires>True</Expires>', '<Expires>True</Expires><LastAccessTime>AAAAAA==</LastAccessTime>')
+        self.assertFalse(diff(self.baseline, snapshot(changed)))
+
+    def test_moved(self):
+        changed = XML.replace('<Name>wiki</Name>', '<Name>encyclopedia</Name>')
+        changes = diff(self.baseline, snapshot(changed))
+        self.assertSetEqual(changes.modified['00000000000000000000000000000002'].fields, {('meta', 'Group')})
+        self.assertEqual(changes.modified['00000000000000000000000000000002'].new.path, '/websites/encyclopedia/Nested')
+
+    def test_added_and_removed(self):
+        changed = XML.replace('AAAAAAAAAAAAAAAAAAAAAg==', 'AAAAAAAAAAAAAAAAAAAAAw==')
+        changes = diff(self.baseline, snapshot(changed))
+        self.assertListEqual(list(changes.added), ['00000000000000000000000000000003'])
+        self.assertListEqual(list(changes.removed), ['00000000000000000000000000000002'])
+        self.assertDictEqual(changes.modified, {})
+
+    def test_new_field(self):
+        changed = XML.replace('<Value>Nested</Value></String>',
+                              '<Value>Nested</Value></String><String><Key>otp</Key><Value>secret</Value></String>')
+        changes = diff(self.baseline, snapshot(changed))
+        self.assertSetEqual(changes.modified['00000000000000000000000000000002'].fields, {'otp'})
+
+    def test_string_named_like_field(self):
+        changed = XML.replace('<Value>Nested</Value></String>',
+                              '<Value>Nested</Value></String><String><Key>Tags</Key><Value></Value></String>')
+        changes = diff(self.baseline, snapshot(changed))
+        self.assertSetEqual(changes.modified['00000000000000000000000000000002'].fields, {'Tags'})
+
+    def test_attachment_content(self):
+        # the same reference in both, but different content
+        attached = XML.replace('</Meta>', '<Binaries><Binary ID="0">{}</Binary></Binaries></Meta>'.format(
+            base64.b64encode(b'first').decode('ascii'))) \
+            .replace('<Value>Nested</Value></String>',
+                     '<Value>Nested</Value></String><Binary><Key>a.txt</Key><Value Ref="0"/></Binary>')
+        baseline = snapshot(attached)
+        compressed = base64.b64encode(gzip.compress(b'first')).decode('ascii')
+        same = attached.replace('<Binary ID="0">{}'.format(base64.b64encode(b'first').decode('ascii')),
+                                '<Binary ID="0" Compressed="True">{}'.format(compressed))
+        self.assertFalse(diff(baseline, snapshot(same)))
+        changed = attached.replace(base64.b64encode(b'first').decode('ascii'),
+                                   base64.b64encode(b'second').decode('ascii'))
+        changes = diff(baseline, snapshot(changed))
+        self.assertSetEqual(changes.modified['00000000000000000000000000000002'].fields, {('attachment', 'a.txt')})
+
+    def test_no_secrets(self):
+        entry = self.baseline.entries['898c7067a74e4aada0d2a3cf590f8c2a']
+        self.assertNotIn(b'monday123', b''.join(entry.digests.values()))
+        self.assertEqual(len(entry.digest), 16)
+
+
+if __name__ == '__main__':
+    unittest.main()
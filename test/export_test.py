@@ -0,0 +1,118 @@
+import base64
+import unittest
+from datetime import datetime, timezone
+
+from export import EPOCH, EntryRecord, GroupRecord, iter_records, parse_time
+
+XML = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<KeePassFile>
+	<Meta>
+		<DatabaseName>Passwörter</DatabaseName>
+		<CustomData><Item><Key>KPXC_DECRYPTION_TIME_PREFERENCE</Key><Value>1000</Value></Item></CustomData>
+	</Meta>
+	<Root>
+		<Group>
+			<UUID>53cg/gZAThene7Yojy33Bg==</UUID>
+			<Name>Root</Name>
+			<Times><LastModificationTime>q/VZ1w4AAAA=</LastModificationTime></Times>
+			<Entry>
+				<UUID>iYxwZ6dOSq2g0qPPWQ+MKg==</UUID>
+				<Times>
+					<CreationTime>2021-01-16T14:00:48Z</CreationTime>
+					<LastModificationTime>2021-01-17T10:00:00Z</LastModificationTime>
+					<ExpiryTime>2022-01-01T00:00:00Z</ExpiryTime>
+					<Expires>True</Expires>
+				</Times>
+				<String><Key>Title</Key><Value>Test entry</Value></String>
+				<String><Key>UserName</Key><Value>garfield</Value></String>
+				<String><Key>Password</Key><Value ProtectInMemory="True">monday123</Value></String>
+				<String><Key>URL</Key><Value>https://wikipedia.org</Value></String>
+				<History>
+					<Entry>
+						<UUID>iYxwZ6dOSq2g0qPPWQ+MKg==</UUID>
+						<String><Key>Title</Key><Value>Old title</Value></String>
+					</Entry>
+				</History>
+			</Entry>
+			<Group>
+				<UUID>qB3HXiI0TpKyfnirrwTyUQ==</UUID>
+				<Name>websites</Name>
+				<Group>
+					<UUID>AAAAAAAAAAAAAAAAAAAAAQ==</UUID>
+					<Name>wiki</Name>
+					<Entry>
+						<UUID>AAAAAAAAAAAAAAAAAAAAAg==</UUID>
+						<String><Key>Title</Key><Value>Nested</Value></String>
+					</Entry>
+				</Group>
+			</Group>
+		</Group>
+		<DeletedObjects/>
+	</Root>
+</KeePassFile>
+'''
+
+
+class IterRecordsTest(unittest.TestCase):
+    def parse(self, chunk_size: int = 16) -> list:
+        return list(iter_records(XML[i:i + chunk_size] for i in range(0, len(XML), chunk_size)))
+
+    def test_order(self):
+        self.assertListEqual(
+            [(type(record), record.uuid) for record in self.parse()],
+            [(GroupRecord, 'e77720fe06404e17a77bb6288f2df706'),
+             (EntryRecord, '898c7067a74e4aada0d2a3cf590f8c2a'),
+             (GroupRecord, 'a81dc75e22344e92b27e78abaf04f251'),
+             (GroupRecord, '00000000000000000000000000000001'),
+             (EntryRecord, '00000000000000000000000000000002')]
+        )
+
+    def test_chunk_size(self):
+        self.assertListEqual(
+            [repr(record) for record in self.parse(1)],
+            [repr(record) for record in self.parse(len(XML))]
+        )
+
+    def test_groups(self):
+        groups = [record for record in self.parse() if isinstance(record, GroupRecord)]
+        self.assertListEqual([group.path for group in groups], ['/', '/websites', '/websites/wiki'])
+        self.assertListEqual([group.name for group in groups], ['Root', 'websites', 'wiki'])
+
+    def test_entry(self):
+        entry = self.parse()[1]
+        self.assertEqual(entry.title, 'Test entry')
+        self.assertEqual(entry.username, 'garfield')
+        self.assertEqual(entry.url, 'https://wikipedia.org')
+        self.assertEqual(entry.group, '/')
+        self.assertEqual(entry.path, '/Test entry')
+        self.assertEqual(entry.created, datetime(2021, 1, 16, 14, 0, 48, tzinfo=timezone.utc))
+        self.assertEqual(entry.modified, datetime(2021, 1, 17, 10, 0, 0, tzinfo=timezone.utc))
+        self.assertEqual(entry.expires, datetime(2022, 1, 1, tzinfo=timezone.utc))
+        self.assertIsNone(entry.accessed)
+        self.assertFalse(hasattr(entry, '__dict__'))
+
+    def test_nested_entry(self):
+        entry = self.parse()[-1]
+        self.assertEqual(entry.path, '/websites/wiki/Nested')
+        self.assertIsNone(entry.expires)
+
+    def test_history_skipped(self):
+        titles = [record.title for record in self.parse() if isinstance(record, EntryRecord)]
+        self.assertNotIn('Old title', titles)
+
+
+class ParseTimeTest(unittest.TestCase):
+    def test_iso(self):
+        self.assertEqual(parse_time('2021-01-16T14:00:48Z'), datetime(2021, 1, 16, 14, 0, 48, tzinfo=timezone.utc))
+
+    def test_base64(self):
+        seconds = int((datetime(2021, 1, 16, 14, 0, 48, tzinfo=timezone.utc) - EPOCH).total_seconds())
+        self.assertEqual(
+            parse_time(base64.b64encode(seconds.to_bytes(8, 'little')).decode()),
+            datetime(2021, 1, 16, 14, 0, 48, tzinfo=timezone.utc)
+        )
+
+    def test_invalid(self):
+        self.assertIsNone(parse_time(None))
+        self.assertIsNone(parse_time(''))
+        self.assertIsNone(parse_time('yesterday'))
@@ -0,0 +1,92 @@
+import errno
+import hashlib
+import os
+import stat
+import tempfile
+import unittest
+from unittest import mock
+import fileops
+from fileops import copy_file
+
+
+class CopyFileTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.source_path = os.path.join(self.temp_dir.name, 'source.kdbx')
+        # binary data that is no valid text, larger than a chunk
+        self.data = os.urandom(fileops.CHUNK_SIZE) + bytes(range(256)) * 100
+        with open(self.source_path, 'wb') as f:
+            f.write(self.data)
+        os.chmod(self.source_path, 0o600)
+        self.target_path = os.path.join(self.temp_dir.name, 'target.kdbx')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def assertCopied(self, result: fileops.CopyResult):
+        with open(self.target_path, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(result.path, self.target_path)
+        self.assertEqual(result.size, len(self.data))
+        self.assertEqual(result.digest, hashlib.blake2b(self.data).hexdigest())
+        self.assertEqual(stat.S_IMODE(os.stat(self.target_path).st_mode), 0o600)
+        self.assertListEqual(sorted(os.listdir(self.temp_dir.name)), ['source.kdbx', 'target.kdbx'])
+
+    def test_copy_file(self):
+        result = copy_file(self.source_path, self.target_path)
+        self.assertCopied(result)
+        self.assertIn(result.method, ('reflink', 'copy_file_range', 'sendfile', 'read'))
+
+    def test_fallbacks(self):
+        unsupported = OSError(errno.EXDEV, 'Invalid cross-device link')
+        with mock.patch('fileops._reflink', side_effect=unsupported):
+            result = copy_file(self.source_path, self.target_path)
+        self.assertIn(result.method, ('copy_file_range', 'sendfile', 'read'))
+        self.assertCopied(result)
+        os.remove(self.target_path)
+
+        with mock.patch('fileops._reflink', side_effect=unsupported), \
+                mock.patch('fileops._copy_file_range', side_effect=unsupported), \
+                mock.patch('fileops._sendfile', return_value=False):
+            result = copy_file(self.source_path, self.target_path)
+        self.assertEqual(result.method, 'read')
+        self.assertCopied(result)
+
+    def test_copy_error(self):
+        with mock.patch('fileops._reflink', side_effect=OSError(errno.EPERM, 'Operation not permitted')):
+            with self.assertRaises(PermissionError):
+                copy_file(self.source_path, self.target_path)
+        self.assertListEqual(os.listdir(self.temp_dir.name), ['source.kdbx'])
+
+    def test_empty_file(self):
+        self.data = b''
+        with open(self.source_path, 'wb'):
+            pass
+        self.assertCopied(copy_file(self.source_path, self.target_path))
+
+    def test_existing_target(self):
+        with open(self.target_path, 'wb') as f:
+            f.write(b'old')
+        with self.assertRaises(FileExistsError):
+            copy_file(self.source_path, self.target_path)
+        self.assertCopied(copy_file(self.source_path, self.target_path, overwrite=True))
+
+    def test_corrupted_copy(self):
+        with mock.patch('fileops.hash_path', return_value='0'):
+            with self.assertRaises(IOError):
+                copy_file(self.source_path, self.target_path)
+        self.assertListEqual(os.listdir(self.temp_dir.name), ['source.kdbx'])
+
+    def test_unexpected_digest(self):
+        with open(self.target_path, 'wb') as f:
+            f.write(b'old')
+        with self.assertRaises(IOError):
+            copy_file(self.source_path, self.target_path, overwrite=True, digest='0')
+        with open(self.target_path, 'rb') as f:
+            self.assertEqual(f.read(), b'old')
+        self.assertCopied(copy_file(self.source_path, self.target_path, overwrite=True,
+                                    digest=hashlib.blake2b(self.data).hexdigest()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import subprocess
+import unittest
+from unittest import mock
+
+import fleet
+from entity import Database
+from fleet import DatabaseSet, run_many
+
+
+class RunManyTest(unittest.TestCase):
+    def setUp(self):
+        self.databases = [
+            Database('assets/password.kdbx', password='1234'),
+            Database('assets/keyfile.kdbx', key_file='assets/keyfile.key'),
+            Database('assets/merge.kdbx', password='wrong'),
+        ]
+
+    def test_get_info(self):
+        results = {result.database.get_path(): result for result in run_many(self.databases, 'get_info')}
+        self.assertEqual(len(results), 3)
+        self.assertIn('name', results[self.databases[0].get_path()].get())
+        failed = results[self.databases[2].get_path()]
+        self.assertFalse(failed.ok)
+        self.assertIsInstance(failed.error, subprocess.CalledProcessError)
+        with self.assertRaises(subprocess.CalledProcessError):
+            failed.get()
+
+    def test_ordered(self):
+        results = list(run_many(self.databases, lambda database: database.get_path(), max_workers=2, ordered=True))
+        self.assertListEqual([result.result for result in results], [d.get_path() for d in self.databases])
+
+    def test_empty(self):
+        self.assertListEqual(list(run_many([], 'get_info')), [])
+
+    def test_database_set(self):
+        databases = DatabaseSet(self.databases[:2], max_workers=2)
+        databases.add(self.databases[2])
+        self.assertEqual(len(databases), 3)
+        self.assertEqual(sum(result.ok for result in databases.export(format='csv')), 2)
+        self.assertEqual(sum(result.ok for result in databases.analyze()), 2)
+
+
+class WorkersTest(unittest.TestCase):
+    def test_estimate_memory(self):
+        # the test databases use Argon2 with 64 MiB
+        self.assertEqual(fleet.estimate_memory(Database('assets/password.kdbx')), fleet.BASE_MEMORY + 64 * 1024 * 1024)
+        self.assertEqual(fleet.estimate_memory(Database('assets/new.kdbx')), fleet.BASE_MEMORY)
+        self.assertEqual(fleet.estimate_memory(Database('assets/keyfile.key')),
+                         fleet.BASE_MEMORY + fleet.DEFAULT_KDF_MEMORY)
+
+    def test_get_workers(self):
+        databases = [Database('assets/password.kdbx')] * 100
+        with mock.patch('os.cpu_count', return_value=16), \
+                mock.patch('parallel.get_available_memory', return_value=4 * (fleet.BASE_MEMORY + 64 * 1024 * 1024)):
+            self.assertEqual(fleet.get_workers(databases), 4)
+            self.assertEqual(fleet.get_workers(databases, max_workers=2), 2)
+            self.assertEqual(fleet.get_workers(databases[:3]), 3)
+        with mock.patch('os.cpu_count', return_value=16), mock.patch('parallel.get_available_memory', return_value=0):
+            self.assertEqual(fleet.get_workers(databases), 1)
@@ -0,0 +1,62 @@
+import hashlib
+import os
+import tempfile
+import unittest
+from typing import Dict
+
+from hibp import HibpFile
+
+
+def write_hibp(path: str, counts: Dict[bytes, int], line_break: str = '\r\n'):
+    with open(path, 'w') as f:
+        for sha1, count in sorted((sha1.hex().upper(), count) for sha1, count in counts.items()):
+            f.write('{}:{}{}'.format(sha1, count, line_break))
+
+
+class HibpFileTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'hibp.txt')
+        self.counts = {hashlib.sha1('password{}'.format(i).encode()).digest(): i + 1 for i in range(1000)}
+        write_hibp(self.path, self.counts)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_get_count(self):
+        with HibpFile(self.path) as hibp:
+            for i in range(1000):
+                self.assertEqual(hibp.get_count('password{}'.format(i)), i + 1)
+            self.assertEqual(hibp.get_count('not leaked'), 0)
+
+    def test_first_and_last(self):
+        first, last = min(self.counts), max(self.counts)
+        with HibpFile(self.path) as hibp:
+            self.assertEqual(hibp.get_hash_count(first), self.counts[first])
+            self.assertEqual(hibp.get_hash_count(last), self.counts[last])
+            self.assertEqual(hibp.get_hash_count('0' * 40), 0)
+            self.assertEqual(hibp.get_hash_count('F' * 40), 0)
+
+    def test_hex(self):
+        sha1 = hashlib.sha1(b'password7').hexdigest()
+        with HibpFile(self.path) as hibp:
+            self.assertEqual(hibp.get_hash_count(sha1), 8)
+            self.assertEqual(hibp.get_hash_count(sha1.upper()), 8)
+            with self.assertRaises(ValueError):
+                hibp.get_hash_count('abc')
+
+    def test_unix_line_breaks_without_counts(self):
+        with open(self.path, 'w') as f:
+            f.write('\n'.join(sorted(sha1.hex().upper() for sha1 in self.counts)))
+        with HibpFile(self.path) as hibp:
+            self.assertEqual(hibp.get_count('password999'), 1)
+            self.assertEqual(hibp.get_count('password1000'), 0)
+
+    def test_empty(self):
+        open(self.path, 'w').close()
+        with HibpFile(self.path) as hibp:
+            self.assertEqual(hibp.get_count('password'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from entity import Database
+from index import DatabaseIndex, normalize_host
+
+XML = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<KeePassFile>
+	<Root>
+		<Group>
+			<UUID>53cg/gZAThene7Yojy33Bg==</UUID>
+			<Name>Root</Name>
+			<Entry>
+				<UUID>iYxwZ6dOSq2g0qPPWQ+MKg==</UUID>
+				<String><Key>Title</Key><Value>Wikipedia</Value></String>
+				<String><Key>URL</Key><Value>https://www.wikipedia.org/wiki</Value></String>
+			</Entry>
+			<Group>
+				<UUID>qB3HXiI0TpKyfnirrwTyUQ==</UUID>
+				<Name>websites</Name>
+				<Entry>
+					<UUID>AAAAAAAAAAAAAAAAAAAAAg==</UUID>
+					<String><Key>Title</Key><Value>wikipedia</Value></String>
+					<String><Key>URL</Key><Value>wikipedia.org</Value></String>
+				</Entry>
+				<Group>
+					<UUID>AAAAAAAAAAAAAAAAAAAAAQ==</UUID>
+					<Name>mail</Name>
+					<Entry>
+						<UUID>AAAAAAAAAAAAAAAAAAAAAw==</UUID>
+						<String><Key>Title</Key><Value>Mail</Value></String>
+						<String><Key>URL</Key><Value>imap://mail.example.com:993</Value></String>
+					</Entry>
+				</Group>
+			</Group>
+		</Group>
+	</Root>
+</KeePassFile>
+'''
+
+
+class XmlDatabase(Database):
+    exports = 0
+
+    def export_iter(self, format: str = None, chunk_size: int = 65536):
+        XmlDatabase.exports += 1
+        yield XML
+
+
+class DatabaseIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.database_file = os.path.join(self.temp_dir, 'index.kdbx')
+        shutil.copyfile('assets/password.kdbx', self.database_file)
+        self.index = DatabaseIndex(XmlDatabase(self.database_file, password='1234'))
+        self.index.build()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_len(self):
+        self.assertEqual(len(self.index), 3)
+
+    def test_by_uuid(self):
+        self.assertEqual(self.index.by_uuid('898c7067a74e4aada0d2a3cf590f8c2a').title, 'Wikipedia')
+        self.assertEqual(self.index.by_uuid('{898C7067-A74E-4AAD-A0D2-A3CF590F8C2A}').title, 'Wikipedia')
+        self.assertIsNone(self.index.by_uuid('00000000000000000000000000000000'))
+
+    def test_by_title(self):
+        self.assertEqual(len(self.index.by_title('WIKIPEDIA')), 2)
+        self.assertListEqual(self.index.by_title('nothing'), [])
+
+    def test_by_url(self):
+        self.assertEqual(len(self.index.by_url('wikipedia.org')), 2)
+        self.assertEqual(len(self.index.by_url('http://WWW.wikipedia.org/')), 2)
+        self.assertEqual(self.index.by_url('mail.example.com')[0].title, 'Mail')
+        self.assertListEqual(self.index.by_url(''), [])
+
+    def test_by_group(self):
+        self.assertEqual(len(self.index.by_group('/')), 3)
+        self.assertEqual(len(self.index.by_group('/websites')), 2)
+        self.assertEqual(len(self.index.by_group('websites/mail/')), 1)
+        self.assertListEqual(self.index.by_group('/web'), [])
+
+    def test_refresh(self):
+        exports = XmlDatabase.exports
+        self.assertFalse(self.index.is_stale())
+        self.assertFalse(self.index.refresh())
+        self.assertEqual(XmlDatabase.exports, exports)
+
+        with open(self.database_file, 'ab') as f:
+            f.write(b'\0')
+        self.assertTrue(self.index.is_stale())
+        self.assertTrue(self.index.refresh())
+        self.assertEqual(XmlDatabase.exports, exports + 1)
+
+
+class NormalizeHostTest(unittest.TestCase):
+    def test_normalize_host(self):
+        self.assertEqual(normalize_host('https://WWW.Wikipedia.org:443/wiki'), 'wikipedia.org')
+        self.assertEqual(normalize_host('wikipedia.org/wiki'), 'wikipedia.org')
+        self.assertEqual(normalize_host('ssh://user@host.example.com.'), 'host.example.com')
+        self.assertIsNone(normalize_host(None))
+        self.assertIsNone(normalize_host('  '))
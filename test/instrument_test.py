@@ -0,0 +1,112 @@
+import logging
+import subprocess
+import unittest
+
+from command import Command, DatabaseInfoCommand, EstimatePasswordCommand
+from entity import Database
+from instrument import CommandMetrics, Histogram, HistogramObserver
+from interface import ICommandObserver
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+class RecordingObserver(ICommandObserver):
+    def __init__(self):
+        self.started = []
+        self.finished = []
+
+    def on_start(self, command):
+        self.started.append(command)
+
+    def on_finish(self, command, metrics):
+        self.finished.append(metrics)
+
+
+class FailingObserver(ICommandObserver):
+    def on_start(self, command):
+        raise RuntimeError
+
+    def on_finish(self, command, metrics):
+        raise RuntimeError
+
+
+class HistogramTest(unittest.TestCase):
+    def test_observe(self):
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.sum, 2.65)
+        self.assertListEqual(histogram.get_cumulative_counts(), [2, 3, 4])
+
+
+class ObserverTest(unittest.TestCase):
+    def setUp(self):
+        self.database = Database('assets/password.kdbx', password='1234')
+        self.observer = RecordingObserver()
+        self.histogram = HistogramObserver()
+        Command.observers.extend([self.observer, self.histogram])
+
+    def tearDown(self):
+        Command.observers.remove(self.observer)
+        Command.observers.remove(self.histogram)
+
+    def test_execute(self):
+        cmd = DatabaseInfoCommand(self.database)
+        cmd.execute()
+        self.assertListEqual(self.observer.started, [cmd])
+        metrics = self.observer.finished[0]
+        self.assertIs(metrics, cmd.metrics)
+        self.assertEqual(metrics.command, 'db-info')
+        self.assertEqual(metrics.return_code, 0)
+        self.assertGreater(metrics.spawn, 0)
+        self.assertGreaterEqual(metrics.run, 0)
+        self.assertGreater(metrics.output_bytes, 0)
+        self.assertGreaterEqual(metrics.total, metrics.spawn + metrics.run + metrics.parse)
+
+    def test_failure(self):
+        with self.assertRaises(subprocess.CalledProcessError):
+            Database('assets/password.kdbx', password='wrong').get_info()
+        self.assertNotEqual(self.observer.finished[0].return_code, 0)
+        self.assertEqual(self.histogram.get_return_codes('db-info'), {self.observer.finished[0].return_code: 1})
+
+    def test_stream(self):
+        chunks = list(self.database.export_iter(format='xml', chunk_size=256))
+        metrics = self.observer.finished[0]
+        self.assertEqual(metrics.command, 'export')
+        self.assertEqual(metrics.output_bytes, len(''.join(chunks).encode('utf-8')))
+
+    def test_session(self):
+        with self.database.session():
+            self.database.get_info()
+        self.assertListEqual([m.command for m in self.observer.finished], ['open', 'db-info'])
+        self.assertTrue(self.observer.finished[1].session)
+        self.assertIsNotNone(self.observer.finished[0].prompt_wait)
+
+    def test_failing_observer(self):
+        observer = FailingObserver()
+        Command.observers.append(observer)
+        try:
+            self.assertIn('length', EstimatePasswordCommand('1234').execute())
+        finally:
+            Command.observers.remove(observer)
+
+    def test_openmetrics(self):
+        self.database.get_info()
+        self.database.get_info()
+        self.assertEqual(self.histogram.get_histogram('db-info').count, 2)
+        text = self.histogram.to_openmetrics()
+        self.assertTrue(text.endswith('# EOF\n'))
+        self.assertIn('keepassxc_cli_duration_seconds_count{command="db-info",phase="total"} 2', text)
+        self.assertIn('keepassxc_cli_duration_seconds_bucket{command="db-info",phase="spawn",le="+Inf"} 2', text)
+        self.assertIn('keepassxc_cli_commands_total{command="db-info",return_code="0"} 2', text)
+        self.assertNotIn('phase="prompt_wait"', text)
+
+
+class CommandMetricsTest(unittest.TestCase):
+    def test_prompt_wait(self):
+        metrics = CommandMetrics('merge')
+        self.assertIsNone(metrics.prompt_wait)
+        metrics.add_prompt_wait(0.5)
+        metrics.add_prompt_wait(0.25)
+        self.assertEqual(metrics.prompt_wait, 0.75)
@@ -1,8 +1,11 @@
 import logging
+import subprocess
+import sys
 import unittest
 
 from command import GeneratePasswordConfig
-from keepassxc import get_version, generate_password, estimate_password, generate_diceware
+from keepassxc import get_version, generate_password, estimate_password, generate_diceware, generate_passwords, \
+    generate_dicewares, estimate_passwords
 from parameterized import parameterized
 
 logging.basicConfig(level=logging.DEBUG)
@@ -12,6 +15,27 @@ class Test(unittest.TestCase):
     def test_get_version(self):
         self.assertRegex(get_version(), "^\\d\\.\\d\\.\\d$")
 
+    def test_lazy_imports(self):
+        # pexpect and the dependencies of the native backend are only imported when they are needed
+        code = 'import sys, keepassxc; keepassxc.get_version(); ' \
+               'print(sorted({"pexpect", "Crypto", "argon2"} & set(sys.modules)))'
+        output = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, check=True,
+                                universal_newlines=True).stdout
+        self.assertEqual(output.strip(), '[]')
+
+    def test_import(self):
+        # the backends, caches and the thread pool are only imported by the functions that use them
+        code = 'import sys, keepassxc; ' \
+               'print(sorted({"entity", "native", "kdbx", "parallel", "cache", "capabilities", "session", "pexpect"} ' \
+               '& set(sys.modules)))'
+        output = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, check=True,
+                                universal_newlines=True).stdout
+        self.assertEqual(output.strip(), '[]')
+        code = 'import keepassxc, entity; print(keepassxc.Database is entity.Database)'
+        output = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, check=True,
+                                universal_newlines=True).stdout
+        self.assertEqual(output.strip(), 'True')
+
     @parameterized.expand([[1], [20], [200]])
     def test_generate_password_length(self, length):
         self.assertEqual(
@@ -24,6 +48,27 @@ class Test(unittest.TestCase):
             len(generate_diceware(words=words).split(' ')),
             words)
 
+    @parameterized.expand([[0], [1], [20]])
+    def test_generate_passwords(self, n: int):
+        passwords = list(generate_passwords(n, GeneratePasswordConfig(length=20), workers=4))
+        self.assertEqual(len(passwords), n)
+        self.assertEqual(len(set(passwords)), n)
+        for password in passwords:
+            self.assertEqual(len(password), 20)
+
+    @parameterized.expand([[0], [1], [20]])
+    def test_generate_dicewares(self, n: int):
+        passphrases = list(generate_dicewares(n, words=5, workers=4))
+        self.assertEqual(len(passphrases), n)
+        for passphrase in passphrases:
+            self.assertEqual(len(passphrase.split(' ')), 5)
+
+    def test_generate_passwords_invalid(self):
+        with self.assertRaises(ValueError):
+            generate_passwords(-1)
+        with self.assertRaises(ValueError):
+            generate_dicewares(1, words=0)
+
     @parameterized.expand([
         ['1234', 4, 2.0, 0.602]
     ])
@@ -33,5 +78,19 @@ class Test(unittest.TestCase):
         self.assertAlmostEqual(estimation['entropy'], entropy)
         self.assertAlmostEqual(estimation['log10'], log10)
 
+    def test_estimate_passwords(self):
+        passwords = ['1234', 'correct horse battery staple', '1234', 'Tr0ub4dor&3']
+        estimations = list(estimate_passwords(passwords, workers=2))
+        self.assertEqual(len(estimations), len(passwords))
+        self.assertDictEqual(estimations[0], {'length': 4, 'entropy': 2.0, 'log10': 0.602})
+        self.assertDictEqual(estimations[0], estimations[2])
+        for password, estimation in zip(passwords, estimations):
+            self.assertEqual(estimation['length'], len(password))
+
+    def test_estimate_passwords_uncached(self):
+        self.assertListEqual(
+            list(estimate_passwords(['1234', '4321'], cache=False)),
+            [estimate_password('1234'), estimate_password('4321')])
+
     def test_create_database(self):
         pass
@@ -0,0 +1,23 @@
+import sys
+import unittest
+
+import cache
+import watch
+from libc import get_libc
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), 'glibc and musl only')
+class LibcTest(unittest.TestCase):
+    def test_shared(self):
+        libc = get_libc()
+        self.assertIsNotNone(libc)
+        self.assertIs(get_libc('mlock'), libc)
+        self.assertIs(cache._get_libc(), libc)
+        self.assertIs(watch._get_libc(), libc)
+
+    def test_missing_function(self):
+        self.assertIsNone(get_libc('mlock', 'no_such_function'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+import base64
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import database_test
+import kdbx
+import keepassxc
+import native
+from cache import DerivedKeyCache
+from entity import Database
+from native import NativeDatabase
+
+
+class NativeDatabaseMixin:
+    # deriving a key with Argon2 takes a second, so the databases are shared by the tests
+    databases = {}
+
+    def setUp(self):
+        super().setUp()
+        key = (self.database.get_path(), self.database.get_password(), self.database.get_key_file())
+        if key not in self.databases:
+            self.databases[key] = NativeDatabase(*key)
+        self.database = self.databases[key]
+
+
+@unittest.skipUnless(kdbx.is_available(), 'pycryptodome is not installed')
+class NativePasswordDatabaseTest(NativeDatabaseMixin, database_test.PasswordDatabaseTest):
+    def test_get_info(self):
+        info = self.database.get_info()
+        self.assertEqual(info['cipher'], 'AES 256-bit')
+        self.assertEqual(info['kdf'], 'Argon2 (20 rounds, 65536 KB)')
+
+    def test_list_entries(self):
+        self.assertListEqual(self.database.list_entries(), ['Entry'])
+        with self.assertRaises(ValueError):
+            self.database.list_entries('missing')
+
+    def test_export_csv(self):
+        self.assertListEqual(
+            self.database.export(format='csv').splitlines(),
+            ['"Group","Title","Username","Password","URL","Notes"',
+             '"Root","Entry","user","password","https://example.com",""']
+        )
+
+    def test_export_xml(self):
+        xml = self.database.export(format='xml')
+        self.assertValidXml(xml)
+        self.assertIn('<Value ProtectInMemory="True">password</Value>', xml)
+
+
+@unittest.skipUnless(kdbx.is_available(), 'pycryptodome is not installed')
+class NativeKeyFileDatabaseTest(NativeDatabaseMixin, database_test.KeyFileDatabaseTest):
+    pass
+
+
+@unittest.skipUnless(kdbx.is_available(), 'pycryptodome is not installed')
+class NativePasswordAndKeyFileDatabaseTest(NativeDatabaseMixin, database_test.PasswordAndKeyFileDatabaseTest):
+    pass
+
+
+@unittest.skipUnless(kdbx.is_available(), 'pycryptodome is not installed')
+class NativeUnicodePasswordDatabaseTest(NativeDatabaseMixin, database_test.UnicodePasswordDatabaseTest):
+    pass
+
+
+@unittest.skipUnless(kdbx.is_available(), 'pycryptodome is not installed')
+class NativeKdbx3DatabaseTest(unittest.TestCase):
+    def setUp(self):
+        self.database = NativeDatabase('assets/new.kdbx', password='1234')
+
+    def test_get_info(self):
+        self.assertEqual(self.database.get_info()['kdf'], 'AES (1000000 rounds)')
+
+    def test_list_entries(self):
+        self.assertListEqual(self.database.list_entries(), ['[empty]'])
+
+    def test_invalid_credentials(self):
+        with self.assertRaises(ValueError):
+            NativeDatabase('assets/new.kdbx', password='wrong').get_info()
+
+
+@unittest.skipUnless(kdbx.is_available(), 'pycryptodome is not installed')
+class NativeDatabaseReloadTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.database_file = os.path.join(self.temp_dir.name, 'new.kdbx')
+        shutil.copyfile('assets/new.kdbx', self.database_file)
+        self.database = NativeDatabase(self.database_file, password='1234')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_reload(self):
+        with mock.patch('kdbx.transform_key', wraps=kdbx.transform_key) as transform_key:
+            payload = self.database.load()
+            self.assertIs(self.database.load(), payload)
+
+            stat = os.stat(self.database_file)
+            os.utime(self.database_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+            self.assertIsNot(self.database.load(), payload)
+            # same KDF parameters, the key is not derived again
+            self.assertEqual(transform_key.call_count, 1)
+
+            self.database.close()
+            self.database.load()
+            self.assertEqual(transform_key.call_count, 2)
+
+    def test_info_cached(self):
+        info = self.database.get_info()
+        with mock.patch('kdbx.KdbxPayload.get_tree') as get_tree, \
+                mock.patch('native.iterparse', wraps=native.iterparse) as parse:
+            self.assertDictEqual(self.database.get_info(), info)
+            get_tree.assert_not_called()
+            parse.assert_not_called()
+
+            stat = os.stat(self.database_file)
+            os.utime(self.database_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+            self.assertDictEqual(self.database.get_info(), info)
+            self.assertEqual(parse.call_count, 1)
+
+    def test_key_cache(self):
+        key_cache = DerivedKeyCache()
+        with mock.patch('kdbx.transform_key', wraps=kdbx.transform_key) as transform_key:
+            NativeDatabase(self.database_file, password='1234', key_cache=key_cache).get_info()
+            NativeDatabase(self.database_file, password='1234', key_cache=key_cache).get_info()
+            with self.assertRaises(ValueError):
+                NativeDatabase(self.database_file, password='wrong', key_cache=key_cache).get_info()
+            self.assertEqual(transform_key.call_count, 2)
+        self.assertEqual(key_cache.get_metrics()['hits'], 1)
+
+    def test_corrupt(self):
+        with open(self.database_file, 'r+b') as f:
+            f.seek(-100, os.SEEK_END)
+            f.write(b'\x00' * 16)
+        with self.assertRaises((IOError, ValueError)):
+            self.database.load()
+
+    def test_not_kdbx(self):
+        with open(self.database_file, 'wb') as f:
+            f.write(b'not a database')
+        with self.assertRaises(IOError):
+            self.database.load()
+
+
+class OpenDatabaseTest(unittest.TestCase):
+    def test_backend(self):
+        self.assertIs(type(keepassxc.open_database('assets/new.kdbx', '1234', backend='cli')), Database)
+        if kdbx.is_available():
+            self.assertIs(type(keepassxc.open_database('assets/new.kdbx', '1234', backend='native')), NativeDatabase)
+            self.assertIs(type(keepassxc.open_database('assets/new.kdbx', '1234', backend='auto')), NativeDatabase)
+        with self.assertRaises(ValueError):
+            keepassxc.open_database('assets/new.kdbx', '1234', backend='other')
+
+    def test_environment(self):
+        with mock.patch.dict(os.environ, {'KEEPASSXC_BACKEND': 'cli'}):
+            self.assertIs(type(keepassxc.open_database('assets/new.kdbx', '1234')), Database)
+
+
+class KeyFileTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.key_file = os.path.join(self.temp_dir.name, 'key')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read(self, data: bytes) -> bytes:
+        with open(self.key_file, 'wb') as f:
+            f.write(data)
+        return kdbx.read_key_file(self.key_file)
+
+    def test_formats(self):
+        key = bytes(range(32))
+        self.assertEqual(self.read(key), key)
+        self.assertEqual(self.read(key.hex().encode()), key)
+        self.assertEqual(self.read(b'anything'), hashlib.sha256(b'anything').digest())
+        self.assertEqual(self.read(
+            b'<?xml version="1.0" encoding="UTF-8"?>\n<KeyFile><Meta><Version>1.00</Version></Meta>'
+            b'<Key><Data>' + base64.b64encode(key) + b'</Data></Key></KeyFile>'), key)
+        self.assertEqual(self.read(
+            b'<?xml version="1.0" encoding="utf-8"?>\n<KeyFile><Meta><Version>2.0</Version></Meta><Key>'
+            b'<Data Hash="' + hashlib.sha256(key).hexdigest()[:8].encode() + b'">'
+            + key.hex()[:32].encode() + b'\n' + key.hex()[32:].encode() + b'</Data></Key></KeyFile>'), key)
@@ -0,0 +1,66 @@
+import threading
+import time
+import unittest
+
+from parallel import imap
+
+
+class ImapTest(unittest.TestCase):
+    def test_ordered(self):
+        self.assertListEqual(
+            list(imap(lambda x: x * x, range(100), workers=4)),
+            [x * x for x in range(100)]
+        )
+
+    def test_unordered(self):
+        def slow_first(x):
+            if x == 0:
+                time.sleep(0.2)
+            return x
+
+        results = list(imap(slow_first, range(10), workers=4, ordered=False))
+        self.assertSetEqual(set(results), set(range(10)))
+        self.assertNotEqual(results[0], 0)
+
+    def test_bounded(self):
+        consumed = []
+
+        def items():
+            for i in range(1000):
+                consumed.append(i)
+                yield i
+
+        results = imap(lambda x: x, items(), workers=2)
+        next(results)
+        self.assertLessEqual(len(consumed), 5)
+        results.close()
+
+    def test_concurrency(self):
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def work(_):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+
+        list(imap(work, range(20), workers=3))
+        self.assertLessEqual(running[1], 3)
+
+    def test_exception(self):
+        def fail(x):
+            if x == 3:
+                raise KeyError(x)
+            return x
+
+        results = imap(fail, range(10), workers=2)
+        self.assertListEqual([next(results) for _ in range(3)], [0, 1, 2])
+        with self.assertRaises(KeyError):
+            next(results)
+
+    def test_invalid_workers(self):
+        with self.assertRaises(ValueError):
+            list(imap(lambda x: x, range(3), workers=0))
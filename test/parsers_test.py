@@ -0,0 +1,127 @@
+import copy
+import json
+import pickle
+import unittest
+
+from parsers import DatabaseInfo, Finding, MergeChange, iter_findings, iter_lines, \
+    iter_merge_changes, parse_attributes, parse_database_info, parse_merge_change, parse_password_estimate
+
+DB_INFO = '''UUID: {deaedbd6-2d29-49f4-9357-3d16ca00e716}
+Name: Passwörter
+Description: 
+Cipher: AES 256-bit
+KDF: Argon2 (20 rounds, 65536 KB)
+Recycle bin is enabled.
+'''
+
+MERGE = '''Creating missing Test entry [898c7067a74e4aada0d2a3cf590f8c2a]
+Adding custom data KPXC_DECRYPTION_TIME_PREFERENCE [1000]
+Merge Entry/Entry 2 with alien on top under Root
+
+Database was not modified by merge operation.
+'''
+
+
+class ParseDatabaseInfoTest(unittest.TestCase):
+    def test_argon2(self):
+        info = parse_database_info(DB_INFO)
+        self.assertEqual(info.uuid, '{deaedbd6-2d29-49f4-9357-3d16ca00e716}')
+        self.assertEqual(info.name, 'Passwörter')
+        self.assertEqual(info.description, '')
+        self.assertEqual(info.cipher, 'AES 256-bit')
+        self.assertEqual(info.kdf_name, 'Argon2')
+        self.assertEqual(info.kdf_rounds, 20)
+        self.assertEqual(info.kdf_memory, 65536 * 1024)
+        self.assertFalse(hasattr(info, '__dict__'))
+
+    def test_aes(self):
+        info = DatabaseInfo(kdf='AES (1000000 rounds)')
+        self.assertEqual(info.kdf_name, 'AES')
+        self.assertEqual(info.kdf_rounds, 1000000)
+        self.assertIsNone(info.kdf_memory)
+
+    def test_unknown_kdf(self):
+        info = DatabaseInfo(kdf='Something new')
+        self.assertEqual(info.kdf_name, 'Something new')
+        self.assertIsNone(info.kdf_rounds)
+
+    def test_to_dict(self):
+        self.assertDictEqual(parse_database_info(DB_INFO).to_dict(), parse_attributes(DB_INFO))
+        self.assertEqual(DatabaseInfo.from_dict(parse_attributes(DB_INFO)).kdf_rounds, 20)
+
+    def test_dict(self):
+        info = parse_database_info(DB_INFO)
+        self.assertIsInstance(info, dict)
+        self.assertDictEqual(info, parse_attributes(DB_INFO))
+        self.assertEqual(info['kdf'], 'Argon2 (20 rounds, 65536 KB)')
+        copied = copy.copy(info)
+        self.assertIsInstance(copied, DatabaseInfo)
+        self.assertEqual(pickle.loads(pickle.dumps(info)).kdf_rounds, 20)
+        self.assertEqual(json.loads(json.dumps(info)), info)
+
+    def test_lines(self):
+        self.assertDictEqual(parse_attributes(iter_lines([DB_INFO[:7], DB_INFO[7:]])), parse_attributes(DB_INFO))
+
+
+class ParsePasswordEstimateTest(unittest.TestCase):
+    def test_estimate(self):
+        estimate = parse_password_estimate('Length 4\tEntropy 6.011\tLog10 1.810\n')
+        self.assertEqual(estimate.length, 4)
+        self.assertEqual(estimate.entropy, 6.011)
+        self.assertEqual(estimate.log10, 1.81)
+        self.assertDictEqual(estimate.to_dict(), {'length': 4, 'entropy': 6.011, 'log10': 1.81})
+        self.assertDictEqual(estimate, {'length': 4, 'entropy': 6.011, 'log10': 1.81})
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            parse_password_estimate('Error')
+        with self.assertRaises(ValueError):
+            parse_password_estimate('')
+
+
+class ParseMergeChangeTest(unittest.TestCase):
+    def test_changes(self):
+        changes = list(iter_merge_changes(MERGE))
+        self.assertEqual(len(changes), 3)
+        self.assertEqual(changes[0].action, 'Creating missing')
+        self.assertEqual(changes[0].path, 'Test entry')
+        self.assertEqual(changes[0].detail, '898c7067a74e4aada0d2a3cf590f8c2a')
+        self.assertEqual(changes[1].action, 'Adding custom data')
+        self.assertEqual(changes[1].path, 'KPXC_DECRYPTION_TIME_PREFERENCE')
+        self.assertEqual(changes[2].action, 'Merge')
+        self.assertIsNone(changes[2].detail)
+
+    def test_unknown(self):
+        change = parse_merge_change('Something else happened ')
+        self.assertIsNone(change.action)
+        self.assertEqual(str(change), 'Something else happened')
+
+    def test_hashable(self):
+        self.assertEqual(len({parse_merge_change('Relocating Entry [1]'), MergeChange('Relocating Entry [1]')}), 1)
+
+    def test_stream(self):
+        chunks = [MERGE[i:i + 5] for i in range(0, len(MERGE), 5)]
+        self.assertListEqual(list(iter_merge_changes(iter_lines(chunks))), list(iter_merge_changes(MERGE)))
+
+
+class IterFindingsTest(unittest.TestCase):
+    def test_findings(self):
+        output = '''Evaluating database entries against HIBP file, this will take a while...
+Password for 'websites/wiki/Nested' has been leaked 3 time(s)!
+Password for 'Test entry' has been leaked 1 times!
+Password for 'it's quoted' has been leaked!
+'''
+        self.assertListEqual(list(iter_findings(output)), [
+            Finding('leaked', 'websites/wiki/Nested', 3),
+            Finding('leaked', 'Test entry', 1),
+            Finding('leaked', "it's quoted"),
+        ])
+
+
+class IterLinesTest(unittest.TestCase):
+    def test_split(self):
+        self.assertListEqual(list(iter_lines(['a\r', '\nb', 'c\n', '', 'd'])), ['a', 'bc', 'd'])
+
+
+if __name__ == '__main__':
+    unittest.main()
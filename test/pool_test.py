@@ -0,0 +1,123 @@
+import logging
+import subprocess
+import threading
+import time
+import unittest
+
+import command
+from entity import Database
+from pool import SessionPool
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+class SessionPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.database = Database('assets/password.kdbx', password='1234')
+        self.pool = SessionPool(min_size=1, max_size=2)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_warm(self):
+        self.pool.warm(self.database)
+        metrics = self.pool.get_metrics()
+        self.assertEqual(metrics['opened'], 1)
+        self.assertEqual(metrics['idle'], 1)
+
+    def test_reuse(self):
+        for _ in range(3):
+            self.pool.execute(command.DatabaseInfoCommand(self.database))
+        metrics = self.pool.get_metrics()
+        self.assertEqual(metrics['misses'], 1)
+        self.assertEqual(metrics['hits'], 2)
+        self.assertEqual(metrics['opened'], 1)
+
+    def test_concurrent(self):
+        results = []
+
+        def work():
+            for _ in range(5):
+                results.append(self.pool.execute(command.DatabaseInfoCommand(self.database)))
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 20)
+        self.assertLessEqual(self.pool.get_metrics()['opened'], 2)
+
+    def test_password_mismatch(self):
+        self.pool.warm(self.database)
+        with self.assertRaises(ValueError):
+            with self.pool.acquire(Database('assets/password.kdbx', password='4321')):
+                pass
+
+    def test_wrong_password_first(self):
+        # a mistyped password must not lock out the correct one
+        with self.assertRaises(subprocess.CalledProcessError):
+            self.pool.execute(command.DatabaseInfoCommand(Database('assets/password.kdbx', password='wrong')))
+        self.assertIn('uuid', self.pool.execute(command.DatabaseInfoCommand(self.database)))
+        self.assertEqual(self.pool.get_metrics()['opened'], 1)
+        with self.assertRaises(ValueError):
+            self.pool.execute(command.DatabaseInfoCommand(Database('assets/password.kdbx', password='wrong')))
+
+    def test_failed_session(self):
+        with self.assertRaises(subprocess.TimeoutExpired):
+            with self.pool.acquire(self.database) as session:
+                session._timeout = session._child.timeout = 1
+                session.run(['show', '--', 'Test entry'], [('Never printed: ', 'secret')])
+        self.assertIn('uuid', self.pool.execute(command.DatabaseInfoCommand(self.database)))
+        metrics = self.pool.get_metrics()
+        self.assertEqual(metrics['opened'], 2)
+        self.assertEqual(metrics['closed'], 1)
+
+    def test_wait_timeout(self):
+        with self.pool.acquire(self.database):
+            with self.pool.acquire(self.database):
+                with self.assertRaises(TimeoutError):
+                    with self.pool.acquire(self.database, wait_timeout=0.1):
+                        pass
+        self.assertEqual(self.pool.get_metrics()['waits'], 1)
+
+    def test_unhealthy(self):
+        pool = SessionPool(health_check=lambda session: False)
+        with pool.acquire(self.database):
+            pass
+        with pool.acquire(self.database):
+            pass
+        self.assertEqual(pool.get_metrics()['unhealthy'], 1)
+        pool.close()
+
+    def test_slow_health_check(self):
+        other = Database('assets/keyfile.kdbx', key_file='assets/keyfile.key')
+        checking, release = threading.Event(), threading.Event()
+
+        def health_check(session) -> bool:
+            if session.get_database().get_path() == self.database.get_path():
+                checking.set()
+                release.wait(10)
+            return True
+
+        pool = SessionPool(min_size=1, health_check=health_check)
+        pool.warm(self.database)
+        pool.warm(other)
+        thread = threading.Thread(target=lambda: pool.execute(command.DatabaseInfoCommand(self.database)))
+        thread.start()
+        try:
+            self.assertTrue(checking.wait(10))
+            # not blocked by the health check of the other database
+            started = time.monotonic()
+            with pool.acquire(other, wait_timeout=1):
+                pass
+            self.assertLess(time.monotonic() - started, 5)
+        finally:
+            release.set()
+            thread.join()
+            pool.close()
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            SessionPool(min_size=3, max_size=2)
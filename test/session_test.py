@@ -0,0 +1,121 @@
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from entity import Database
+from session import DatabaseSession
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+class DatabaseSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.database = Database('assets/password.kdbx', password='1234')
+
+    def test_open_close(self):
+        session = DatabaseSession(self.database)
+        self.assertFalse(session.is_open())
+        session.open()
+        self.assertTrue(session.is_open())
+        session.close()
+        self.assertFalse(session.is_open())
+
+    def test_get_info(self):
+        with self.database.session():
+            self.assertSetEqual(
+                set(self.database.get_info().keys()),
+                {"uuid", "name", "description", "cipher", "kdf"}
+            )
+            self.assertEqual(
+                self.database.get_info(),
+                self.database.get_info()
+            )
+
+    def test_export(self):
+        expected = self.database.export(format='xml')
+        with self.database.session():
+            self.assertEqual(self.database.export(format='xml'), expected)
+
+    def test_failed_command(self):
+        with self.database.session() as session:
+            with self.assertRaises(subprocess.CalledProcessError):
+                self.database.show_entry('missing')
+            self.assertTrue(session.is_open())
+            self.assertEqual(self.database.show_entry('Test entry')['title'], 'Test entry')
+
+    def test_prompt_in_output(self):
+        with self.database.session() as session:
+            entry = 'Test {}'.format(session._prompt)
+            return_code, stdout, _ = session.run(['show', '--', entry])
+            self.assertEqual(return_code, 0)
+            self.assertIn(entry, stdout)
+            self.assertNotIn('pykeepassxc-end', stdout)
+            self.assertIsInstance(self.database.get_info(), dict)
+
+    def test_nested_session(self):
+        with self.database.session() as outer:
+            with self.database.session() as inner:
+                self.assertIs(outer, inner)
+            self.assertTrue(outer.is_open())
+        self.assertFalse(outer.is_open())
+
+    def test_wrong_password(self):
+        database = Database('assets/password.kdbx', password='wrong')
+        with self.assertRaises(Exception):
+            with database.session():
+                pass
+
+
+class FailedSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.database_file = os.path.join(self.temp_dir.name, 'password.kdbx')
+        shutil.copyfile('assets/password.kdbx', self.database_file)
+        self.database = Database(self.database_file, password='1234')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_output_like_error(self):
+        # only STDERR tells a failed command, not output that reads like an error message
+        with self.database.session() as session:
+            self.database.create_entry('Invalid logins')
+            return_code, stdout, stderr = session.run(['show', '--attributes', 'title', '--', 'Invalid logins'])
+            self.assertEqual(return_code, 0)
+            self.assertIn('Invalid logins', stdout)
+            self.assertEqual(stderr, '')
+
+    def test_timeout(self):
+        session = DatabaseSession(self.database, timeout=1)
+        session.open()
+        try:
+            with self.assertRaises(subprocess.TimeoutExpired):
+                session.run(['show', '--', 'Test entry'], [('Never printed: ', 'secret')])
+            # the unread output of the command must not end up in the output of the next one
+            self.assertFalse(session.is_open())
+            with self.assertRaises(IOError):
+                session.run(['db-info'])
+        finally:
+            session.close()
+        with self.database.session():
+            self.assertIn('uuid', self.database.get_info())
+
+
+class KeyFileDatabaseSessionTest(DatabaseSessionTest):
+    def setUp(self):
+        self.database = Database('assets/keyfile.kdbx', key_file='assets/keyfile.key')
+
+    def test_wrong_password(self):
+        pass
+
+
+class CompareDatabaseSessionTest(unittest.TestCase):
+    def test_compare(self):
+        database_1 = Database('assets/new.kdbx', password='1234')
+        database_2 = Database('assets/merge.kdbx', password='merge')
+        expected = database_1.compare(database_2)
+        with database_1.session():
+            self.assertSetEqual(database_1.compare(database_2), expected)
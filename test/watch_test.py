@@ -0,0 +1,131 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from entity import Database
+from fleet import DatabaseSet
+from watch import FileWatcher, get_watcher
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+        self.event = threading.Event()
+
+    def __call__(self, target):
+        self.calls.append(target)
+        self.event.set()
+
+    def wait(self, timeout: float = 5.0) -> bool:
+        changed = self.event.wait(timeout)
+        self.event.clear()
+        return changed
+
+
+class FileWatcherTest(unittest.TestCase):
+    backend = 'poll'
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.watcher = FileWatcher(debounce=0.1, poll_interval=0.05, backend=self.backend)
+        self.paths = []
+        for name in ('first.kdbx', 'second.kdbx'):
+            path = os.path.join(self.temp_dir.name, name)
+            shutil.copyfile('assets/password.kdbx', path)
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.watcher.close()
+        self.temp_dir.cleanup()
+
+    def replace(self, path: str, data: bytes = b'changed'):
+        # like KeePassXC saving a database
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+
+    def test_backend(self):
+        self.assertEqual(self.watcher.get_backend(), self.backend)
+
+    def test_replace(self):
+        first, second = Recorder(), Recorder()
+        self.watcher.subscribe(self.paths[0], first)
+        self.watcher.subscribe(self.paths[1], second)
+        self.replace(self.paths[0])
+        self.assertTrue(first.wait())
+        self.assertListEqual(first.calls, [self.paths[0]])
+        time.sleep(0.3)
+        self.assertListEqual(second.calls, [])
+
+    def test_debounce(self):
+        recorder = Recorder()
+        self.watcher.subscribe(self.paths[0], recorder)
+        for i in range(5):
+            self.replace(self.paths[0], b'x' * i)
+            time.sleep(0.01)
+        self.assertTrue(recorder.wait())
+        time.sleep(0.3)
+        self.assertEqual(len(recorder.calls), 1)
+
+    def test_unrelated_file(self):
+        recorder = Recorder()
+        self.watcher.subscribe(self.paths[0], recorder)
+        with open(os.path.join(self.temp_dir.name, 'other.txt'), 'wb') as f:
+            f.write(b'other')
+        self.assertFalse(recorder.wait(0.4))
+
+    def test_cancel(self):
+        recorder = Recorder()
+        subscription = self.watcher.subscribe(self.paths[0], recorder)
+        subscription.cancel()
+        self.assertListEqual(self.watcher.get_paths(), [])
+        self.replace(self.paths[0])
+        self.assertFalse(recorder.wait(0.4))
+
+    def test_database(self):
+        database = Database(self.paths[0], password='1234')
+        recorder = Recorder()
+        database._snapshot = object()
+        database.watch(recorder, watcher=self.watcher)
+        self.replace(self.paths[0])
+        self.assertTrue(recorder.wait())
+        self.assertListEqual(recorder.calls, [database])
+        self.assertIsNone(database._snapshot)
+
+    def test_closed(self):
+        self.watcher.close()
+        self.assertTrue(self.watcher.is_closed())
+        with self.assertRaises(ValueError):
+            self.watcher.subscribe(self.paths[0], Recorder())
+
+    def test_shared_watcher_closed(self):
+        watcher = get_watcher()
+        watcher.close()
+        self.assertIsNot(get_watcher(), watcher)
+        self.assertFalse(get_watcher().is_closed())
+
+    def test_database_set(self):
+        database = Database(self.paths[0], password='1234')
+        recorder = Recorder()
+        database._snapshot = object()
+        DatabaseSet([database]).watch(recorder, watcher=self.watcher)
+        self.replace(self.paths[0])
+        self.assertTrue(recorder.wait())
+        self.assertListEqual(recorder.calls, [database])
+        self.assertIsNone(database._snapshot)
+
+
+def has_inotify() -> bool:
+    with FileWatcher() as watcher:
+        return watcher.get_backend() == 'inotify'
+
+
+@unittest.skipUnless(has_inotify(), 'inotify is not available')
+class InotifyFileWatcherTest(FileWatcherTest):
+    backend = 'inotify'
+
+
+if __name__ == '__main__':
+    unittest.main()